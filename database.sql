@@ -167,6 +167,7 @@ CREATE INDEX idx_order_items_product_id ON order_items(product_id);
 CREATE INDEX idx_product_units_product_id ON product_units(product_id);
 CREATE INDEX idx_product_units_qr_code ON product_units(qr_code);
 CREATE INDEX idx_product_units_blockchain_hash ON product_units(blockchain_hash);
+CREATE INDEX idx_product_units_created_at ON product_units(created_at);
 CREATE INDEX idx_favorites_user_id ON favorites(user_id);
 CREATE INDEX idx_favorites_product_id ON favorites(product_id);
 CREATE INDEX idx_comments_user_id ON comments(user_id);
@@ -0,0 +1,45 @@
+"""JSON responses shared by every service
+
+Each service ships an identical copy of this module, since services are
+built from their own directories; the original is in services/shared (edit
+it there and run services/sync_shared.py). Apps use ORJSONResponse as
+their default response class, so whatever a route returns is encoded by
+orjson rather than json.dumps.
+
+Read paths returning ORM rows can skip FastAPI's response_model handling
+altogether with model_response(): FastAPI validates the rows, dumps them
+to Python objects and then encodes those, and model instances returned
+by a route are dumped and validated a second time. model_response()
+reads the rows through the schema once and lets pydantic-core write the
+JSON bytes directly. Keep response_model on the route for the OpenAPI
+schema.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from starlette.responses import Response
+
+__all__ = ["ORJSONResponse", "model_response"]
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def model_response(
+    schema: Any,
+    content: Any,
+    headers: Optional[Dict[str, str]] = None,
+    status_code: int = 200
+) -> Response:
+    """Serialize ORM rows, model instances or dicts as `schema` (e.g. List[ItemResponse])
+
+    Model instances are not revalidated. Output matches what FastAPI
+    would produce for the same response_model.
+    """
+    adapter = _adapter(schema)
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True), by_alias=True)
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
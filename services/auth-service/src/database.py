@@ -1,10 +1,11 @@
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 import time
 
 from .config import get_database_url, get_debug_mode
+from .utils.db_pool import create_db_engine
 
 # ───────────────────────────────────────
 # DATABASE CONFIGURATION
@@ -12,18 +13,8 @@ from .config import get_database_url, get_debug_mode
 DATABASE_URL = get_database_url()
 DEBUG = get_debug_mode()
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=DEBUG,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=10,
-    max_overflow=20,
-    connect_args={
-        "connect_timeout": 10,
-        "application_name": "pathlight_auth_service"
-    }
-)
+# Pool sizing, timeouts and PgBouncer mode come from DB_* environment variables
+engine = create_db_engine(DATABASE_URL, "pathlight_auth_service", echo=DEBUG)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
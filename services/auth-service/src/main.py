@@ -1,15 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
 from src.database import engine
 from src.routes.auth_routes import router as auth_router
 from src.config import settings
+from src.utils.compression import CompressionMiddleware
+from src.utils.db_pool import render_pool_metrics
+from src.utils.json_response import ORJSONResponse
 
 # Create tables
 app = FastAPI(
     title="Auth Service",
     description="Authentication and authorization microservice for Smart Verify E-commerce",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -20,10 +25,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 
 # Include routers
 app.include_router(auth_router, prefix="/api/v1")
 
+@app.get("/metrics/db", response_class=PlainTextResponse, include_in_schema=False)
+async def db_pool_metrics():
+    """Connection pool metrics in Prometheus text format"""
+    return render_pool_metrics()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -6,6 +6,7 @@ from typing import List
 from src.database import get_db
 from src.controllers.auth_controller import AuthController
 from src.services.auth_service import AuthService
+from src.utils.json_response import model_response
 from src.schemas.auth_schemas import (
     UserCreate, UserUpdate, UserResponse,
     SellerCreate, SellerUpdate, SellerResponse,
@@ -113,7 +114,7 @@ async def get_users(
     current_admin = Depends(get_current_admin)
 ):
     """Get all users (admin only)"""
-    return AuthController.get_users(db, skip, limit)
+    return model_response(List[UserResponse], AuthController.get_users(db, skip, limit))
 
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
@@ -167,7 +168,7 @@ async def get_sellers(
     db: Session = Depends(get_db)
 ):
     """Get all sellers"""
-    return AuthController.get_sellers(db, skip, limit)
+    return model_response(List[SellerResponse], AuthController.get_sellers(db, skip, limit))
 
 @router.put("/sellers/{seller_id}/verify", response_model=SellerResponse)
 async def verify_seller(
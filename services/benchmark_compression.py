@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Compression benchmark: CPU cost vs bytes saved
+So sánh chi phí CPU và số byte tiết kiệm cho các mức nén gzip/brotli
+
+Encodes representative responses the way the services do (orjson) and
+compresses them with the encoders of src/utils/compression.py at several
+levels. Use it to pick COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+and COMPRESSION_MIN_SIZE; the "net ms" column is transfer time saved on a
+link of --mbps megabits per second minus the time spent compressing.
+
+    python benchmark_compression.py [--iterations 50] [--mbps 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import orjson
+
+# Every service ships the same compression module; use the product service's copy
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "product-service"))
+from src.utils import compression  # noqa: E402
+from src.utils.compression import CompressionSettings, compress_body  # noqa: E402
+
+BRANDS = ["Apple", "Samsung", "Nike", "Adidas", "Uniqlo", "Xiaomi", "Sony", "Zara"]
+SIZES = ["S", "M", "L", "XL"]
+COLORS = ["Black", "White", "Red", "Blue", "Navy"]
+WIDTHS = [320, 640, 1280]
+
+
+def product(rng: random.Random, product_id: int) -> dict:
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(500000))
+    images = []
+    for image_id in range(2):
+        content_hash = "%032x" % rng.getrandbits(128)
+        images.append({
+            "id": product_id * 10 + image_id,
+            "product_id": product_id,
+            "image_url": f"https://cdn.smartverify.vn/products/{content_hash}/original.jpg",
+            "content_hash": content_hash,
+            "uploaded_at": created_at.isoformat(),
+            "renditions": {
+                fmt: {str(width): f"https://cdn.smartverify.vn/products/{content_hash}/{width}.{fmt}" for width in WIDTHS}
+                for fmt in ("webp", "jpeg")
+            }
+        })
+    return {
+        "name": f"{rng.choice(BRANDS)} product {product_id}",
+        "description": "Sản phẩm chính hãng, bảo hành 12 tháng. " * rng.randint(1, 4),
+        "brand": rng.choice(BRANDS),
+        "category_id": rng.randint(1, 30),
+        "price": rng.randrange(100000, 5000000, 1000),
+        "id": product_id,
+        "seller_id": rng.randint(1, 20),
+        "created_at": created_at.isoformat(),
+        "version": rng.randint(1, 100000),
+        "variants": [
+            {"size": size, "color": color, "quantity": rng.randint(0, 200), "price": None,
+             "id": product_id * 100 + index, "product_id": product_id}
+            for index, (size, color) in enumerate((s, c) for s in SIZES[:2] for c in COLORS[:2])
+        ],
+        "images": images
+    }
+
+def order(rng: random.Random, order_id: int) -> dict:
+    items = [
+        {"product_id": rng.randint(1, 5000), "variant_id": rng.randint(1, 50000), "quantity": rng.randint(1, 3),
+         "price": rng.randrange(100000, 5000000, 1000), "id": order_id * 10 + index, "order_id": order_id}
+        for index in range(rng.randint(1, 5))
+    ]
+    return {
+        "user_id": rng.randint(1, 10000),
+        "total_amount": sum(item["price"] * item["quantity"] for item in items),
+        "status": rng.randint(0, 3),
+        "id": order_id,
+        "blockchain_hash": "0x%064x" % rng.getrandbits(256) if rng.random() < 0.5 else None,
+        "created_at": (datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(500000))).isoformat(),
+        "items": items
+    }
+
+def payloads() -> dict:
+    rng = random.Random(42)
+    return {
+        "product detail": orjson.dumps(product(rng, 1)),
+        "product page (100)": orjson.dumps([product(rng, i) for i in range(1, 101)]),
+        "order page (100)": orjson.dumps([order(rng, i) for i in range(1, 101)]),
+        "order item (1)": orjson.dumps(order(rng, 1)["items"][:1]),
+    }
+
+
+def measure(body: bytes, encoding: str, settings: CompressionSettings, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        compressed = compress_body(body, encoding, settings)
+        timings.append(time.perf_counter() - started)
+    return len(compressed), statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--mbps", type=float, default=20.0, help="client bandwidth used for the net column")
+    args = parser.parse_args()
+
+    candidates = [("gzip", level) for level in (1, 5, 6, 9)]
+    if compression.brotli is not None:
+        candidates += [("br", quality) for quality in (1, 4, 5, 11)]
+    else:
+        print("brotli not installed, gzip only\n")
+
+    bytes_per_ms = args.mbps * 1_000_000 / 8 / 1000
+    print(f"{'payload':<20} {'encoding':<8} {'bytes':>9} {'ratio':>6} {'saved':>9} {'cpu ms':>8} {'MB/s':>7} {'net ms':>8}")
+    for name, body in payloads().items():
+        print(f"{name:<20} {'identity':<8} {len(body):>9}")
+        for encoding, level in candidates:
+            settings = CompressionSettings()
+            settings.gzip_level = settings.brotli_quality = level
+            size, cpu_ms = measure(body, encoding, settings, args.iterations)
+            saved = len(body) - size
+            net_ms = saved / bytes_per_ms - cpu_ms
+            throughput = len(body) / 1_000_000 / (cpu_ms / 1000) if cpu_ms else float("inf")
+            print(f"{'':<20} {f'{encoding}-{level}':<8} {size:>9} {size / len(body):>6.2f} {saved:>9} {cpu_ms:>8.3f} {throughput:>7.0f} {net_ms:>8.2f}")
+
+if __name__ == "__main__":
+    main()
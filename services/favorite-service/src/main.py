@@ -1,17 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
 from src.database import engine
 from src.models import Base
 from src.routes.favorite_routes import router as favorite_router
 from src.config import settings
+from src.utils.compression import CompressionMiddleware
+from src.utils.db_pool import render_pool_metrics
+from src.utils.json_response import ORJSONResponse
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="Favorite Service",
     description="Favorite microservice for Smart Verify E-commerce",
-    version=settings.SERVICE_VERSION
+    version=settings.SERVICE_VERSION,
+    default_response_class=ORJSONResponse
 )
 app.add_middleware(
     CORSMiddleware,
@@ -20,7 +25,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
 app.include_router(favorite_router, prefix="/api/v1")
+@app.get("/metrics/db", response_class=PlainTextResponse, include_in_schema=False)
+async def db_pool_metrics():
+    """Connection pool metrics in Prometheus text format"""
+    return render_pool_metrics()
 @app.get("/")
 async def root():
     return {
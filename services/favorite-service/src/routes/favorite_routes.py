@@ -5,6 +5,7 @@ from sqlalchemy.exc import IntegrityError
 
 from src.database import get_db
 from src.models import Favorite
+from src.utils.json_response import model_response
 from src.schemas.favorite_schemas import FavoriteCreate, FavoriteResponse
 
 router = APIRouter()
@@ -38,13 +39,13 @@ async def create_favorite(favorite: FavoriteCreate, db: Session = Depends(get_db
 async def get_user_favorites(user_id: int, db: Session = Depends(get_db)):
     """Get all favorites for a user"""
     favorites = db.query(Favorite).filter(Favorite.user_id == user_id).all()
-    return favorites
+    return model_response(List[FavoriteResponse], favorites)
 
 @router.get("/favorites/product/{product_id}", response_model=List[FavoriteResponse])
 async def get_product_favorites(product_id: int, db: Session = Depends(get_db)):
     """Get all users who favorited a product"""
     favorites = db.query(Favorite).filter(Favorite.product_id == product_id).all()
-    return favorites
+    return model_response(List[FavoriteResponse], favorites)
 
 @router.delete("/favorites/{favorite_id}")
 async def delete_favorite(favorite_id: int, db: Session = Depends(get_db)):
@@ -12,6 +12,54 @@ class Settings(BaseSettings):
     SERVICE_NAME: str = "inventory-service"
     SERVICE_VERSION: str = "1.0.0"
     SERVICE_PORT: int = int(os.getenv("SERVICE_PORT", "8003"))
+    # /product-units/generate-batch: most units per request, and units inserted and committed per chunk
+    PRODUCT_UNIT_BATCH_MAX: int = int(os.getenv("PRODUCT_UNIT_BATCH_MAX", "100000"))
+    PRODUCT_UNIT_BATCH_CHUNK_SIZE: int = int(os.getenv("PRODUCT_UNIT_BATCH_CHUNK_SIZE", "5000"))
+    # QR verification cache: results of used units (final, so never stale) and a Bloom
+    # filter of all codes that rejects unknown codes without querying the database
+    QR_CACHE_ENABLED: bool = os.getenv("QR_CACHE_ENABLED", "true").lower() == "true"
+    QR_CACHE_MAX_ENTRIES: int = int(os.getenv("QR_CACHE_MAX_ENTRIES", "100000"))
+    QR_BLOOM_CAPACITY: int = int(os.getenv("QR_BLOOM_CAPACITY", "1000000"))
+    QR_BLOOM_ERROR_RATE: float = float(os.getenv("QR_BLOOM_ERROR_RATE", "0.001"))
+    # Codes created by other processes may read as invalid for up to this long
+    QR_BLOOM_SYNC_INTERVAL_SECONDS: float = float(os.getenv("QR_BLOOM_SYNC_INTERVAL_SECONDS", "2"))
+    # Syncs rescan units created this long before the previous sync; must exceed the longest
+    # transaction inserting units, or units it commits are missed until the next rebuild
+    QR_BLOOM_SYNC_OVERLAP_SECONDS: float = float(os.getenv("QR_BLOOM_SYNC_OVERLAP_SECONDS", "60"))
+    QR_BLOOM_REBUILD_INTERVAL_SECONDS: float = float(os.getenv("QR_BLOOM_REBUILD_INTERVAL_SECONDS", "900"))
+    # QR images and label sheets are rendered in this many worker processes
+    QR_RENDER_WORKERS: int = int(os.getenv("QR_RENDER_WORKERS", "2"))
+    # Rendered QR images kept in memory, least recently used dropped first; with
+    # QR_IMAGE_CACHE_STORAGE they are also kept in STORAGE_BACKEND, shared by all processes
+    QR_IMAGE_CACHE_ENABLED: bool = os.getenv("QR_IMAGE_CACHE_ENABLED", "true").lower() == "true"
+    QR_IMAGE_CACHE_MAX_ENTRIES: int = int(os.getenv("QR_IMAGE_CACHE_MAX_ENTRIES", "10000"))
+    QR_IMAGE_CACHE_STORAGE: bool = os.getenv("QR_IMAGE_CACHE_STORAGE", "false").lower() == "true"
+    # Cache-Control of QR images; they carry a strong ETag for If-None-Match revalidation
+    CACHE_CONTROL_QR_IMAGE: str = os.getenv("CACHE_CONTROL_QR_IMAGE", "public, max-age=86400")
+    # Most units printed by one /product-units/qr-sheets request
+    QR_SHEET_MAX_UNITS: int = int(os.getenv("QR_SHEET_MAX_UNITS", "50000"))
+    # Storage for label sheets: "s3", "local" (files served under LOCAL_STORAGE_URL) or "memory"
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "s3")
+    LOCAL_STORAGE_DIR: str = os.getenv("LOCAL_STORAGE_DIR", "./media")
+    LOCAL_STORAGE_URL: str = os.getenv("LOCAL_STORAGE_URL", "/media")
+    AWS_ACCESS_KEY_ID: str = os.getenv("AWS_ACCESS_KEY_ID", "")
+    AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
+    AWS_REGION: str = os.getenv("AWS_REGION", "ap-southeast-1")
+    AWS_S3_BUCKET_NAME: str = os.getenv("AWS_S3_BUCKET_NAME", "")
+    AWS_S3_ENDPOINT_URL: str = os.getenv("AWS_S3_ENDPOINT_URL", "")
+    S3_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "16"))
+    S3_MAX_ATTEMPTS: int = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+    S3_RETRY_MODE: str = os.getenv("S3_RETRY_MODE", "standard")
+    S3_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("S3_CONNECT_TIMEOUT_SECONDS", "5"))
+    S3_READ_TIMEOUT_SECONDS: float = float(os.getenv("S3_READ_TIMEOUT_SECONDS", "30"))
+    # Signed QR codes ("hmac", "ed25519" or "none"). Units get signed codes once a key is set,
+    # and startup fails if the keys cannot be loaded. For ed25519 the key is a base64 32-byte
+    # private seed and QR_SIGNING_PREVIOUS_KEYS ("key_id:key,...") holds base64 public keys of
+    # retired keys; for hmac both are shared secrets
+    QR_SIGNING_ALGORITHM: str = os.getenv("QR_SIGNING_ALGORITHM", "hmac")
+    QR_SIGNING_KEY: str = os.getenv("QR_SIGNING_KEY", "")
+    QR_SIGNING_KEY_ID: int = int(os.getenv("QR_SIGNING_KEY_ID", "1"))
+    QR_SIGNING_PREVIOUS_KEYS: str = os.getenv("QR_SIGNING_PREVIOUS_KEYS", "")
     
     class Config:
         env_file = ".env"
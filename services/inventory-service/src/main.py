@@ -1,17 +1,30 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from fastapi.staticfiles import StaticFiles
+import os
 import uvicorn
+from sqlalchemy.schema import CreateIndex
 from src.database import engine
-from src.models import Base
-from src.routes.inventory_routes import router as inventory_router
+from src.models import Base, product_units_created_at_index
+from src.routes.inventory_routes import (
+    router as inventory_router, start_render_workers, stop_render_workers, verification_cache
+)
 from src.config import settings
+from src.utils.compression import CompressionMiddleware
+from src.utils.db_pool import render_pool_metrics
+from src.utils.json_response import ORJSONResponse
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+# create_all skips existing tables, so indexes added to them later are created here
+with engine.begin() as connection:
+    connection.execute(CreateIndex(product_units_created_at_index, if_not_exists=True))
 app = FastAPI(
     title="Inventory Service",
     description="Inventory management microservice for Smart Verify E-commerce",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 app.add_middleware(
     CORSMiddleware,
@@ -19,8 +32,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(CompressionMiddleware)
 app.include_router(inventory_router, prefix="/api/v1")
+@app.get("/metrics/db", response_class=PlainTextResponse, include_in_schema=False)
+async def db_pool_metrics():
+    """Connection pool metrics in Prometheus text format"""
+    return render_pool_metrics()
+if settings.STORAGE_BACKEND == "local":
+    # Serve locally stored label sheets at the URLs the storage backend hands out
+    os.makedirs(settings.LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount(settings.LOCAL_STORAGE_URL, StaticFiles(directory=settings.LOCAL_STORAGE_DIR), name="media")
+@app.on_event("startup")
+async def start_qr_rendering():
+    start_render_workers()
+@app.on_event("startup")
+async def warm_verification_cache():
+    if verification_cache.enabled:
+        verification_cache.start_rebuild()
+@app.on_event("shutdown")
+async def stop_qr_rendering():
+    stop_render_workers()
 @app.get("/")
 async def root():
     return {
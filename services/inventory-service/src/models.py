@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, Text, DateTime, Boolean, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from src.database import Base
 
@@ -15,7 +15,10 @@ class ProductUnit(Base):
     blockchain_hash = Column(Text, unique=True, nullable=False, index=True)
     is_used = Column(Boolean, default=False)
     used_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, server_default=func.current_timestamp())
+    created_at = Column(DateTime, server_default=func.current_timestamp())  # Inserting transaction start; QR filter syncs scan by it
+
+# Added after the table existed, so src.main also creates it on startup
+product_units_created_at_index = Index('idx_product_units_created_at', ProductUnit.created_at)
 
 class OwnProduct(Base):
     __tablename__ = "own_products"
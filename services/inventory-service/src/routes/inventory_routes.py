@@ -1,23 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Iterator, List, Literal, Optional
+from concurrent.futures import ProcessPoolExecutor
 import hashlib
+import logging
+import multiprocessing
 import uuid
-import qrcode
-import io
 import base64
+import json
 from datetime import datetime
 
-from src.database import get_db
+from src.config import settings
+from src.database import SessionLocal, get_db
+from src.utils.http_cache import cache_headers, etag_matches, not_modified
+from src.utils.json_response import ORJSONResponse, model_response
+from src.utils.pagination import NEXT_CURSOR_HEADER, decode_id_cursor, next_cursor
+from src.utils.qr_cache import QRVerificationCache
+from src.utils.qr_image_cache import QRImageCache
+from src.utils.qr_render import SheetLayout
+from src.utils.qr_sheets import SHEET_WRITERS, iter_sheet, save_sheet
+from src.utils.qr_signing import check_ids, create_signer, is_signed
+from src.utils.storage import get_storage
 from src.models import ProductUnit, OwnProduct
 from src.schemas.inventory_schemas import (
-    ProductUnitCreate, ProductUnitResponse,
+    ProductUnitCreate, ProductUnitBatchCreate, ProductUnitResponse,
     OwnProductCreate, OwnProductResponse,
-    QRVerifyRequest, QRVerifyResponse
+    QRVerifyRequest, QRVerifyResponse, QRSigningKeysResponse,
+    QRSheetRequest, QRSheetResponse
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# Answers repeated and unknown scans of /product-units/verify without a query
+verification_cache = QRVerificationCache(
+    SessionLocal,
+    enabled=settings.QR_CACHE_ENABLED,
+    max_entries=settings.QR_CACHE_MAX_ENTRIES,
+    bloom_capacity=settings.QR_BLOOM_CAPACITY,
+    bloom_error_rate=settings.QR_BLOOM_ERROR_RATE,
+    sync_interval_seconds=settings.QR_BLOOM_SYNC_INTERVAL_SECONDS,
+    sync_overlap_seconds=settings.QR_BLOOM_SYNC_OVERLAP_SECONDS,
+    rebuild_interval_seconds=settings.QR_BLOOM_REBUILD_INTERVAL_SECONDS
+)
+# None when QR codes are not signed
+qr_signer = create_signer(
+    settings.QR_SIGNING_ALGORITHM,
+    settings.QR_SIGNING_KEY,
+    settings.QR_SIGNING_KEY_ID,
+    settings.QR_SIGNING_PREVIOUS_KEYS
+)
+
+# QR rendering is CPU-bound, so images and label sheets are drawn in worker
+# processes, spawned rather than forked from this multi-threaded process.
+# The pool is created on startup and shut down on shutdown (see src.main).
+render_executor: Optional[ProcessPoolExecutor] = None
+# Serves repeated /product-units/{unit_id}/qr-image downloads without re-rendering
+qr_image_cache = QRImageCache(
+    enabled=settings.QR_IMAGE_CACHE_ENABLED,
+    max_entries=settings.QR_IMAGE_CACHE_MAX_ENTRIES,
+    storage=get_storage if settings.QR_IMAGE_CACHE_STORAGE else None
+)
+
+def start_render_workers() -> None:
+    """Create the QR rendering process pool"""
+    global render_executor
+    render_executor = ProcessPoolExecutor(
+        max_workers=settings.QR_RENDER_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+def stop_render_workers() -> None:
+    """Shut the rendering pool down without waiting for queued renders"""
+    global render_executor
+    if render_executor is not None:
+        render_executor.shutdown(wait=False, cancel_futures=True)
+    render_executor = None
+
+def render_pool() -> ProcessPoolExecutor:
+    """503 while the rendering pool is not running"""
+    if render_executor is None:
+        raise HTTPException(status_code=503, detail="QR render workers are not running")
+    return render_executor
+
 # Health check
 @router.get("/health")
 async def health_check():
@@ -37,24 +106,74 @@ def generate_qr_code(product_id: int, variant_id: Optional[int] = None) -> str:
         base += f"_VARIANT_{variant_id}"
     return f"{base}_{uuid.uuid4().hex[:8].upper()}"
 
-# Helper function to create QR code image
-def create_qr_code_image(qr_code: str) -> str:
-    """Create a QR code image and return as base64"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(qr_code)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64
-    buffer = io.BytesIO()
-    img.save(buffer)
-    return base64.b64encode(buffer.getvalue()).decode()
+# Helper function to reserve product unit ids
+def allocate_unit_ids(db: Session, count: int = 1) -> List[int]:
+    """Take the next product unit ids, so signed QR codes can include them before the insert"""
+    sequence = func.pg_get_serial_sequence(ProductUnit.__table__.fullname, "id")
+    return list(db.scalars(select(func.nextval(sequence)).select_from(func.generate_series(1, count))))
+
+def check_signable_ids(product_id: int, variant_id: Optional[int]) -> None:
+    """400 when codes are signed and the ids do not fit in a signed code"""
+    if qr_signer is None or not qr_signer.can_sign:
+        return
+    try:
+        check_ids(product_id, variant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Helper function to insert many product units at once
+def insert_product_units(db: Session, product_id: int, variant_id: Optional[int], count: int) -> List[ProductUnit]:
+    """Insert count units with new QR codes and hashes using multi-row INSERTs
+
+    Codes that collide with existing ones are skipped by the insert and
+    generated again. The caller commits.
+    """
+    signing = qr_signer is not None and qr_signer.can_sign
+    statement = pg_insert(ProductUnit).on_conflict_do_nothing(index_elements=["qr_code"]).returning(ProductUnit)
+    units: List[ProductUnit] = []
+    while len(units) < count:
+        missing = count - len(units)
+        if signing:
+            rows = [
+                {"id": unit_id, "qr_code": qr_signer.sign(product_id, variant_id, unit_id)}
+                for unit_id in allocate_unit_ids(db, missing)
+            ]
+        else:
+            rows = [{"qr_code": generate_qr_code(product_id, variant_id)} for _ in range(missing)]
+        for row in rows:
+            row.update(
+                product_id=product_id,
+                variant_id=variant_id,
+                blockchain_hash=generate_blockchain_hash(product_id, variant_id)
+            )
+        units.extend(db.scalars(statement, rows))
+    units.sort(key=lambda unit: unit.id)
+    return units
+
+def iter_generated_units(batch: ProductUnitBatchCreate) -> Iterator[bytes]:
+    """Insert a batch chunk by chunk, yielding each committed chunk as NDJSON"""
+    db = SessionLocal()
+    created = 0
+    try:
+        while created < batch.count:
+            size = min(settings.PRODUCT_UNIT_BATCH_CHUNK_SIZE, batch.count - created)
+            try:
+                units = insert_product_units(db, batch.product_id, batch.variant_id, size)
+                # Read the rows before the commit expires them
+                lines = b"".join(ProductUnitResponse.model_validate(unit, from_attributes=True).model_dump_json().encode() + b"\n" for unit in units)
+                qr_codes = [unit.qr_code for unit in units]
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Product unit batch failed after {created} units: {e}")
+                yield json.dumps({"error": "Failed to generate product units", "created": created}).encode() + b"\n"
+                return
+            verification_cache.add_codes(qr_codes)
+            db.expunge_all()
+            created += size
+            yield lines
+    finally:
+        db.close()
 
 # Product unit endpoints
 @router.post("/product-units", response_model=ProductUnitResponse)
@@ -69,6 +188,7 @@ async def create_product_unit(unit: ProductUnitCreate, db: Session = Depends(get
     db.add(db_unit)
     db.commit()
     db.refresh(db_unit)
+    verification_cache.add(db_unit)
     return db_unit
 
 @router.post("/product-units/generate", response_model=ProductUnitResponse)
@@ -78,12 +198,19 @@ async def generate_product_unit(
     db: Session = Depends(get_db)
 ):
     """Generate a new product unit with QR code and blockchain hash"""
+    check_signable_ids(product_id, variant_id)
     # Generate QR code and blockchain hash
-    qr_code = generate_qr_code(product_id, variant_id)
+    unit_id = None
+    if qr_signer and qr_signer.can_sign:
+        unit_id = allocate_unit_ids(db)[0]
+        qr_code = qr_signer.sign(product_id, variant_id, unit_id)
+    else:
+        qr_code = generate_qr_code(product_id, variant_id)
     blockchain_hash = generate_blockchain_hash(product_id, variant_id)
     
     # Create product unit
     db_unit = ProductUnit(
+        id=unit_id,
         product_id=product_id,
         variant_id=variant_id,
         qr_code=qr_code,
@@ -92,8 +219,31 @@ async def generate_product_unit(
     db.add(db_unit)
     db.commit()
     db.refresh(db_unit)
+    verification_cache.add(db_unit)
     return db_unit
 
+@router.post("/product-units/generate-batch")
+async def generate_product_unit_batch(batch: ProductUnitBatchCreate):
+    """Generate a batch of product units, streamed back as NDJSON
+    
+    Units are inserted and committed in chunks, and each chunk is streamed
+    as soon as it is committed, one unit per line. If a chunk fails the
+    stream ends with an {"error", "created"} line; units of earlier chunks
+    stay registered.
+    
+    The batch is not atomic: if the client disconnects, generation stops
+    but every chunk committed so far (including one the client never
+    received) stays registered. Check the product's units before retrying,
+    since a retry generates a whole new batch.
+    """
+    if batch.count > settings.PRODUCT_UNIT_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.PRODUCT_UNIT_BATCH_MAX} units can be generated per batch"
+        )
+    check_signable_ids(batch.product_id, batch.variant_id)
+    return StreamingResponse(iter_generated_units(batch), media_type="application/x-ndjson")
+
 @router.get("/product-units", response_model=List[ProductUnitResponse])
 async def get_product_units(
     product_id: Optional[int] = None,
@@ -101,9 +251,14 @@ async def get_product_units(
     is_used: Optional[bool] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get all product units with optional filters"""
+    """Get all product units with optional filters
+
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next
+    page by keyset instead of offset.
+    """
     query = db.query(ProductUnit)
     
     # Apply filters
@@ -114,8 +269,23 @@ async def get_product_units(
     if is_used is not None:
         query = query.filter(ProductUnit.is_used == is_used)
     
-    units = query.offset(skip).limit(limit).all()
-    return units
+    query = query.order_by(ProductUnit.id)
+    if cursor:
+        query = query.filter(ProductUnit.id > decode_id_cursor(cursor))
+    else:
+        query = query.offset(skip)
+    units = query.limit(limit).all()
+    
+    cursor_value = next_cursor(units, limit, "id")
+    headers = {NEXT_CURSOR_HEADER: cursor_value} if cursor_value else None
+    return model_response(List[ProductUnitResponse], units, headers)
+
+@router.get("/product-units/signing-keys", response_model=QRSigningKeysResponse)
+async def get_signing_keys():
+    """Public keys for verifying signed QR codes offline (Ed25519 only)"""
+    if qr_signer is None:
+        return QRSigningKeysResponse()
+    return QRSigningKeysResponse(algorithm=qr_signer.algorithm, keys=qr_signer.public_keys())
 
 @router.get("/product-units/{unit_id}", response_model=ProductUnitResponse)
 async def get_product_unit(unit_id: int, db: Session = Depends(get_db)):
@@ -127,21 +297,48 @@ async def get_product_unit(unit_id: int, db: Session = Depends(get_db)):
 
 @router.post("/product-units/verify", response_model=QRVerifyResponse)
 async def verify_qr_code(verify_request: QRVerifyRequest, db: Session = Depends(get_db)):
-    """Verify a QR code"""
-    unit = db.query(ProductUnit).filter(ProductUnit.qr_code == verify_request.qr_code).first()
+    """Verify a QR code
     
-    if not unit:
-        return QRVerifyResponse(
-            is_valid=False,
-            message="Invalid QR code"
-        )
+    Signed codes are checked cryptographically first, so forged ones never
+    reach the database; with check_status=false an authentic signed code
+    is answered from its signature alone. Recently verified codes and
+    codes that cannot exist are answered from the in-memory verification
+    cache.
+    """
+    qr_code = verify_request.qr_code
+    signed = None
+    if qr_signer and is_signed(qr_code):
+        signed = qr_signer.verify(qr_code)
+        if signed is None:
+            return QRVerifyResponse(
+                is_valid=False,
+                message="Invalid QR code signature"
+            )
+        if not verify_request.check_status:
+            return QRVerifyResponse(
+                is_valid=True,
+                product_id=signed.product_id,
+                variant_id=signed.variant_id,
+                message="QR code signature verified"
+            )
+    
+    result = verification_cache.get(qr_code)
+    if result is None:
+        unit = None
+        # An authentic signature already shows the code was issued here
+        if signed or verification_cache.might_exist(db, qr_code):
+            unit = db.query(ProductUnit).filter(ProductUnit.qr_code == qr_code).first()
+        
+        if not unit:
+            return QRVerifyResponse(
+                is_valid=False,
+                message="Invalid QR code"
+            )
+        result = verification_cache.put(unit)
     
     return QRVerifyResponse(
         is_valid=True,
-        product_id=unit.product_id,
-        variant_id=unit.variant_id,
-        is_used=unit.is_used,
-        blockchain_hash=unit.blockchain_hash,
+        **result,
         message="QR code verified successfully"
     )
 
@@ -159,22 +356,98 @@ async def mark_unit_as_used(unit_id: int, db: Session = Depends(get_db)):
     unit.used_at = datetime.utcnow()
     db.commit()
     db.refresh(unit)
+    verification_cache.put(unit)
     
     return {"message": "Product unit marked as used"}
 
 @router.get("/product-units/{unit_id}/qr-image")
-async def get_qr_code_image(unit_id: int, db: Session = Depends(get_db)):
-    """Get QR code image for a product unit"""
-    unit = db.query(ProductUnit).filter(ProductUnit.id == unit_id).first()
+async def get_qr_code_image(
+    unit_id: int,
+    request: Request,
+    format: Literal["json", "png"] = "json",
+    box_size: int = Query(10, ge=1, le=20),
+    border: int = Query(4, ge=0, le=10),
+    db: Session = Depends(get_db)
+):
+    """Get QR code image for a product unit
+    
+    format=png returns the image itself; the default wraps it as base64 in JSON.
+    Images are cached, and a matching If-None-Match gets a 304.
+    """
+    unit = db.query(ProductUnit.qr_code).filter(ProductUnit.id == unit_id).first()
     if not unit:
         raise HTTPException(status_code=404, detail="Product unit not found")
     
-    qr_image = create_qr_code_image(unit.qr_code)
+    # Known from the code alone, so a revalidation never loads or renders the image.
+    # The JSON body is derived from the same bytes, but is a different representation
+    etag = QRImageCache.etag(unit.qr_code, box_size, border, "" if format == "png" else "json")
+    headers = cache_headers(etag, settings.CACHE_CONTROL_QR_IMAGE)
+    if etag_matches(request, etag):
+        return not_modified(headers)
+    
+    image = await qr_image_cache.get(render_pool(), unit.qr_code, box_size, border)
+    if format == "png":
+        return Response(image.png, media_type="image/png", headers=headers)
     
-    return {
+    return ORJSONResponse({
         "qr_code": unit.qr_code,
-        "qr_image": qr_image
-    }
+        "qr_image": base64.b64encode(image.png).decode()
+    }, headers=headers)
+
+@router.post("/product-units/qr-sheets", response_model=QRSheetResponse)
+async def render_qr_sheets(sheet: QRSheetRequest, db: Session = Depends(get_db)):
+    """Render print-ready label sheets (columns x rows labels per page)
+    
+    Pages are rendered in worker processes and streamed back as they are
+    done, as a PDF or a ZIP of PNG pages. With destination=storage the
+    file is uploaded to object storage instead and its URL returned.
+    """
+    query = db.query(ProductUnit.id, ProductUnit.product_id, ProductUnit.variant_id, ProductUnit.qr_code)
+    if sheet.unit_ids is not None:
+        query = query.filter(ProductUnit.id.in_(sheet.unit_ids))
+    elif sheet.product_id is not None:
+        query = query.filter(ProductUnit.product_id == sheet.product_id)
+        if sheet.variant_id is not None:
+            query = query.filter(ProductUnit.variant_id == sheet.variant_id)
+        if sheet.min_unit_id is not None:
+            query = query.filter(ProductUnit.id >= sheet.min_unit_id)
+        if sheet.max_unit_id is not None:
+            query = query.filter(ProductUnit.id <= sheet.max_unit_id)
+    else:
+        raise HTTPException(status_code=400, detail="Pass unit_ids or product_id")
+    
+    units = query.order_by(ProductUnit.id).limit(settings.QR_SHEET_MAX_UNITS + 1).all()
+    if not units:
+        raise HTTPException(status_code=404, detail="No product units found")
+    if len(units) > settings.QR_SHEET_MAX_UNITS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.QR_SHEET_MAX_UNITS} units can be printed per request"
+        )
+    
+    labels = [
+        (unit.qr_code, f"#{unit.id} P{unit.product_id}" + (f" V{unit.variant_id}" if unit.variant_id else ""))
+        for unit in units
+    ]
+    layout = SheetLayout(sheet.page_size, sheet.dpi, sheet.columns, sheet.rows)
+    pages = [labels[i:i + layout.labels_per_page] for i in range(0, len(labels), layout.labels_per_page)]
+    writer = SHEET_WRITERS[sheet.format](layout)
+    chunks = iter_sheet(render_pool(), writer, pages, layout, window=2 * settings.QR_RENDER_WORKERS)
+    
+    if sheet.destination == "storage":
+        key = f"qr-sheets/{uuid.uuid4().hex}.{writer.extension}"
+        try:
+            url = await save_sheet(chunks, get_storage(), key, writer.content_type)
+        except Exception as e:
+            logger.error(f"Failed to store QR sheet {key}: {e}")
+            raise HTTPException(status_code=502, detail="Failed to store QR sheet")
+        return QRSheetResponse(url=url, key=key, content_type=writer.content_type, pages=len(pages), units=len(units))
+    
+    return StreamingResponse(
+        chunks,
+        media_type=writer.content_type,
+        headers={"Content-Disposition": f'attachment; filename="qr-labels.{writer.extension}"'}
+    )
 
 # Own product endpoints
 @router.post("/own-products", response_model=OwnProductResponse)
@@ -203,13 +476,13 @@ async def get_owner_products(
         query = query.filter(OwnProduct.is_seller == is_seller)
     
     own_products = query.all()
-    return own_products
+    return model_response(List[OwnProductResponse], own_products)
 
 @router.get("/own-products/product/{product_id}", response_model=List[OwnProductResponse])
 async def get_product_owners(product_id: int, db: Session = Depends(get_db)):
     """Get all owners of a product"""
     own_products = db.query(OwnProduct).filter(OwnProduct.product_id == product_id).all()
-    return own_products
+    return model_response(List[OwnProductResponse], own_products)
 
 @router.delete("/own-products/{own_id}")
 async def delete_own_product(own_id: int, db: Session = Depends(get_db)):
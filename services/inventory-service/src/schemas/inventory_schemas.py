@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class ProductUnitBase(BaseModel):
@@ -11,6 +11,11 @@ class ProductUnitBase(BaseModel):
 class ProductUnitCreate(ProductUnitBase):
     pass
 
+class ProductUnitBatchCreate(BaseModel):
+    product_id: int
+    variant_id: Optional[int] = None
+    count: int = Field(..., gt=0)
+
 class ProductUnitResponse(ProductUnitBase):
     id: int
     is_used: bool
@@ -37,6 +42,8 @@ class OwnProductResponse(OwnProductBase):
 
 class QRVerifyRequest(BaseModel):
     qr_code: str
+    # False answers signed codes from their signature alone, without is_used/blockchain_hash
+    check_status: bool = True
 
 class QRVerifyResponse(BaseModel):
     is_valid: bool
@@ -44,4 +51,34 @@ class QRVerifyResponse(BaseModel):
     variant_id: Optional[int] = None
     is_used: Optional[bool] = None
     blockchain_hash: Optional[str] = None
-    message: str
\ No newline at end of file
+    message: str
+
+class QRSigningKey(BaseModel):
+    key_id: int
+    public_key: str  # Base64 raw Ed25519 public key
+
+class QRSigningKeysResponse(BaseModel):
+    algorithm: Optional[str] = None  # None when codes are not signed
+    format: str = "SV1"
+    keys: List[QRSigningKey] = []
+
+class QRSheetRequest(BaseModel):
+    # Units to print: unit_ids, or a product (optionally one variant and an id range)
+    unit_ids: Optional[List[int]] = None
+    product_id: Optional[int] = None
+    variant_id: Optional[int] = None
+    min_unit_id: Optional[int] = None
+    max_unit_id: Optional[int] = None
+    format: Literal["pdf", "png"] = "pdf"  # png: a ZIP with one PNG per page
+    page_size: Literal["A4", "letter"] = "A4"
+    columns: int = Field(4, ge=1, le=20)
+    rows: int = Field(6, ge=1, le=30)
+    dpi: int = Field(300, ge=72, le=600)
+    destination: Literal["stream", "storage"] = "stream"
+
+class QRSheetResponse(BaseModel):
+    url: str
+    key: str
+    content_type: str
+    pages: int
+    units: int
\ No newline at end of file
@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from src.models import ProductUnit
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings
+
+    Sized for `capacity` items at `error_rate` false positives; membership
+    tests never give false negatives. Items cannot be removed.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        # Double hashing: k positions from two 64-bit halves
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache; entries stored without a TTL never expire"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class QRVerificationCache:
+    """Answers QR verifications from memory where it safely can
+
+    A Bloom filter of every qr_code rejects unknown codes without a query,
+    and an LRU keeps the verification result of scanned units that are
+    used. Only used units are cached: that state is final, while an
+    unused unit may be marked used by another process at any time.
+
+    Codes created by this process are added immediately. Codes created
+    elsewhere are picked up by an incremental sync, run at most every
+    `sync_interval_seconds` and only when a code is missing from the
+    filter, so a code created by another process can be reported invalid
+    for at most that long. Each sync reads the units created from
+    `sync_overlap_seconds` before the previous sync's database time.
+    created_at is the start of the inserting transaction, so a unit is
+    found as long as its transaction committed within the overlap,
+    whatever order units commit in. The whole filter is rebuilt in the
+    background every `rebuild_interval_seconds` or once it outgrows its
+    capacity. Until the first build finishes every lookup goes to the
+    database.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        enabled: bool = True,
+        max_entries: int = 100000,
+        bloom_capacity: int = 1000000,
+        bloom_error_rate: float = 0.001,
+        sync_interval_seconds: float = 2,
+        sync_overlap_seconds: float = 60,
+        rebuild_interval_seconds: float = 900
+    ):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.sync_interval_seconds = sync_interval_seconds
+        self.sync_overlap_seconds = sync_overlap_seconds
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self.results = LRUCache(max_entries)
+        self._bloom: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending: Optional[List[str]] = None  # codes added while a rebuild runs
+        self._synced_until: Optional[datetime] = None  # database time the last sync or build started at
+        self._synced_at = 0.0
+        self._rebuilt_at = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    def get(self, qr_code: str) -> Optional[Dict[str, Any]]:
+        """Cached verification result of a unit, None if not cached"""
+        if not self.enabled:
+            return None
+        return self.results.get(qr_code)
+
+    def put(self, unit: ProductUnit) -> Dict[str, Any]:
+        """Return the verification result of a unit, caching it once the unit is used"""
+        result = {
+            "product_id": unit.product_id,
+            "variant_id": unit.variant_id,
+            "is_used": bool(unit.is_used),
+            "blockchain_hash": unit.blockchain_hash
+        }
+        if self.enabled and result["is_used"]:
+            self.results.set(unit.qr_code, result)
+        return result
+
+    def add(self, unit: ProductUnit) -> None:
+        """Record a newly committed unit"""
+        self.add_codes([unit.qr_code])
+
+    def add_codes(self, qr_codes: Iterable[str]) -> None:
+        """Record the codes of newly committed units"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for qr_code in qr_codes:
+                self._add_code(qr_code)
+
+    def might_exist(self, db: Session, qr_code: str) -> bool:
+        """False only if no unit has this code; True means look it up"""
+        if not self.enabled:
+            return True
+        now = time.monotonic()
+        bloom = self._bloom
+        if bloom is None:
+            # Retry a failed build no more often than syncs run
+            rebuild_due = now - self._rebuilt_at >= self.sync_interval_seconds
+        else:
+            rebuild_due = now - self._rebuilt_at >= self.rebuild_interval_seconds or bloom.count > bloom.capacity
+        if rebuild_due:
+            self.start_rebuild()
+        if bloom is None or qr_code in bloom:
+            return True
+        if now - self._synced_at < self.sync_interval_seconds:
+            return False
+        self.sync(db)
+        return qr_code in self._bloom
+
+    def sync(self, db: Session) -> None:
+        """Load units committed since the last sync into the filter"""
+        with self._lock:
+            if self._synced_until is None:
+                return
+            since = self._synced_until - timedelta(seconds=self.sync_overlap_seconds)
+            self._synced_at = time.monotonic()
+        # Read before the units, so the next sync's window covers everything this one misses
+        started = db.scalar(select(func.localtimestamp()))
+        rows = db.query(ProductUnit.qr_code).filter(ProductUnit.created_at >= since).all()
+        with self._lock:
+            for (qr_code,) in rows:
+                self._add_code(qr_code)
+            self._synced_until = max(self._synced_until, started)
+
+    def start_rebuild(self) -> None:
+        """Rebuild the filter in a background thread unless one is running"""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._pending = []
+        threading.Thread(target=self._rebuild, name="qr-bloom-rebuild", daemon=True).start()
+
+    def _rebuild(self) -> None:
+        try:
+            db = self.session_factory()
+            try:
+                started = db.scalar(select(func.localtimestamp()))
+                count = db.query(func.count(ProductUnit.id)).scalar() or 0
+                bloom = BloomFilter(max(self.bloom_capacity, count * 2), self.bloom_error_rate)
+                for (qr_code,) in db.query(ProductUnit.qr_code).yield_per(10000):
+                    bloom.add(qr_code)
+            finally:
+                db.close()
+            with self._lock:
+                for qr_code in self._pending:
+                    bloom.add(qr_code)
+                self._bloom = bloom
+                self._synced_until = max(self._synced_until or started, started)
+                self._synced_at = time.monotonic()
+            logger.info(f"QR verification filter rebuilt with {bloom.count} codes")
+        except Exception as e:
+            logger.error(f"QR verification filter rebuild failed: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._pending = None
+                self._rebuilt_at = time.monotonic()
+
+    def _add_code(self, qr_code: str) -> None:
+        # Caller holds self._lock
+        if self._bloom is not None:
+            self._bloom.add(qr_code)
+        if self._pending is not None:
+            self._pending.append(qr_code)
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import Executor
+from typing import Callable, Dict, NamedTuple, Optional, Set
+
+from src.utils.qr_cache import LRUCache
+from src.utils.qr_render import render_qr_png
+from src.utils.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Part of every cache key; bump it when render_qr_png output changes so
+# images rendered by the old code are not served again
+RENDER_VERSION = 1
+
+
+class RenderedQR(NamedTuple):
+    png: bytes
+    etag: str
+
+
+class QRImageCache:
+    """Rendered QR code PNGs, keyed by code and render parameters
+
+    A code's image never changes, so entries never expire: memory holds
+    the `max_entries` most recently used images. With `storage`, images
+    are also kept in object storage, shared by all processes and kept
+    across restarts; a memory miss reads from there before rendering.
+    Concurrent requests for the same image share one render. ETags are
+    derived from the cache key, so a request can be answered with a 304
+    before the image is looked up or rendered.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_entries: int = 10000,
+        storage: Optional[Callable[[], StorageBackend]] = None,
+        prefix: str = "qr-images"
+    ):
+        self.enabled = enabled
+        self.storage = storage
+        self.prefix = prefix
+        self.images = LRUCache(max_entries)
+        self._rendering: Dict[str, asyncio.Future] = {}
+        self._storing: Set[asyncio.Future] = set()  # uploads still running, kept so they are not lost
+
+    @staticmethod
+    def key(qr_code: str, box_size: int, border: int) -> str:
+        raw = f"{RENDER_VERSION}:{box_size}:{border}:{qr_code}".encode()
+        return hashlib.sha256(raw).hexdigest()
+
+    @classmethod
+    def etag(cls, qr_code: str, box_size: int = 10, border: int = 4, variant: str = "") -> str:
+        """Strong ETag of an image; `variant` tells apart representations of it"""
+        key = cls.key(qr_code, box_size, border)
+        return f'"{key}-{variant}"' if variant else f'"{key}"'
+
+    async def get(self, executor: Executor, qr_code: str, box_size: int = 10, border: int = 4) -> RenderedQR:
+        """The image of a code, rendering it in `executor` if no tier has it"""
+        if not self.enabled:
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(executor, render_qr_png, qr_code, box_size, border)
+            return RenderedQR(png, self.etag(qr_code, box_size, border))
+
+        key = self.key(qr_code, box_size, border)
+        image = self.images.get(key)
+        if image is not None:
+            return image
+        task = self._rendering.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(executor, key, qr_code, box_size, border))
+            self._rendering[key] = task
+            task.add_done_callback(lambda _: self._rendering.pop(key, None))
+        # Shielded so one client going away does not cancel the render for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, executor: Executor, key: str, qr_code: str, box_size: int, border: int) -> RenderedQR:
+        loop = asyncio.get_running_loop()
+        storage = self.storage() if self.storage is not None else None
+        storage_key = f"{self.prefix}/{key}.png"
+        png = None
+        if storage is not None:
+            try:
+                png = await loop.run_in_executor(None, storage.get, storage_key)
+            except Exception as e:
+                # Usually not stored yet; an unreachable store only costs a render
+                logger.debug(f"QR image {storage_key} not read from storage: {e}")
+        if png is None:
+            png = await loop.run_in_executor(executor, render_qr_png, qr_code, box_size, border)
+            if storage is not None:
+                # Not awaited: the image is served while it is being stored
+                upload = loop.run_in_executor(None, storage.put, storage_key, png, "image/png")
+                self._storing.add(upload)
+                upload.add_done_callback(lambda done: self._stored(done, storage_key))
+        image = RenderedQR(png, self.etag(qr_code, box_size, border))
+        self.images.set(key, image)
+        return image
+
+    def _stored(self, upload: asyncio.Future, storage_key: str) -> None:
+        self._storing.discard(upload)
+        if upload.cancelled():
+            logger.error(f"Storing QR image {storage_key} was cancelled")
+        elif upload.exception() is not None:
+            logger.error(f"Failed to store QR image {storage_key}: {upload.exception()}")
@@ -0,0 +1,100 @@
+import io
+import zlib
+from typing import List, NamedTuple, Tuple
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+# Page sizes in inches
+PAGE_SIZES = {
+    "A4": (8.27, 11.69),
+    "letter": (8.5, 11.0),
+}
+PAGE_MARGIN_INCHES = 0.4
+
+# (QR code, caption printed under it)
+Label = Tuple[str, str]
+
+
+class SheetLayout(NamedTuple):
+    page_size: str = "A4"
+    dpi: int = 300
+    columns: int = 4
+    rows: int = 6
+
+    @property
+    def labels_per_page(self) -> int:
+        return self.columns * self.rows
+
+
+def render_qr_png(qr_code: str, box_size: int = 10, border: int = 4) -> bytes:
+    """PNG of a single QR code"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(qr_code)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer)
+    return buffer.getvalue()
+
+def _font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has only the fixed-size bitmap font
+        return ImageFont.load_default()
+
+def render_sheet_page(labels: List[Label], layout: SheetLayout) -> Image.Image:
+    """Draw one page of labels, left to right and top to bottom, as a 1-bit image
+
+    Codes use medium error correction and the standard four-module quiet
+    zone, scaled by a whole number of pixels per module to fill their cell.
+    """
+    width_inches, height_inches = PAGE_SIZES[layout.page_size]
+    width, height = round(width_inches * layout.dpi), round(height_inches * layout.dpi)
+    margin = round(PAGE_MARGIN_INCHES * layout.dpi)
+    cell_width = (width - 2 * margin) // layout.columns
+    cell_height = (height - 2 * margin) // layout.rows
+
+    page = Image.new("1", (width, height), 1)
+    draw = ImageDraw.Draw(page)
+    font = _font(max(10, layout.dpi // 12))
+    caption_height = draw.textbbox((0, 0), "#0", font=font)[3] + layout.dpi // 30
+
+    for index, (qr_code, caption) in enumerate(labels[:layout.labels_per_page]):
+        left = margin + (index % layout.columns) * cell_width
+        top = margin + (index // layout.columns) * cell_height
+
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=4)
+        qr.add_data(qr_code)
+        qr.make(fit=True)
+        # One pixel per module, scaled up without smoothing (much faster than drawing each module)
+        matrix = qr.get_matrix()
+        image = Image.new("1", (len(matrix), len(matrix)))
+        image.putdata([0 if dark else 1 for row in matrix for dark in row])
+        box_size = max(1, min(cell_width, cell_height - caption_height) // len(matrix))
+        image = image.resize((len(matrix) * box_size, len(matrix) * box_size), Image.NEAREST)
+        page.paste(image, (left + (cell_width - image.width) // 2, top))
+
+        if caption:
+            text_width = draw.textlength(caption, font=font)
+            draw.text((left + (cell_width - text_width) / 2, top + image.height), caption, font=font, fill=0)
+    return page
+
+def render_sheet_png(labels: List[Label], layout: SheetLayout) -> bytes:
+    """One page as PNG; CPU-bound, meant to run in a worker process"""
+    buffer = io.BytesIO()
+    render_sheet_page(labels, layout).save(buffer, "PNG", dpi=(layout.dpi, layout.dpi))
+    return buffer.getvalue()
+
+def render_sheet_raster(labels: List[Label], layout: SheetLayout) -> Tuple[int, int, bytes]:
+    """One page as (width, height, Flate-compressed 1-bit rows) for a PDF image
+
+    CPU-bound, meant to run in a worker process. Set bits are white, as
+    in a PDF DeviceGray image with one bit per component.
+    """
+    page = render_sheet_page(labels, layout)
+    return page.width, page.height, zlib.compress(page.tobytes(), 6)
@@ -0,0 +1,162 @@
+import asyncio
+import io
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from src.utils.qr_render import Label, SheetLayout, render_sheet_png, render_sheet_raster
+from src.utils.storage import StorageBackend
+
+
+class PdfSheetWriter:
+    """Writes a PDF page by page, so a sheet can be streamed while it renders
+
+    Every page is a single 1-bit image. Object 1 is the catalog and 2 the
+    page tree, which is written last, once all page ids are known.
+    """
+
+    content_type = "application/pdf"
+    extension = "pdf"
+    render = staticmethod(render_sheet_raster)
+
+    def __init__(self, layout: SheetLayout):
+        self.dpi = layout.dpi
+        self._offset = 0
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        self._next_id = 3
+
+    def _write(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def _object(self, object_id: int, entries: str, stream: Optional[bytes] = None) -> bytes:
+        self._offsets[object_id] = self._offset
+        if stream is None:
+            return self._write(f"{object_id} 0 obj\n<< {entries} >>\nendobj\n".encode())
+        header = f"{object_id} 0 obj\n<< {entries} /Length {len(stream)} >>\nstream\n".encode()
+        return self._write(header + stream + b"\nendstream\nendobj\n")
+
+    def start(self) -> bytes:
+        return self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_page(self, page: Tuple[int, int, bytes]) -> bytes:
+        width, height, raster = page
+        image_id, content_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+        self._page_ids.append(page_id)
+        # Image pixels to points
+        width_pt, height_pt = width * 72 / self.dpi, height * 72 / self.dpi
+        content = f"q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Im0 Do Q".encode()
+        return b"".join([
+            self._object(
+                image_id,
+                f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode",
+                raster
+            ),
+            self._object(content_id, "", content),
+            self._object(
+                page_id,
+                f"/Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] "
+                f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R"
+            ),
+        ])
+
+    def finish(self) -> bytes:
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        body = (
+            self._object(2, f"/Type /Pages /Kids [{kids}] /Count {len(self._page_ids)}")
+            + self._object(1, "/Type /Catalog /Pages 2 0 R")
+        )
+        xref_offset = self._offset
+        size = self._next_id
+        # Cross-reference entries are exactly 20 bytes each
+        xref = "".join(f"{self._offsets[object_id]:010d} 00000 n \n" for object_id in range(1, size))
+        tail = (
+            f"xref\n0 {size}\n0000000000 65535 f \n{xref}"
+            f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+        )
+        return body + self._write(tail.encode())
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that hands written bytes back on drain()"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipSheetWriter:
+    """A ZIP of one PNG per page, written as pages arrive
+
+    PNGs are already compressed, so entries are stored as is.
+    """
+
+    content_type = "application/zip"
+    extension = "zip"
+    render = staticmethod(render_sheet_png)
+
+    def __init__(self, layout: SheetLayout):
+        self._buffer = _ChunkBuffer()
+        self._zip = zipfile.ZipFile(self._buffer, "w", zipfile.ZIP_STORED)
+        self._pages = 0
+
+    def start(self) -> bytes:
+        return b""
+
+    def add_page(self, page: bytes) -> bytes:
+        self._pages += 1
+        self._zip.writestr(f"page-{self._pages:04d}.png", page)
+        return self._buffer.drain()
+
+    def finish(self) -> bytes:
+        self._zip.close()
+        return self._buffer.drain()
+
+
+SHEET_WRITERS = {
+    "pdf": PdfSheetWriter,
+    "png": ZipSheetWriter,
+}
+
+async def iter_sheet(executor: Executor, writer, pages: List[List[Label]], layout: SheetLayout, window: int) -> AsyncIterator[bytes]:
+    """Render pages in the executor, at most `window` at a time, and yield the file in page order"""
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    try:
+        yield writer.start()
+        for labels in pages:
+            pending.append(loop.run_in_executor(executor, writer.render, labels, layout))
+            if len(pending) >= window:
+                yield writer.add_page(await pending.popleft())
+        while pending:
+            yield writer.add_page(await pending.popleft())
+        yield writer.finish()
+    finally:
+        # The client went away or rendering failed; drop pages not started yet
+        for future in pending:
+            future.cancel()
+
+async def save_sheet(chunks: AsyncIterator[bytes], storage: StorageBackend, key: str, content_type: str) -> str:
+    """Spool a rendered sheet to a temporary file, then upload it; returns the URL"""
+    loop = asyncio.get_running_loop()
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as spool:
+        async for chunk in chunks:
+            spool.write(chunk)
+        spool.seek(0)
+        return await loop.run_in_executor(None, storage.put_file, key, spool, content_type)
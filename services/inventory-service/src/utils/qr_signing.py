@@ -0,0 +1,201 @@
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+# Signed codes look like "SV1.<payload>.<signature>", both parts unpadded
+# base32, so a code stays within the QR alphanumeric character set
+SIGNED_PREFIX = "SV1."
+# key id, product id, variant id (0 = none), unit id, issued at (unix seconds)
+_PAYLOAD = struct.Struct(">BIIII")
+# Largest id the payload's unsigned 32-bit fields can hold
+MAX_SIGNED_ID = 2 ** 32 - 1
+HMAC_SIGNATURE_BYTES = 16
+
+
+class SignedQRPayload(NamedTuple):
+    key_id: int
+    product_id: int
+    variant_id: Optional[int]
+    unit_id: int
+    issued_at: int
+
+
+def is_signed(qr_code: str) -> bool:
+    return qr_code.startswith(SIGNED_PREFIX)
+
+def check_ids(product_id: int, variant_id: Optional[int], unit_id: int = 1) -> None:
+    """Raise ValueError unless the ids fit in a signed code's payload"""
+    for name, value in (("product_id", product_id), ("variant_id", variant_id), ("unit_id", unit_id)):
+        if value is not None and not 1 <= value <= MAX_SIGNED_ID:
+            raise ValueError(f"{name} must be between 1 and {MAX_SIGNED_ID} to be signed")
+
+def _b32encode(data: bytes) -> str:
+    return base64.b32encode(data).decode().rstrip("=")
+
+def _b32decode(text: str) -> bytes:
+    return base64.b32decode(text + "=" * (-len(text) % 8))
+
+
+class QRSigner:
+    """Issues and checks signed QR codes
+
+    Verification needs no database: a code is authentic when its
+    signature matches one of the verification keys, picked by the key id
+    in the payload. Keeping old keys in the verification set lets the
+    signing key be rotated without invalidating printed labels.
+    """
+
+    algorithm = ""
+
+    def __init__(self, key_id: int):
+        if not 0 <= key_id <= 255:
+            raise ValueError("QR signing key id must be between 0 and 255")
+        self.key_id = key_id
+
+    @property
+    def can_sign(self) -> bool:
+        return True
+
+    def sign(self, product_id: int, variant_id: Optional[int], unit_id: int, issued_at: Optional[int] = None) -> str:
+        """Signed code of a unit; raises ValueError for ids outside the payload's range"""
+        check_ids(product_id, variant_id, unit_id)
+        payload = _PAYLOAD.pack(self.key_id, product_id, variant_id or 0, unit_id, int(issued_at or time.time()))
+        signed_part = SIGNED_PREFIX + _b32encode(payload)
+        return f"{signed_part}.{_b32encode(self._sign(signed_part.encode()))}"
+
+    def verify(self, qr_code: str) -> Optional[SignedQRPayload]:
+        """Payload of an authentic signed code, None for anything else"""
+        signed_part, _, signature = qr_code.rpartition(".")
+        if not is_signed(signed_part):
+            return None
+        payload_text = signed_part[len(SIGNED_PREFIX):]
+        try:
+            payload = _b32decode(payload_text)
+            key_id, product_id, variant_id, unit_id, issued_at = _PAYLOAD.unpack(payload)
+            signature_bytes = _b32decode(signature)
+        except (ValueError, struct.error):
+            return None
+        # Decoding ignores the unused bits of the last character; only the
+        # canonical spelling is valid, so each unit has exactly one code
+        if _b32encode(payload) != payload_text or _b32encode(signature_bytes) != signature:
+            return None
+        if not self._verify(key_id, signed_part.encode(), signature_bytes):
+            return None
+        return SignedQRPayload(key_id, product_id, variant_id or None, unit_id, issued_at)
+
+    def public_keys(self) -> List[Dict[str, object]]:
+        """Keys clients can use to verify codes offline (none for shared secrets)"""
+        return []
+
+    def _sign(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def _verify(self, key_id: int, data: bytes, signature: bytes) -> bool:
+        raise NotImplementedError
+
+
+class HMACSigner(QRSigner):
+    """HMAC-SHA256 (truncated to 128 bits) with shared secrets"""
+
+    algorithm = "hmac"
+
+    def __init__(self, secret: bytes, key_id: int, previous_secrets: Optional[Dict[int, bytes]] = None):
+        super().__init__(key_id)
+        self._secrets = dict(previous_secrets or {})
+        self._secrets[key_id] = secret
+
+    def _sign(self, data: bytes) -> bytes:
+        return hmac.new(self._secrets[self.key_id], data, hashlib.sha256).digest()[:HMAC_SIGNATURE_BYTES]
+
+    def _verify(self, key_id: int, data: bytes, signature: bytes) -> bool:
+        secret = self._secrets.get(key_id)
+        if secret is None:
+            return False
+        expected = hmac.new(secret, data, hashlib.sha256).digest()[:HMAC_SIGNATURE_BYTES]
+        return hmac.compare_digest(expected, signature)
+
+
+class Ed25519Signer(QRSigner):
+    """Ed25519 signatures; the public keys can be handed to edge and mobile clients
+
+    `private_key` is the raw 32-byte seed; without it the signer can only
+    verify. Needs the cryptography package.
+    """
+
+    algorithm = "ed25519"
+
+    def __init__(self, private_key: Optional[bytes], key_id: int, previous_public_keys: Optional[Dict[int, bytes]] = None):
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+        super().__init__(key_id)
+        self._private_key = Ed25519PrivateKey.from_private_bytes(private_key) if private_key else None
+        self._public_keys = {
+            previous_id: Ed25519PublicKey.from_public_bytes(public_key)
+            for previous_id, public_key in (previous_public_keys or {}).items()
+        }
+        if self._private_key is not None:
+            self._public_keys[key_id] = self._private_key.public_key()
+
+    @property
+    def can_sign(self) -> bool:
+        return self._private_key is not None
+
+    def _sign(self, data: bytes) -> bytes:
+        if self._private_key is None:
+            raise RuntimeError("No Ed25519 private key configured, codes can only be verified")
+        return self._private_key.sign(data)
+
+    def _verify(self, key_id: int, data: bytes, signature: bytes) -> bool:
+        from cryptography.exceptions import InvalidSignature
+        public_key = self._public_keys.get(key_id)
+        if public_key is None:
+            return False
+        try:
+            public_key.verify(signature, data)
+        except InvalidSignature:
+            return False
+        return True
+
+    def public_keys(self) -> List[Dict[str, object]]:
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+        return [
+            {"key_id": key_id, "public_key": base64.b64encode(public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)).decode()}
+            for key_id, public_key in sorted(self._public_keys.items())
+        ]
+
+
+def _parse_previous_keys(value: str, decode) -> Dict[int, bytes]:
+    """Parse "key_id:key,key_id:key" """
+    keys = {}
+    for item in value.split(","):
+        if item.strip():
+            key_id, _, key = item.strip().partition(":")
+            keys[int(key_id)] = decode(key)
+    return keys
+
+def create_signer(algorithm: str, key: str, key_id: int = 1, previous_keys: str = "") -> Optional[QRSigner]:
+    """Build the signer named by configuration; None when signing is off
+
+    For "hmac", key and previous keys are shared secrets; for "ed25519",
+    key is the base64 private key seed and previous keys are base64
+    public keys. Raises when keys are configured but no signer can be
+    built from them, rather than silently issuing unsigned codes.
+    """
+    if algorithm == "none" or (not key and not previous_keys):
+        return None
+    if algorithm not in ("hmac", "ed25519"):
+        raise ValueError(f"Unknown QR signing algorithm {algorithm!r}, expected 'hmac', 'ed25519' or 'none'")
+    if algorithm == "hmac" and not key:
+        raise ValueError("HMAC QR signing needs QR_SIGNING_KEY; previous keys alone cannot sign codes")
+    try:
+        if algorithm == "ed25519":
+            return Ed25519Signer(
+                base64.b64decode(key, validate=True) if key else None,
+                key_id,
+                _parse_previous_keys(previous_keys, lambda value: base64.b64decode(value, validate=True))
+            )
+        return HMACSigner(key.encode(), key_id, _parse_previous_keys(previous_keys, str.encode))
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize {algorithm} QR signing: {e}") from e
@@ -0,0 +1,65 @@
+import time
+from types import SimpleNamespace
+
+from src.utils.qr_cache import BloomFilter, LRUCache, QRVerificationCache
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    codes = [f"QR_{i}" for i in range(1000)]
+    for code in codes:
+        bloom.add(code)
+    assert all(code in bloom for code in codes)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(f"QR_{i}")
+    false_positives = sum(f"OTHER_{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_bloom_filter_sizing():
+    bloom = BloomFilter(1000, 0.001)
+    # About 14.4 bits and 10 hashes per item at 0.1%
+    assert 14000 <= bloom.size <= 14500
+    assert bloom.hash_count == 10
+    assert "anything" not in BloomFilter(0)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def unit(qr_code, is_used):
+    return SimpleNamespace(qr_code=qr_code, product_id=1, variant_id=None, is_used=is_used, blockchain_hash="h")
+
+
+def test_only_used_units_are_cached():
+    cache = QRVerificationCache(session_factory=None)
+    assert cache.put(unit("A", False))["is_used"] is False
+    assert cache.get("A") is None
+    cache.put(unit("A", True))
+    assert cache.get("A")["is_used"] is True
+
+
+def test_lookups_go_to_the_database_until_the_filter_is_built():
+    cache = QRVerificationCache(session_factory=None, sync_interval_seconds=3600, rebuild_interval_seconds=3600)
+    # A build just failed, so none is retried during the test
+    cache._rebuilt_at = time.monotonic()
+    assert cache.might_exist(None, "X")
+
+    cache._bloom = BloomFilter(100)
+    cache.add_codes(["KNOWN"])
+    assert cache.might_exist(None, "KNOWN")
+    # A sync just ran, so a miss is answered without the database
+    cache._synced_at = time.monotonic()
+    assert not cache.might_exist(None, "UNKNOWN")
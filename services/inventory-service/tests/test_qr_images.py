@@ -0,0 +1,141 @@
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.database import get_db
+from src.routes import inventory_routes
+from src.utils import qr_image_cache as qr_image_cache_module
+from src.utils.qr_image_cache import QRImageCache
+from src.utils.storage import InMemoryStorage
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Counts renders; the PNG is a stand-in naming what was rendered"""
+    calls = []
+
+    def render_qr_png(qr_code, box_size, border):
+        calls.append(qr_code)
+        return f"{qr_code}:{box_size}:{border}".encode()
+
+    monkeypatch.setattr(qr_image_cache_module, "render_qr_png", render_qr_png)
+    return calls
+
+
+def fetch(cache, *requests):
+    async def run():
+        with ThreadPoolExecutor(2) as executor:
+            return [await cache.get(executor, *request) for request in requests]
+    return asyncio.run(run())
+
+
+def test_etag_is_strong_and_names_the_rendering():
+    etag = QRImageCache.etag("QR_1")
+    assert etag == f'"{QRImageCache.key("QR_1", 10, 4)}"'
+    assert not etag.startswith("W/")
+    assert QRImageCache.etag("QR_1", 10, 4) == etag
+    assert len({etag, QRImageCache.etag("QR_2"), QRImageCache.etag("QR_1", 12), QRImageCache.etag("QR_1", 10, 2)}) == 4
+    assert QRImageCache.etag("QR_1", variant="json") == etag[:-1] + '-json"'
+
+
+def test_cached_images_are_not_rendered_again(renders):
+    cache = QRImageCache(max_entries=10)
+    first, second, other_size = fetch(cache, ("QR_1",), ("QR_1",), ("QR_1", 12))
+    assert first == second
+    assert first.etag == QRImageCache.etag("QR_1")
+    assert other_size.png == b"QR_1:12:4"
+    assert renders == ["QR_1", "QR_1"]
+
+
+def test_least_recently_used_image_is_evicted(renders):
+    cache = QRImageCache(max_entries=2)
+    fetch(cache, ("A",), ("B",), ("A",), ("C",), ("A",), ("B",))
+    # B was evicted by C; A stayed because it was used again
+    assert renders == ["A", "B", "C", "B"]
+
+
+def test_concurrent_requests_share_one_render(renders):
+    cache = QRImageCache()
+
+    async def run():
+        with ThreadPoolExecutor(2) as executor:
+            return await asyncio.gather(*(cache.get(executor, "QR_1") for _ in range(5)))
+
+    assert len(set(asyncio.run(run()))) == 1
+    assert renders == ["QR_1"]
+
+
+def test_stored_images_are_shared_across_caches(renders):
+    storage = InMemoryStorage()
+
+    async def run():
+        with ThreadPoolExecutor(2) as executor:
+            first = QRImageCache(storage=lambda: storage)
+            await first.get(executor, "QR_1")
+            # The upload is not awaited by get()
+            await asyncio.gather(*first._storing)
+            return await QRImageCache(storage=lambda: storage).get(executor, "QR_1")
+
+    assert asyncio.run(run()).png == b"QR_1:10:4"
+    assert renders == ["QR_1"]
+
+
+def test_disabled_cache_renders_every_time(renders):
+    fetch(QRImageCache(enabled=False), ("QR_1",), ("QR_1",))
+    assert renders == ["QR_1", "QR_1"]
+
+
+class UnitQuery:
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return SimpleNamespace(qr_code="QR_1")
+
+
+@pytest.fixture
+def client(monkeypatch, renders):
+    monkeypatch.setattr(inventory_routes, "qr_image_cache", QRImageCache())
+    app = FastAPI()
+    app.include_router(inventory_routes.router)
+    app.dependency_overrides[get_db] = lambda: SimpleNamespace(query=lambda *columns: UnitQuery())
+    with ThreadPoolExecutor(1) as executor:
+        monkeypatch.setattr(inventory_routes, "render_executor", executor)
+        yield TestClient(app)
+
+
+def test_qr_image_route_answers_if_none_match_without_rendering(client, renders):
+    response = client.get("/product-units/1/qr-image", params={"format": "png"})
+    assert response.status_code == 200
+    assert response.content == b"QR_1:10:4"
+    etag = response.headers["etag"]
+    assert etag == QRImageCache.etag("QR_1")
+
+    for if_none_match in (etag, f'"other", W/{etag}', "*"):
+        response = client.get("/product-units/1/qr-image", params={"format": "png", "box_size": 10}, headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    # The JSON wrapping is a different representation with its own ETag
+    response = client.get("/product-units/1/qr-image", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == QRImageCache.etag("QR_1", variant="json")
+    assert base64.b64decode(response.json()["qr_image"]) == b"QR_1:10:4"
+    # Rendered once: the revalidations never reached the cache
+    assert renders == ["QR_1"]
+
+
+def test_qr_image_304_skips_the_image_lookup(client, monkeypatch, renders):
+    async def unexpected(*args):
+        raise AssertionError("image looked up for a matching If-None-Match")
+
+    monkeypatch.setattr(inventory_routes.qr_image_cache, "get", unexpected)
+    response = client.get("/product-units/1/qr-image", params={"box_size": 5}, headers={"If-None-Match": QRImageCache.etag("QR_1", 5, 4, "json")})
+    assert response.status_code == 304
+    assert renders == []
@@ -0,0 +1,73 @@
+import asyncio
+import io
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from src.utils.qr_render import SheetLayout
+from src.utils.qr_sheets import PdfSheetWriter, ZipSheetWriter, iter_sheet, save_sheet
+from src.utils.storage import InMemoryStorage
+
+LAYOUT = SheetLayout(page_size="A4", dpi=72, columns=2, rows=2)
+PAGES = [
+    [(f"QR_{page}_{i}", f"unit {page * 4 + i}") for i in range(4)]
+    for page in range(2)
+] + [[("QR_LAST", "unit 9")]]
+
+
+def render(writer_class, window=2):
+    async def collect():
+        with ThreadPoolExecutor(2) as executor:
+            return [chunk async for chunk in iter_sheet(executor, writer_class(LAYOUT), PAGES, LAYOUT, window)]
+    return asyncio.run(collect())
+
+
+def test_pdf_structure():
+    pdf = b"".join(render(PdfSheetWriter))
+    assert pdf.startswith(b"%PDF-1.4\n") and pdf.endswith(b"%%EOF\n")
+
+    # Every cross-reference entry points at the start of its object
+    startxref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+    assert pdf[startxref:].startswith(b"xref\n0 ")
+    size = int(re.search(rb"/Size (\d+)", pdf).group(1))
+    entries = pdf[startxref:].split(b"\n")[3:3 + size - 1]
+    for object_id, entry in enumerate(entries, start=1):
+        offset = int(entry[:10])
+        assert pdf[offset:].startswith(f"{object_id} 0 obj\n".encode())
+    assert b"/Count 3" in pdf
+
+
+def test_pdf_opens_in_a_reader():
+    pypdf = pytest.importorskip("pypdf")
+    reader = pypdf.PdfReader(io.BytesIO(b"".join(render(PdfSheetWriter))))
+    assert len(reader.pages) == 3
+    width, height = float(reader.pages[0].mediabox.width), float(reader.pages[0].mediabox.height)
+    assert (round(width), round(height)) == (595, 842)
+
+
+def test_zip_of_png_pages():
+    chunks = render(ZipSheetWriter, window=1)
+    # Pages are written out as they arrive, not only at the end
+    assert sum(1 for chunk in chunks if chunk) > 2
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["page-0001.png", "page-0002.png", "page-0003.png"]
+        with Image.open(io.BytesIO(archive.read("page-0001.png"))) as page:
+            assert page.format == "PNG"
+            assert page.size == (595, 842)
+
+
+def test_save_sheet_uploads_the_whole_file():
+    storage = InMemoryStorage()
+    rendered = render(PdfSheetWriter)
+
+    async def chunks():
+        for chunk in rendered:
+            yield chunk
+
+    url = asyncio.run(save_sheet(chunks(), storage, "qr-sheets/test.pdf", PdfSheetWriter.content_type))
+    assert url == "/media/qr-sheets/test.pdf"
+    assert storage.get("qr-sheets/test.pdf") == b"".join(rendered)
@@ -0,0 +1,90 @@
+import base64
+import os
+
+import pytest
+
+from src.utils.qr_signing import (
+    MAX_SIGNED_ID,
+    Ed25519Signer,
+    HMACSigner,
+    SIGNED_PREFIX,
+    create_signer,
+    is_signed,
+)
+
+BASE32_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+
+
+def signers():
+    seed = os.urandom(32)
+    return [HMACSigner(b"secret", 1), Ed25519Signer(seed, 1)]
+
+
+@pytest.mark.parametrize("signer", signers(), ids=["hmac", "ed25519"])
+def test_sign_and_verify(signer):
+    code = signer.sign(7, 3, 42, issued_at=1700000000)
+    assert is_signed(code)
+    payload = signer.verify(code)
+    assert (payload.key_id, payload.product_id, payload.variant_id, payload.unit_id, payload.issued_at) == (1, 7, 3, 42, 1700000000)
+    assert signer.verify(signer.sign(7, None, 43)).variant_id is None
+    # Upper-case base32 and dots only, so codes stay in the QR alphanumeric set
+    assert code == code.upper()
+
+
+@pytest.mark.parametrize("signer", signers(), ids=["hmac", "ed25519"])
+def test_tampered_codes_are_rejected(signer):
+    code = signer.sign(7, 3, 42)
+    signed_part, _, signature = code.rpartition(".")
+    other = signer.sign(8, 3, 42)
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+    # The lowest bit of the last character is unused, so flipping it keeps the decoded bytes
+    respelled = signature[:-1] + BASE32_ALPHABET[BASE32_ALPHABET.index(signature[-1]) ^ 1]
+    for forged in [
+        f"{signed_part}.{flipped}",
+        f"{signed_part}.{respelled}",
+        f"{other.rpartition('.')[0]}.{signature}",  # payload swapped under a valid signature
+        f"{signed_part}.",
+        signed_part,
+        SIGNED_PREFIX + "garbage",
+        "QR_7_3_12345",
+    ]:
+        assert signer.verify(forged) is None
+
+
+def test_unknown_key_ids_are_rejected_and_old_keys_still_verify():
+    old = HMACSigner(b"old", 1)
+    rotated = HMACSigner(b"new", 2, previous_secrets={1: b"old"})
+    assert rotated.verify(old.sign(1, None, 1)).key_id == 1
+    assert HMACSigner(b"new", 2).verify(old.sign(1, None, 1)) is None
+
+    seed = os.urandom(32)
+    old_ed = Ed25519Signer(seed, 1)
+    public_key = base64.b64decode(old_ed.public_keys()[0]["public_key"])
+    verify_only = Ed25519Signer(None, 2, previous_public_keys={1: public_key})
+    assert not verify_only.can_sign
+    assert verify_only.verify(old_ed.sign(1, None, 1)).key_id == 1
+
+
+@pytest.mark.parametrize("ids", [(0, None, 1), (-1, None, 1), (1, MAX_SIGNED_ID + 1, 1), (1, None, MAX_SIGNED_ID + 1)])
+def test_ids_outside_the_payload_are_refused(ids):
+    with pytest.raises(ValueError):
+        HMACSigner(b"secret", 1).sign(*ids)
+
+
+def test_create_signer():
+    assert create_signer("none", "key") is None
+    assert create_signer("hmac", "") is None
+    assert isinstance(create_signer("hmac", "key"), HMACSigner)
+    seed = base64.b64encode(os.urandom(32)).decode()
+    assert isinstance(create_signer("ed25519", seed), Ed25519Signer)
+
+
+@pytest.mark.parametrize("args", [
+    ("rsa", "key"),
+    ("hmac", "", 1, "1:old"),
+    ("ed25519", "not base64!"),
+    ("ed25519", base64.b64encode(b"short").decode()),
+])
+def test_create_signer_fails_loudly(args):
+    with pytest.raises((ValueError, RuntimeError)):
+        create_signer(*args)
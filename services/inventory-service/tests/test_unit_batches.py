@@ -0,0 +1,165 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.config import settings
+from src.routes import inventory_routes
+from src.routes.inventory_routes import allocate_unit_ids, insert_product_units, iter_generated_units
+from src.schemas.inventory_schemas import ProductUnitBatchCreate
+from src.utils.qr_signing import create_signer
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class InsertSession:
+    """Fakes the multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING of product units"""
+
+    def __init__(self, taken_codes=(), next_id: int = 1):
+        self.taken_codes = set(taken_codes)
+        self.next_id = next_id
+        self.inserts = []
+        self.statements = []
+
+    def scalars(self, statement, rows=None):
+        sql = compiled(statement)
+        self.statements.append(sql)
+        if rows is None:
+            # nextval over generate_series(1, count)
+            count = int(re.search(r"generate_series\(1, (\d+)\)", sql).group(1))
+            ids = list(range(self.next_id, self.next_id + count))
+            self.next_id += count
+            return ids
+        self.inserts.append(len(rows))
+        inserted = []
+        for row in rows:
+            if row["qr_code"] in self.taken_codes:
+                continue
+            self.taken_codes.add(row["qr_code"])
+            if "id" not in row:
+                row = dict(row, id=self.next_id)
+                self.next_id += 1
+            inserted.append(SimpleNamespace(**row))
+        return inserted
+
+
+def test_allocate_unit_ids_takes_ids_from_the_sequence_in_one_query():
+    db = InsertSession(next_id=41)
+    assert allocate_unit_ids(db, 3) == [41, 42, 43]
+    sql, = db.statements
+    assert "nextval(pg_get_serial_sequence('inventory_service.product_units', 'id'))" in sql
+    assert "FROM generate_series(1, 3)" in sql
+
+
+def test_insert_skips_conflicting_codes_and_generates_them_again(monkeypatch):
+    codes = iter(["A", "B", "C", "D"])
+    monkeypatch.setattr(inventory_routes, "qr_signer", None)
+    monkeypatch.setattr(inventory_routes, "generate_qr_code", lambda product_id, variant_id: next(codes))
+    db = InsertSession(taken_codes={"B"})
+
+    units = insert_product_units(db, 5, 6, 3)
+
+    assert [unit.qr_code for unit in units] == ["A", "C", "D"]
+    # One multi-row insert, then one more for the skipped code
+    assert db.inserts == [3, 1]
+    assert "ON CONFLICT (qr_code) DO NOTHING RETURNING" in db.statements[0]
+    assert all(unit.product_id == 5 and unit.variant_id == 6 for unit in units)
+    assert len({unit.blockchain_hash for unit in units}) == 3
+
+
+def test_signed_units_carry_their_allocated_ids(monkeypatch):
+    signer = create_signer("hmac", "secret")
+    monkeypatch.setattr(inventory_routes, "qr_signer", signer)
+    db = InsertSession(next_id=100)
+
+    units = insert_product_units(db, 5, None, 2)
+
+    assert [unit.id for unit in units] == [100, 101]
+    payloads = [signer.verify(unit.qr_code) for unit in units]
+    assert [(p.product_id, p.variant_id, p.unit_id) for p in payloads] == [(5, None, 100), (5, None, 101)]
+
+
+class BatchSession:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def expunge_all(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def batch_env(monkeypatch):
+    session = BatchSession()
+    cached = []
+    sizes = []
+    monkeypatch.setattr(inventory_routes, "SessionLocal", lambda: session)
+    monkeypatch.setattr(settings, "PRODUCT_UNIT_BATCH_CHUNK_SIZE", 4)
+    monkeypatch.setattr(inventory_routes.verification_cache, "add_codes", cached.extend)
+
+    def insert(db, product_id, variant_id, count):
+        sizes.append(count)
+        if len(sizes) == session.fail_at:
+            raise RuntimeError("database went away")
+        start = sum(sizes[:-1])
+        return [
+            SimpleNamespace(
+                id=start + i, product_id=product_id, variant_id=variant_id, qr_code=f"QR{start + i}",
+                blockchain_hash=f"H{start + i}", is_used=False, used_at=None, created_at="2024-01-01T00:00:00"
+            )
+            for i in range(count)
+        ]
+
+    session.fail_at = None
+    monkeypatch.setattr(inventory_routes, "insert_product_units", insert)
+    return session, sizes, cached
+
+
+def test_batch_is_committed_and_streamed_chunk_by_chunk(batch_env):
+    session, sizes, cached = batch_env
+    chunks = list(iter_generated_units(ProductUnitBatchCreate(product_id=5, count=10)))
+
+    assert sizes == [4, 4, 2]
+    assert session.commits == 3
+    lines = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [unit["id"] for unit in lines] == list(range(10))
+    assert [len(chunk.splitlines()) for chunk in chunks] == [4, 4, 2]
+    assert cached == [f"QR{i}" for i in range(10)]
+    assert session.closed
+
+
+def test_failed_chunk_ends_the_stream_and_keeps_earlier_chunks(batch_env):
+    session, sizes, cached = batch_env
+    session.fail_at = 2
+    chunks = list(iter_generated_units(ProductUnitBatchCreate(product_id=5, count=10)))
+
+    assert (session.commits, session.rollbacks) == (1, 1)
+    assert json.loads(chunks[-1]) == {"error": "Failed to generate product units", "created": 4}
+    assert cached == ["QR0", "QR1", "QR2", "QR3"]
+    assert session.closed
+
+
+def test_disconnect_stops_generation_after_the_committed_chunk(batch_env):
+    session, sizes, _ = batch_env
+    stream = iter_generated_units(ProductUnitBatchCreate(product_id=5, count=10))
+    next(stream)
+    # What the server does when the client goes away
+    stream.close()
+
+    assert sizes == [4]
+    assert session.commits == 1
+    assert session.closed
@@ -79,8 +79,17 @@ remove_all_images() {
     fi
 }
 
+check_shared() {
+    # Copies of services/shared modules must match their originals
+    if ! python3 sync_shared.py --check; then
+        print_error "Shared modules are out of date. Run: $0 sync-shared"
+        exit 1
+    fi
+}
+
 build_services() {
     print_header
+    check_shared
     echo "🔨 Building all microservices..."
     for service in "${services[@]}"; do
         dir="${service/sv-/}"
@@ -242,6 +251,11 @@ full_setup() {
 }
 
 main() {
+    # These only touch the source tree, so they run without Docker
+    case $1 in
+        check-shared) check_shared; print_success "Shared modules are up to date"; exit 0 ;;
+        sync-shared) python3 sync_shared.py; exit $? ;;
+    esac
     check_docker
     if [ $# -eq 0 ]; then
         while true; do
@@ -289,7 +303,7 @@ main() {
             full) full_setup ;;
             remove-all-images) remove_all_images ;;
             *)
-                echo "Usage: $0 {build|setup|start|stop|seed|health|logs|urls|prune|start-service <name>|stop-service <name>|logs-service <name>|full|remove-all-images}"
+                echo "Usage: $0 {build|setup|start|stop|seed|health|logs|urls|prune|start-service <name>|stop-service <name>|logs-service <name>|full|remove-all-images|check-shared|sync-shared}"
                 exit 1
             ;;
         esac
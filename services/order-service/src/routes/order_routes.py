@@ -6,6 +6,8 @@ import uuid
 from datetime import datetime
 
 from src.database import get_db
+from src.utils.json_response import model_response
+from src.utils.pagination import NEXT_CURSOR_HEADER, decode_id_cursor, next_cursor
 from src.models import Order, OrderItem
 from src.schemas.order_schemas import (
     OrderCreate, OrderUpdate, OrderResponse,
@@ -71,9 +73,14 @@ async def get_orders(
     status: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get all orders with optional filters"""
+    """Get all orders with optional filters
+
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next
+    page by keyset instead of offset.
+    """
     query = db.query(Order)
     
     # Apply filters
@@ -82,13 +89,21 @@ async def get_orders(
     if status is not None:
         query = query.filter(Order.status == status)
     
-    orders = query.offset(skip).limit(limit).all()
+    query = query.order_by(Order.id)
+    if cursor:
+        query = query.filter(Order.id > decode_id_cursor(cursor))
+    else:
+        query = query.offset(skip)
+    orders = query.limit(limit).all()
+    
+    cursor_value = next_cursor(orders, limit, "id")
+    headers = {NEXT_CURSOR_HEADER: cursor_value} if cursor_value else None
     
     # Load items for each order
     for order in orders:
         order.items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
     
-    return orders
+    return model_response(List[OrderResponse], orders, headers)
 
 @router.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: int, db: Session = Depends(get_db)):
@@ -6,6 +6,8 @@ from datetime import datetime
 
 from src.database import get_db
 from src.models import Payment
+from src.utils.json_response import model_response
+from src.utils.pagination import NEXT_CURSOR_HEADER, decode_id_cursor, next_cursor
 
 router = APIRouter()
 
@@ -59,9 +61,22 @@ async def create_payment(payment: PaymentCreate, db: Session = Depends(get_db)):
     return db_payment
 
 @router.get("/payments", response_model=List[PaymentResponse])
-async def get_payments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    payments = db.query(Payment).offset(skip).limit(limit).all()
-    return payments
+async def get_payments(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    query = db.query(Payment).order_by(Payment.id)
+    if cursor:
+        query = query.filter(Payment.id > decode_id_cursor(cursor))
+    else:
+        query = query.offset(skip)
+    payments = query.limit(limit).all()
+    
+    cursor_value = next_cursor(payments, limit, "id")
+    headers = {NEXT_CURSOR_HEADER: cursor_value} if cursor_value else None
+    return model_response(List[PaymentResponse], payments, headers)
 
 @router.get("/payments/{payment_id}", response_model=PaymentResponse)
 async def get_payment(payment_id: int, db: Session = Depends(get_db)):
@@ -75,7 +90,7 @@ async def get_payment(payment_id: int, db: Session = Depends(get_db)):
 @router.get("/payments/order/{order_id}", response_model=List[PaymentResponse])
 async def get_order_payments(order_id: int, db: Session = Depends(get_db)):
     payments = db.query(Payment).filter(Payment.order_id == order_id).all()
-    return payments
+    return model_response(List[PaymentResponse], payments)
 
 @router.put("/payments/{payment_id}/confirm")
 async def confirm_payment(payment_id: int, db: Session = Depends(get_db)):
@@ -0,0 +1,49 @@
+"""add product full-text and trigram search
+
+Revision ID: 3f9a1c2d7e41
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2d7e41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA public")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION product_service.immutable_unaccent(text)
+        RETURNS text AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """)
+    op.execute("""
+        ALTER TABLE product_service.products
+        ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', product_service.immutable_unaccent(coalesce(name, ''))), 'A') ||
+            setweight(to_tsvector('simple', product_service.immutable_unaccent(coalesce(brand, ''))), 'B') ||
+            setweight(to_tsvector('simple', product_service.immutable_unaccent(coalesce(description, ''))), 'C')
+        ) STORED
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_products_search_vector
+        ON product_service.products USING gin (search_vector)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_products_name_trgm
+        ON product_service.products USING gin (product_service.immutable_unaccent(name) gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS product_service.ix_products_name_trgm")
+    op.execute("DROP INDEX IF EXISTS product_service.ix_products_search_vector")
+    op.execute("ALTER TABLE product_service.products DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP FUNCTION IF EXISTS product_service.immutable_unaccent(text)")
@@ -0,0 +1,29 @@
+"""add product image content hash
+
+Revision ID: 8b2e4d6f1a93
+Revises: 3f9a1c2d7e41
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a93'
+down_revision = '3f9a1c2d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE product_service.product_images ADD COLUMN IF NOT EXISTS content_hash text")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_product_service_product_images_content_hash
+        ON product_service.product_images (content_hash)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS product_service.ix_product_service_product_images_content_hash")
+    op.execute("ALTER TABLE product_service.product_images DROP COLUMN IF EXISTS content_hash")
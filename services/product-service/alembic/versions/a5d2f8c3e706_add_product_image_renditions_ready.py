@@ -0,0 +1,28 @@
+"""add product image renditions ready
+
+Revision ID: a5d2f8c3e706
+Revises: f7c3d1e9a4b2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5d2f8c3e706'
+down_revision = 'f7c3d1e9a4b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing images list no renditions until they are checked again (on re-upload)
+    op.execute("""
+        ALTER TABLE product_service.product_images
+        ADD COLUMN IF NOT EXISTS renditions_ready boolean NOT NULL DEFAULT false
+    """)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE product_service.product_images DROP COLUMN IF EXISTS renditions_ready")
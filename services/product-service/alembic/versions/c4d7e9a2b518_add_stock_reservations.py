@@ -0,0 +1,58 @@
+"""add stock reservations
+
+Revision ID: c4d7e9a2b518
+Revises: 8b2e4d6f1a93
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e9a2b518'
+down_revision = '8b2e4d6f1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS product_service.stock_reservations (
+            id serial PRIMARY KEY,
+            token text NOT NULL UNIQUE,
+            status text NOT NULL DEFAULT 'pending',
+            reference text,
+            expires_at timestamp NOT NULL,
+            created_at timestamp DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_product_service_stock_reservations_id
+        ON product_service.stock_reservations (id)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_stock_reservations_pending_expiry
+        ON product_service.stock_reservations (expires_at) WHERE status = 'pending'
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS product_service.stock_reservation_items (
+            id serial PRIMARY KEY,
+            reservation_id integer NOT NULL,
+            variant_id integer NOT NULL,
+            quantity integer NOT NULL
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_product_service_stock_reservation_items_id
+        ON product_service.stock_reservation_items (id)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_product_service_stock_reservation_items_reservation_id
+        ON product_service.stock_reservation_items (reservation_id)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS product_service.stock_reservation_items")
+    op.execute("DROP TABLE IF EXISTS product_service.stock_reservations")
@@ -0,0 +1,37 @@
+"""add product outbox
+
+Revision ID: e2a8b3f5c619
+Revises: c4d7e9a2b518
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8b3f5c619'
+down_revision = 'c4d7e9a2b518'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS product_service.product_outbox (
+            id bigserial PRIMARY KEY,
+            event_type text NOT NULL,
+            product_id integer NOT NULL,
+            payload jsonb NOT NULL,
+            created_at timestamp DEFAULT CURRENT_TIMESTAMP,
+            published_at timestamp
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_product_outbox_unpublished
+        ON product_service.product_outbox (id) WHERE published_at IS NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS product_service.product_outbox")
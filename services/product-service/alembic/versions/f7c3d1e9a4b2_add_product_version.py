@@ -0,0 +1,31 @@
+"""add product version
+
+Revision ID: f7c3d1e9a4b2
+Revises: e2a8b3f5c619
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3d1e9a4b2'
+down_revision = 'e2a8b3f5c619'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS product_service.product_version_seq")
+    # The volatile default gives every existing row its own version
+    op.execute("""
+        ALTER TABLE product_service.products
+        ADD COLUMN IF NOT EXISTS version bigint NOT NULL
+        DEFAULT nextval('product_service.product_version_seq')
+    """)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE product_service.products DROP COLUMN IF EXISTS version")
+    op.execute("DROP SEQUENCE IF EXISTS product_service.product_version_seq")
@@ -12,6 +12,54 @@ class Settings(BaseSettings):
     SERVICE_NAME: str = "product-service"
     SERVICE_VERSION: str = "1.0.0"
     SERVICE_PORT: int = int(os.getenv("SERVICE_PORT", "8002"))
+    # "fulltext" uses the tsvector/trigram indexes, "basic" falls back to ILIKE on name
+    PRODUCT_SEARCH_MODE: str = os.getenv("PRODUCT_SEARCH_MODE", "fulltext")
+    CATEGORY_TREE_TTL_SECONDS: int = int(os.getenv("CATEGORY_TREE_TTL_SECONDS", "300"))
+    # Product detail cache: "memory", "redis" or "none". "memory" is per process, so with several
+    # workers the ones that did not write serve stale products until the TTL; use "redis" there
+    PRODUCT_CACHE_BACKEND: str = os.getenv("PRODUCT_CACHE_BACKEND", "memory")
+    PRODUCT_CACHE_TTL_SECONDS: int = int(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "60"))
+    PRODUCT_CACHE_MAX_ENTRIES: int = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "10000"))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    IMAGE_UPLOAD_CONCURRENCY: int = int(os.getenv("IMAGE_UPLOAD_CONCURRENCY", "8"))
+    IMAGE_PROCESSING_WORKERS: int = int(os.getenv("IMAGE_PROCESSING_WORKERS", "2"))
+    PRESIGNED_URL_EXPIRES_SECONDS: int = int(os.getenv("PRESIGNED_URL_EXPIRES_SECONDS", "900"))
+    # Maximum IDs accepted by /products:batch
+    PRODUCT_BATCH_MAX_IDS: int = int(os.getenv("PRODUCT_BATCH_MAX_IDS", "200"))
+    # Rows inserted per transaction by POST /products/bulk
+    BULK_IMPORT_BATCH_SIZE: int = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+    # Stock reservations: default/maximum hold time and how often expired holds are returned to stock
+    RESERVATION_TTL_SECONDS: int = int(os.getenv("RESERVATION_TTL_SECONDS", "900"))
+    RESERVATION_MAX_TTL_SECONDS: int = int(os.getenv("RESERVATION_MAX_TTL_SECONDS", "3600"))
+    RESERVATION_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("RESERVATION_SWEEP_INTERVAL_SECONDS", "30"))
+    # Change feed: product/variant/image changes go through the outbox to this sink,
+    # "none" (outbox off), "log", "memory" (in-process queue) or "redis" (stream OUTBOX_REDIS_STREAM)
+    OUTBOX_SINK: str = os.getenv("OUTBOX_SINK", "none")
+    OUTBOX_REDIS_STREAM: str = os.getenv("OUTBOX_REDIS_STREAM", "product-service:changes")
+    OUTBOX_REDIS_MAX_LENGTH: int = int(os.getenv("OUTBOX_REDIS_MAX_LENGTH", "100000"))
+    OUTBOX_RELAY_INTERVAL_SECONDS: float = float(os.getenv("OUTBOX_RELAY_INTERVAL_SECONDS", "1"))
+    OUTBOX_RELAY_BATCH_SIZE: int = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", "500"))
+    # Published events are kept this long, then purged
+    OUTBOX_RETENTION_HOURS: int = int(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+    # Cache-Control of catalog reads; responses carry an ETag, so "no-cache" still lets
+    # clients revalidate with If-None-Match and get a bodyless 304
+    CACHE_CONTROL_PRODUCT_LIST: str = os.getenv("CACHE_CONTROL_PRODUCT_LIST", "public, no-cache")
+    CACHE_CONTROL_PRODUCT_DETAIL: str = os.getenv("CACHE_CONTROL_PRODUCT_DETAIL", "public, no-cache")
+    CACHE_CONTROL_CATEGORIES: str = os.getenv("CACHE_CONTROL_CATEGORIES", "public, max-age=60")
+    # Image storage: "s3", "local" (files served under LOCAL_STORAGE_URL) or "memory"
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "s3")
+    LOCAL_STORAGE_DIR: str = os.getenv("LOCAL_STORAGE_DIR", "./media")
+    LOCAL_STORAGE_URL: str = os.getenv("LOCAL_STORAGE_URL", "/media")
+    AWS_ACCESS_KEY_ID: str = os.getenv("AWS_ACCESS_KEY_ID", "")
+    AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
+    AWS_REGION: str = os.getenv("AWS_REGION", "ap-southeast-1")
+    AWS_S3_BUCKET_NAME: str = os.getenv("AWS_S3_BUCKET_NAME", "")
+    AWS_S3_ENDPOINT_URL: str = os.getenv("AWS_S3_ENDPOINT_URL", "")
+    S3_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "16"))
+    S3_MAX_ATTEMPTS: int = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+    S3_RETRY_MODE: str = os.getenv("S3_RETRY_MODE", "standard")
+    S3_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("S3_CONNECT_TIMEOUT_SECONDS", "5"))
+    S3_READ_TIMEOUT_SECONDS: float = float(os.getenv("S3_READ_TIMEOUT_SECONDS", "30"))
     
     class Config:
         env_file = ".env"
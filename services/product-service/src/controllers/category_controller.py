@@ -1,41 +1,59 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
+from src.config import settings
 from src.models import Category
 from src.schemas.product_schemas import CategoryCreate, CategoryUpdate
+from src.utils.category_tree import CategoryTree, CategoryTreeCache
+
+category_tree_cache = CategoryTreeCache(settings.CATEGORY_TREE_TTL_SECONDS)
 
 class CategoryController:
     @staticmethod
-    def create_category(db: Session, category_data: CategoryCreate) -> Category:
+    async def create_category(db: AsyncSession, category_data: CategoryCreate) -> Category:
         """Create a new category"""
         db_category = Category(**category_data.dict())
         db.add(db_category)
-        db.commit()
-        db.refresh(db_category)
+        await db.commit()
+        await db.refresh(db_category)
+        category_tree_cache.invalidate()
         return db_category
     
     @staticmethod
-    def get_categories(db: Session, skip: int = 0, limit: int = 100) -> List[Category]:
+    async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Category]:
         """Get all categories"""
-        return db.query(Category).offset(skip).limit(limit).all()
+        return list((await db.scalars(select(Category).order_by(Category.id).offset(skip).limit(limit))).all())
+    
+    @staticmethod
+    async def get_all_categories(db: AsyncSession) -> List[Category]:
+        """Get every category, unpaginated"""
+        return list((await db.scalars(select(Category))).all())
+    
+    @staticmethod
+    async def get_category_tree(db: AsyncSession) -> CategoryTree:
+        """Get the cached category hierarchy"""
+        return await category_tree_cache.get(lambda: CategoryController.get_all_categories(db))
     
     @staticmethod
-    def get_category(db: Session, category_id: int) -> Optional[Category]:
+    async def get_category(db: AsyncSession, category_id: int) -> Optional[Category]:
         """Get category by ID"""
-        return db.query(Category).filter(Category.id == category_id).first()
+        return await db.scalar(select(Category).filter(Category.id == category_id))
     
     @staticmethod
-    def update_category(db: Session, db_category: Category, category_update: dict) -> Category:
+    async def update_category(db: AsyncSession, db_category: Category, category_update: dict) -> Category:
         """Update category"""
         for field, value in category_update.items():
             setattr(db_category, field, value)
         
-        db.commit()
-        db.refresh(db_category)
+        await db.commit()
+        await db.refresh(db_category)
+        category_tree_cache.invalidate()
         return db_category
     
     @staticmethod
-    def delete_category(db: Session, db_category: Category) -> None:
+    async def delete_category(db: AsyncSession, db_category: Category) -> None:
         """Delete category"""
-        db.delete(db_category)
-        db.commit()
\ No newline at end of file
+        await db.delete(db_category)
+        await db.commit()
+        category_tree_cache.invalidate()
\ No newline at end of file
@@ -0,0 +1,126 @@
+from sqlalchemy import Integer, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Tuple
+from datetime import timedelta
+
+from src.models import Product, ProductOutboxEvent
+from src.utils.outbox import OutboxSink, outbox_enabled, row_payload
+
+# Advisory lock namespaces (first key of pg_advisory_xact_lock(int, int))
+PRODUCT_EVENT_LOCK = 7301
+RELAY_LOCK = 7302
+
+# (event type, product id, payload)
+OutboxEntry = Tuple[str, int, dict]
+
+# Events written without the per-product lock. Nobody else can write events
+# for a product that is being created. Stock changes are written after the
+# variant rows are updated, so writers of the same variant are already
+# serialized by its row lock and get ids in commit order; events of
+# different variants carry independent absolute quantities. Checkouts
+# therefore never queue on a product-wide lock.
+UNLOCKED_EVENT_TYPES = {"product.created", "variant.stock_changed"}
+
+class OutboxController:
+    @staticmethod
+    async def record(db: AsyncSession, event_type: str, instance) -> None:
+        """Queue a change event for a product, variant or image in the caller's transaction
+        
+        Pending changes are flushed first so the payload reflects them.
+        Deletions carry only ids; other events a snapshot of the row.
+        """
+        if not outbox_enabled():
+            return
+        await db.flush()
+        product_id = instance.id if isinstance(instance, Product) else instance.product_id
+        if event_type.endswith(".deleted"):
+            payload = {"id": instance.id, "product_id": product_id}
+        else:
+            payload = row_payload(instance)
+        await OutboxController.record_events(db, [(event_type, product_id, payload)])
+    
+    @staticmethod
+    async def record_events(db: AsyncSession, events: List[OutboxEntry], unlocked: bool = False) -> None:
+        """Insert outbox rows in the caller's transaction
+        
+        Call after the change itself has been written. Writers of the same
+        product serialize on an advisory lock held until commit, so event
+        ids of a product follow commit order and the relay never publishes
+        them out of order. Locks are taken last, in one statement and in
+        product id order, which keeps them from deadlocking with row locks.
+        Events in UNLOCKED_EVENT_TYPES take no lock, nor do any events with
+        unlocked=True, for products created in the caller's transaction
+        that no other writer can see yet.
+        """
+        if not events or not outbox_enabled():
+            return
+        locked = [] if unlocked else sorted({
+            product_id for event_type, product_id, _ in events if event_type not in UNLOCKED_EVENT_TYPES
+        })
+        if locked:
+            # unnest yields the ids in array order, so locks are acquired in id order
+            product_ids = func.unnest(literal(locked, ARRAY(Integer))).column_valued("product_id")
+            await db.execute(select(func.pg_advisory_xact_lock(PRODUCT_EVENT_LOCK, product_ids)))
+        await db.execute(insert(ProductOutboxEvent), [
+            {"event_type": event_type, "product_id": product_id, "payload": payload}
+            for event_type, product_id, payload in events
+        ])
+    
+    @staticmethod
+    async def publish_pending(db: AsyncSession, sink: OutboxSink, limit: int = 500) -> int:
+        """Publish the oldest unpublished events to the sink and mark them published
+        
+        Only one relay (across all processes) publishes at a time, which
+        keeps events in order. If the sink fails nothing is marked and the
+        batch is retried later, so delivery is at least once. Returns the
+        number of events published.
+        """
+        if not await db.scalar(select(func.pg_try_advisory_xact_lock(RELAY_LOCK, 0))):
+            await db.rollback()
+            return 0
+        
+        rows = (await db.scalars(
+            select(ProductOutboxEvent)
+            .where(ProductOutboxEvent.published_at.is_(None))
+            .order_by(ProductOutboxEvent.id)
+            .limit(limit)
+        )).all()
+        if not rows:
+            await db.rollback()
+            return 0
+        
+        try:
+            await sink.publish([
+                {
+                    "id": row.id,
+                    "type": row.event_type,
+                    "product_id": row.product_id,
+                    "payload": row.payload,
+                    "occurred_at": row.created_at.isoformat() if row.created_at else None
+                }
+                for row in rows
+            ])
+        except Exception:
+            await db.rollback()
+            raise
+        
+        await db.execute(
+            update(ProductOutboxEvent)
+            .where(ProductOutboxEvent.id.in_([row.id for row in rows]))
+            .values(published_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return len(rows)
+    
+    @staticmethod
+    async def purge_published(db: AsyncSession, retention_hours: int) -> int:
+        """Delete events published more than retention_hours ago"""
+        result = await db.execute(
+            delete(ProductOutboxEvent)
+            .where(ProductOutboxEvent.published_at < func.now() - timedelta(hours=retention_hours))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
\ No newline at end of file
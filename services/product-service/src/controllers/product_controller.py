@@ -1,22 +1,79 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import delete, func, insert, literal_column, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from src.models import Product, ProductVariant, ProductImage
-from src.schemas.product_schemas import ProductCreate, ProductUpdate
+from src.config import settings
+from src.controllers.category_controller import CategoryController
+from src.controllers.outbox_controller import OutboxController
+from src.models import Product, ProductVariant, ProductImage, PRODUCT_VERSION_SEQ
+from src.schemas.product_schemas import ProductCreate, ProductUpdate, BulkProductRow
+from src.utils.cache import create_cache
+from src.utils.outbox import row_payload
+
+product_cache = create_cache(
+    settings.PRODUCT_CACHE_BACKEND,
+    settings.PRODUCT_CACHE_TTL_SECONDS,
+    settings.PRODUCT_CACHE_MAX_ENTRIES,
+    settings.REDIS_URL
+)
+
+def _cache_key(product_id: int) -> str:
+    return f"product:{product_id}"
 
 class ProductController:
     @staticmethod
-    def create_product(db: Session, product_data: dict) -> Product:
+    async def create_product(db: AsyncSession, product_data: dict) -> Product:
         """Create a new product"""
         db_product = Product(**product_data)
         db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
+        await OutboxController.record(db, "product.created", db_product)
+        await db.commit()
+        await db.refresh(db_product)
         return db_product
     
     @staticmethod
-    def get_products(
-        db: Session, 
+    async def bulk_create_products(db: AsyncSession, rows: List[BulkProductRow]) -> List[int]:
+        """Insert products with their variants and image URLs in one transaction
+
+        Each table gets a single batched INSERT; returns the new product ids in
+        row order. The caller commits or rolls back.
+        """
+        product_columns = ("name", "description", "brand", "category_id", "price", "seller_id")
+        product_ids = (await db.scalars(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True),
+            [{column: getattr(row, column) for column in product_columns} for row in rows]
+        )).all()
+        
+        variants = [
+            dict(variant.model_dump(), product_id=product_id)
+            for product_id, row in zip(product_ids, rows)
+            for variant in row.variants
+        ]
+        images = [
+            {"product_id": product_id, "image_url": url}
+            for product_id, row in zip(product_ids, rows)
+            for url in row.image_urls
+        ]
+        if variants:
+            variants = (await db.scalars(insert(ProductVariant).returning(ProductVariant), variants)).all()
+        if images:
+            images = (await db.scalars(insert(ProductImage).returning(ProductImage), images)).all()
+        
+        products = [
+            dict({column: getattr(row, column) for column in product_columns}, id=product_id)
+            for product_id, row in zip(product_ids, rows)
+        ]
+        await OutboxController.record_events(db, (
+            [("product.created", product["id"], product) for product in products]
+            + [("variant.created", variant.product_id, row_payload(variant)) for variant in variants]
+            + [("image.created", image.product_id, row_payload(image)) for image in images]
+        ), unlocked=True)
+        return list(product_ids)
+    
+    @staticmethod
+    async def get_products(
+        db: AsyncSession, 
         skip: int = 0, 
         limit: int = 100,
         category_id: Optional[int] = None,
@@ -24,14 +81,45 @@ class ProductController:
         brand: Optional[str] = None,
         min_price: Optional[int] = None,
         max_price: Optional[int] = None,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        after_id: Optional[int] = None,
+        include_descendants: bool = False,
+        columns: Optional[Sequence[str]] = None
     ) -> List[Product]:
-        """Get all products with optional filters"""
-        query = db.query(Product)
+        """Get all products with optional filters
+
+        Pages by offset, or by keyset when after_id (the last id of the
+        previous page) is given. With columns, only those product columns
+        (plus id) are selected.
+        """
+        category_ids = await ProductController._category_ids(db, category_id, include_descendants)
+        query = ProductController.filter_products(
+            ProductController._select(columns), category_ids, seller_id, brand, min_price, max_price, search
+        )
         
-        # Apply filters
-        if category_id:
-            query = query.filter(Product.category_id == category_id)
+        if search and settings.PRODUCT_SEARCH_MODE == "fulltext":
+            # Most relevant matches first
+            rank = func.ts_rank_cd(Product.search_vector, ProductController._search_query(search))
+            query = query.order_by(rank.desc(), Product.id).offset(skip)
+        elif after_id is not None:
+            query = query.order_by(Product.id).filter(Product.id > after_id)
+        else:
+            query = query.order_by(Product.id).offset(skip)
+        return list((await db.scalars(query.limit(limit))).all())
+    
+    @staticmethod
+    def filter_products(
+        query,
+        category_ids: Optional[List[int]] = None,
+        seller_id: Optional[int] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        search: Optional[str] = None
+    ):
+        """Apply the product listing filters to a select"""
+        if category_ids:
+            query = query.filter(Product.category_id.in_(category_ids))
         if seller_id:
             query = query.filter(Product.seller_id == seller_id)
         if brand:
@@ -40,43 +128,246 @@ class ProductController:
             query = query.filter(Product.price >= min_price)
         if max_price:
             query = query.filter(Product.price <= max_price)
-        if search:
+        if search and settings.PRODUCT_SEARCH_MODE == "fulltext":
+            # Words in name, brand and description through the search_vector
+            # GIN index, plus name substrings through the trigram index.
+            # Accents are ignored on both sides.
+            unaccent = func.product_service.immutable_unaccent
+            query = query.filter(or_(
+                Product.search_vector.op("@@")(ProductController._search_query(search)),
+                unaccent(Product.name).ilike(func.concat("%", unaccent(search), "%"))
+            ))
+        elif search:
             query = query.filter(Product.name.ilike(f"%{search}%"))
+        return query
+    
+    @staticmethod
+    async def _category_ids(db: AsyncSession, category_id: Optional[int], include_descendants: bool) -> Optional[List[int]]:
+        """Resolve the category filter, expanding to descendants from the cached tree"""
+        if not category_id:
+            return None
+        if include_descendants:
+            return sorted((await CategoryController.get_category_tree(db)).subtree_ids(category_id))
+        return [category_id]
+    
+    @staticmethod
+    def _search_query(search: str):
+        """Build the tsquery for a user search string"""
+        return func.websearch_to_tsquery("simple", func.product_service.immutable_unaccent(search))
+    
+    @staticmethod
+    async def get_facets(
+        db: AsyncSession,
+        category_id: Optional[int] = None,
+        seller_id: Optional[int] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        search: Optional[str] = None,
+        price_bucket_size: int = 100000,
+        include_descendants: bool = False
+    ) -> list:
+        """Count filtered products per brand, category and price bucket
+
+        Runs one GROUPING SETS query. Each returned row is
+        (brand, category_id, price_bucket, count, facet) where facet is
+        "brand", "category", "price" or "total".
+        """
+        # Inlined so the GROUP BY expression matches the selected one
+        bucket_size = literal_column(str(int(price_bucket_size)))
+        price_bucket = Product.price - Product.price % bucket_size
+        grouping_id = func.grouping(Product.brand, Product.category_id, price_bucket)
         
-        return query.offset(skip).limit(limit).all()
+        query = select(
+            Product.brand,
+            Product.category_id,
+            price_bucket.label("price_bucket"),
+            func.count(Product.id).label("count"),
+            grouping_id.label("grouping_id")
+        )
+        category_ids = await ProductController._category_ids(db, category_id, include_descendants)
+        query = ProductController.filter_products(
+            query, category_ids, seller_id, brand, min_price, max_price, search
+        )
+        query = query.group_by(func.grouping_sets(
+            tuple_(Product.brand),
+            tuple_(Product.category_id),
+            tuple_(price_bucket),
+            tuple_()
+        ))
+        
+        # grouping() sets a bit for every column that is NOT grouped in the row
+        facet_names = {0b011: "brand", 0b101: "category", 0b110: "price", 0b111: "total"}
+        return [
+            (row.brand, row.category_id, row.price_bucket, row.count, facet_names[row.grouping_id])
+            for row in await db.execute(query)
+        ]
     
     @staticmethod
-    def get_product(db: Session, product_id: int) -> Optional[Product]:
+    async def get_product(db: AsyncSession, product_id: int, columns: Optional[Sequence[str]] = None) -> Optional[Product]:
         """Get product by ID"""
-        return db.query(Product).filter(Product.id == product_id).first()
+        return await db.scalar(ProductController._select(columns).filter(Product.id == product_id))
+    
+    @staticmethod
+    def _select(columns: Optional[Sequence[str]] = None):
+        """Product select, restricted to the given columns when set"""
+        query = select(Product)
+        if columns is not None:
+            query = query.options(load_only(Product.id, *(getattr(Product, column) for column in columns)))
+        return query
     
     @staticmethod
-    def update_product(db: Session, db_product: Product, product_update: dict) -> Product:
+    async def get_products_by_ids(
+        db: AsyncSession,
+        product_ids: List[int],
+        columns: Optional[Sequence[str]] = None
+    ) -> List[Product]:
+        """Get the products with the given IDs in one query (unordered, missing IDs skipped)
+
+        With columns, only those product columns (plus id) are selected.
+        """
+        if not product_ids:
+            return []
+        return list((await db.scalars(ProductController._select(columns).filter(Product.id.in_(product_ids)))).all())
+    
+    @staticmethod
+    async def get_variant_stock(db: AsyncSession, product_ids: List[int]) -> Dict[int, List[Tuple[int, int]]]:
+        """(variant id, quantity) of each product's variants, in variant id order"""
+        stock = {product_id: [] for product_id in product_ids}
+        if not product_ids:
+            return stock
+        rows = await db.execute(
+            select(ProductVariant.product_id, ProductVariant.id, ProductVariant.quantity)
+            .filter(ProductVariant.product_id.in_(product_ids))
+            .order_by(ProductVariant.id)
+        )
+        for product_id, variant_id, quantity in rows:
+            stock[product_id].append((variant_id, quantity))
+        return stock
+    
+    @staticmethod
+    async def get_cached_products(product_ids: List[int]) -> dict:
+        """Get serialized products from the detail cache as {id: data}, in one round trip"""
+        cached = await product_cache.get_many(_cache_key(product_id) for product_id in product_ids)
+        return {
+            product_id: cached[_cache_key(product_id)]
+            for product_id in product_ids
+            if _cache_key(product_id) in cached
+        }
+    
+    @staticmethod
+    async def update_product(db: AsyncSession, db_product: Product, product_update: dict) -> Product:
         """Update product"""
         for field, value in product_update.items():
             setattr(db_product, field, value)
+        db_product.version = PRODUCT_VERSION_SEQ.next_value()
         
-        db.commit()
-        db.refresh(db_product)
+        await OutboxController.record(db, "product.updated", db_product)
+        await db.commit()
+        await db.refresh(db_product)
+        await ProductController.invalidate_cache(db_product.id)
         return db_product
     
     @staticmethod
-    def delete_product(db: Session, db_product: Product) -> None:
+    async def delete_product(db: AsyncSession, db_product: Product) -> None:
         """Delete product"""
         # Delete related variants and images
-        db.query(ProductVariant).filter(ProductVariant.product_id == db_product.id).delete()
-        db.query(ProductImage).filter(ProductImage.product_id == db_product.id).delete()
+        await db.execute(delete(ProductVariant).filter(ProductVariant.product_id == db_product.id))
+        await db.execute(delete(ProductImage).filter(ProductImage.product_id == db_product.id))
+        
+        await db.delete(db_product)
+        await OutboxController.record(db, "product.deleted", db_product)
+        await db.commit()
+        await ProductController.invalidate_cache(db_product.id)
+    
+    @staticmethod
+    async def get_product_version(db: AsyncSession, product_id: int) -> Optional[int]:
+        """Get the current version of a product, None if it does not exist"""
+        return await db.scalar(select(Product.version).filter(Product.id == product_id))
+    
+    @staticmethod
+    async def bump_versions(db: AsyncSession, product_ids) -> None:
+        """Give products a new version after their variants or images change
+
+        Stock changes do not bump it (see ProductService._product_etag), so
+        checkouts never write or lock product rows.
+
+        Rows are updated one by one in id order so concurrent writers lock
+        them in the same order. The caller commits.
+        """
+        for product_id in sorted(set(product_ids)):
+            await db.execute(
+                update(Product)
+                .where(Product.id == product_id)
+                .values(version=PRODUCT_VERSION_SEQ.next_value())
+                .execution_options(synchronize_session=False)
+            )
+    
+    @staticmethod
+    async def get_cached_product(product_id: int) -> Optional[dict]:
+        """Get a serialized product from the detail cache"""
+        return await product_cache.get(_cache_key(product_id))
+    
+    @staticmethod
+    async def get_cache_generations(product_ids: Iterable[int]) -> Dict[int, int]:
+        """Detail cache generations of products; read them before loading products to cache"""
+        product_ids = list(product_ids)
+        generations = await product_cache.generations(_cache_key(product_id) for product_id in product_ids)
+        return {product_id: generations[_cache_key(product_id)] for product_id in product_ids}
+    
+    @staticmethod
+    async def cache_product(product_id: int, product_data: dict, generation: Optional[int] = None) -> None:
+        """Store a serialized product in the detail cache
         
-        db.delete(db_product)
-        db.commit()
+        With the generation read before the product was loaded, it is not
+        stored if the product was invalidated since.
+        """
+        await product_cache.set(_cache_key(product_id), product_data, generation)
     
     @staticmethod
-    def load_product_relations(db: Session, product: Product) -> Product:
+    async def invalidate_cache(product_id: int) -> None:
+        """Drop a product from the detail cache after it or its relations change
+
+        Raises RuntimeError when a shared cache cannot be reached, rather
+        than leaving the old product cached after the write.
+        """
+        await product_cache.delete(_cache_key(product_id))
+    
+    @staticmethod
+    async def load_product_relations(db: AsyncSession, product: Product) -> Product:
         """Load variants and images for a product"""
-        product.variants = db.query(ProductVariant).filter(
-            ProductVariant.product_id == product.id
-        ).all()
-        product.images = db.query(ProductImage).filter(
-            ProductImage.product_id == product.id
-        ).all()
-        return product
\ No newline at end of file
+        await ProductController.load_products_relations(db, [product])
+        return product
+    
+    @staticmethod
+    async def load_products_relations(
+        db: AsyncSession,
+        products: List[Product],
+        relations: Sequence[str] = ("variants", "images")
+    ) -> List[Product]:
+        """Load variants and/or images for a list of products, one query per relation"""
+        if not products:
+            return products
+        
+        product_ids = [product.id for product in products]
+        
+        if "variants" in relations:
+            variants_by_product = {product_id: [] for product_id in product_ids}
+            variants = await db.scalars(select(ProductVariant).filter(
+                ProductVariant.product_id.in_(product_ids)
+            ).order_by(ProductVariant.id))
+            for variant in variants:
+                variants_by_product[variant.product_id].append(variant)
+            for product in products:
+                product.variants = variants_by_product[product.id]
+        
+        if "images" in relations:
+            images_by_product = {product_id: [] for product_id in product_ids}
+            images = await db.scalars(select(ProductImage).filter(
+                ProductImage.product_id.in_(product_ids)
+            ).order_by(ProductImage.id))
+            for image in images:
+                images_by_product[image.product_id].append(image)
+            for product in products:
+                product.images = images_by_product[product.id]
+        return products
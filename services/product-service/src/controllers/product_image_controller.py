@@ -1,73 +1,371 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
 from fastapi import UploadFile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import logging
 import asyncio
+import base64
+import multiprocessing
 
+from src.config import settings
+from src.controllers.outbox_controller import OutboxController
+from src.controllers.product_controller import ProductController
+from src.database import AsyncSessionLocal
 from src.models import ProductImage
-from src.schemas.product_schemas import ProductImageCreate
-from src.utils.s3_utils import upload_image_to_s3
+from src.schemas.product_schemas import ProductImageCreate, PresignUploadFile, CompleteUploadItem
+from src.utils.image_pipeline import (
+    content_hash, original_key, direct_upload_key, rendition_key, render_renditions, verify_image
+)
+from src.utils.outbox import row_payload
+from src.utils.s3_utils import (
+    s3_object_exists, upload_bytes_to_s3, download_bytes_from_s3, generate_presigned_put, get_s3_url
+)
+
+# boto3 uploads are blocking, so they run on a bounded thread pool shared by
+# all requests. Resizing is CPU-bound, so renditions are rendered in worker
+# processes, spawned rather than forked from this multi-threaded process.
+# Both are created on startup and shut down on shutdown (see src.main).
+upload_executor: Optional[ThreadPoolExecutor] = None
+processing_executor: Optional[ProcessPoolExecutor] = None
+
+# Background rendition jobs (kept referenced until done) and the hashes they cover
+rendition_tasks = set()
+rendition_hashes_in_flight = set()
+
+def start_image_workers() -> None:
+    """Create the upload thread pool and the rendition process pool"""
+    global upload_executor, processing_executor
+    upload_executor = ThreadPoolExecutor(
+        max_workers=settings.IMAGE_UPLOAD_CONCURRENCY,
+        thread_name_prefix="image-upload"
+    )
+    processing_executor = ProcessPoolExecutor(
+        max_workers=settings.IMAGE_PROCESSING_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+def stop_image_workers() -> None:
+    """Cancel background renditions and shut both pools down without waiting for queued work"""
+    global upload_executor, processing_executor
+    for task in list(rendition_tasks):
+        task.cancel()
+    for executor in (upload_executor, processing_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    upload_executor = processing_executor = None
+
+def _upload_pool() -> ThreadPoolExecutor:
+    # Checked so work never falls through to the loop's default executor
+    if upload_executor is None:
+        raise RuntimeError("Image workers are not running")
+    return upload_executor
+
+def _processing_pool() -> ProcessPoolExecutor:
+    if processing_executor is None:
+        raise RuntimeError("Image workers are not running")
+    return processing_executor
 
 class ProductImageController:
     @staticmethod
-    def create_image(db: Session, product_id: int, image_data: ProductImageCreate) -> ProductImage:
+    async def create_image(db: AsyncSession, product_id: int, image_data: ProductImageCreate) -> ProductImage:
         """Add a new product image URL"""
         db_image = ProductImage(**image_data.dict(), product_id=product_id)
         db.add(db_image)
-        db.commit()
-        db.refresh(db_image)
+        await db.flush()
+        await ProductController.bump_versions(db, [product_id])
+        await OutboxController.record(db, "image.created", db_image)
+        await db.commit()
+        await db.refresh(db_image)
+        await ProductController.invalidate_cache(product_id)
         return db_image
     
     @staticmethod
-    async def upload_images(db: Session, product_id: int, images: List[UploadFile]) -> List[ProductImage]:
-        """Upload multiple images for a product"""
-        uploaded_images = []
+    async def upload_images(db: AsyncSession, product_id: int, images: List[UploadFile]) -> List[ProductImage]:
+        """Upload multiple images for a product
+
+        Originals are stored under their content hash, so identical images are
+        uploaded once and reused across products. New originals are uploaded
+        concurrently on the upload thread pool and saved in one transaction;
+        resized renditions are generated afterwards in the background.
         
-        try:
-            for image in images:
-                try:
-                    # Đảm bảo file được reset về đầu trước khi đọc
-                    await image.seek(0)
-                    
-                    safe_filename = image.filename or "image.jpg"
-                    content_type = image.content_type or "image/jpeg"
-                    
-                    # Upload ảnh lên S3
-                    url = upload_image_to_s3(
-                        image.file, 
-                        safe_filename, 
-                        content_type,
-                        product_id=product_id
-                    )
-                    
-                    # Lưu URL vào database
-                    db_image = ProductImage(product_id=product_id, image_url=url)
-                    db.add(db_image)
-                    db.commit()
-                    db.refresh(db_image)
-                    uploaded_images.append(db_image)
-                except Exception as e:
-                    import logging
-                    logging.error(f"Error uploading image {image.filename}: {str(e)}")
-                    # Tiếp tục với ảnh tiếp theo nếu có lỗi
+        Nothing is saved unless every image is stored: raises ValueError
+        naming the files that are not valid images, or the storage error.
+        Originals already stored are content-addressed and reused on retry.
+        """
+        loop = asyncio.get_running_loop()
+        
+        # Đọc nội dung và tính hash của từng ảnh
+        pending = {}
+        for image in images:
+            await image.seek(0)
+            data = await image.read()
+            pending.setdefault(content_hash(data), (image, data))
+        if not pending:
+            return []
+        
+        known_urls, attached = await ProductImageController._find_by_hashes(db, product_id, list(pending))
+        
+        async def upload(image_hash: str, image: UploadFile, data: bytes) -> str:
+            if image_hash in known_urls:
+                return known_urls[image_hash]
+            url = await loop.run_in_executor(
+                _upload_pool(),
+                ProductImageController._store_original,
+                data,
+                original_key(image_hash, image.filename or "image.jpg"),
+                image.content_type or "image/jpeg"
+            )
+            ProductImageController.schedule_renditions(image_hash, data)
+            return url
+        
+        new_hashes = [image_hash for image_hash in pending if image_hash not in attached]
+        results = await asyncio.gather(
+            *(upload(image_hash, *pending[image_hash]) for image_hash in new_hashes),
+            return_exceptions=True
+        )
+        
+        failures = [
+            (pending[image_hash][0].filename, result)
+            for image_hash, result in zip(new_hashes, results)
+            if isinstance(result, Exception)
+        ]
+        for filename, error in failures:
+            logging.error(f"Error uploading image {filename}: {str(error)}")
+        invalid = [filename for filename, error in failures if isinstance(error, ValueError)]
+        if invalid:
+            raise ValueError(f"Not valid images: {', '.join(invalid)}")
+        if failures:
+            raise failures[0][1]
+        
+        db_images = [
+            ProductImage(product_id=product_id, image_url=url, content_hash=image_hash)
+            for image_hash, url in zip(new_hashes, results)
+        ]
+        saved = await ProductImageController._save_images(db, product_id, db_images)
+        # Reused originals whose renditions are not marked stored yet are checked (and rendered if missing)
+        for db_image in saved:
+            if not db_image.renditions_ready and db_image.content_hash in known_urls:
+                ProductImageController.schedule_renditions(db_image.content_hash, pending[db_image.content_hash][1])
+        return list(attached.values()) + saved
+    
+    @staticmethod
+    async def presign_uploads(db: AsyncSession, product_id: int, files: List[PresignUploadFile]) -> List[dict]:
+        """Issue presigned PUT URLs so clients upload images straight to S3
+
+        Files announced with a content hash go to their content-addressed key,
+        with S3 enforcing the checksum; content that is already stored needs
+        no upload at all.
+        """
+        hashes = [f.content_hash for f in files if f.content_hash]
+        known_urls, _ = await ProductImageController._find_by_hashes(db, product_id, hashes)
+        
+        uploads = []
+        for f in files:
+            entry = {
+                "filename": f.filename,
+                "expires_in": settings.PRESIGNED_URL_EXPIRES_SECONDS,
+                "headers": {},
+                "upload_url": None,
+                "already_uploaded": False
+            }
+            if f.content_hash:
+                entry["key"] = original_key(f.content_hash, f.filename)
+                if f.content_hash in known_urls:
+                    entry["already_uploaded"] = True
+                    uploads.append(entry)
                     continue
+                checksum = base64.b64encode(bytes.fromhex(f.content_hash)).decode()
+            else:
+                entry["key"] = direct_upload_key(product_id, f.filename)
+                checksum = None
+            
+            entry["upload_url"], entry["headers"] = generate_presigned_put(
+                entry["key"], f.content_type, settings.PRESIGNED_URL_EXPIRES_SECONDS, checksum
+            )
+            uploads.append(entry)
+        return uploads
+    
+    @staticmethod
+    async def missing_uploads(db: AsyncSession, product_id: int, uploads: List[CompleteUploadItem]) -> List[str]:
+        """Return the keys of completed uploads that are not actually in S3"""
+        loop = asyncio.get_running_loop()
+        hashes = [u.content_hash for u in uploads if u.content_hash]
+        known_urls, _ = await ProductImageController._find_by_hashes(db, product_id, hashes)
+        to_check = [u.key for u in uploads if u.content_hash not in known_urls]
+        
+        exists = await asyncio.gather(
+            *(loop.run_in_executor(_upload_pool(), s3_object_exists, key) for key in to_check)
+        )
+        return [key for key, found in zip(to_check, exists) if not found]
+    
+    @staticmethod
+    async def register_uploads(db: AsyncSession, product_id: int, uploads: List[CompleteUploadItem]) -> List[ProductImage]:
+        """Save images uploaded through presigned URLs in one transaction"""
+        hashes = [u.content_hash for u in uploads if u.content_hash]
+        known_urls, attached = await ProductImageController._find_by_hashes(db, product_id, hashes)
+        
+        db_images = []
+        seen = set()
+        for upload in uploads:
+            if upload.content_hash in attached or (upload.content_hash or upload.key) in seen:
+                continue
+            seen.add(upload.content_hash or upload.key)
+            
+            if upload.content_hash in known_urls:
+                url = known_urls[upload.content_hash]
+            else:
+                url = get_s3_url(upload.key)
+                if upload.content_hash:
+                    ProductImageController.schedule_renditions(upload.content_hash, source_key=upload.key)
+            db_images.append(ProductImage(product_id=product_id, image_url=url, content_hash=upload.content_hash))
+        
+        return list(attached.values()) + await ProductImageController._save_images(db, product_id, db_images)
+    
+    @staticmethod
+    async def _find_by_hashes(db: AsyncSession, product_id: int, hashes: List[str]) -> Tuple[dict, dict]:
+        """Look up stored images by content hash
+
+        Returns ({hash: url} over all products, {hash: image} for product_id).
+        """
+        known_urls = {}
+        attached = {}
+        if not hashes:
+            return known_urls, attached
+        for row in await db.scalars(select(ProductImage).filter(ProductImage.content_hash.in_(hashes))):
+            known_urls.setdefault(row.content_hash, row.image_url)
+            if row.product_id == product_id:
+                attached[row.content_hash] = row
+        return known_urls, attached
+    
+    @staticmethod
+    async def _save_images(db: AsyncSession, product_id: int, db_images: List[ProductImage]) -> List[ProductImage]:
+        """Insert new image rows in a single transaction; rolls back and re-raises on error"""
+        if not db_images:
+            return []
+        
+        # Lưu tất cả URL vào database trong một transaction
+        try:
+            # Copies of an image whose renditions are already stored share them
+            hashes = {db_image.content_hash for db_image in db_images if db_image.content_hash}
+            ready = set((await db.scalars(select(ProductImage.content_hash).distinct().filter(
+                ProductImage.content_hash.in_(hashes),
+                ProductImage.renditions_ready
+            ))).all()) if hashes else set()
+            for db_image in db_images:
+                db_image.renditions_ready = db_image.content_hash in ready
+            db.add_all(db_images)
+            await db.flush()
+            image_ids = [db_image.id for db_image in db_images]
+            await ProductController.bump_versions(db, [product_id])
+            await OutboxController.record_events(db, [
+                ("image.created", product_id, row_payload(db_image)) for db_image in db_images
+            ])
+            await db.commit()
         except Exception as e:
-            import logging
-            logging.error(f"Error in upload_images: {str(e)}")
-            # Trả về danh sách ảnh đã upload được
+            await db.rollback()
+            logging.error(f"Error saving uploaded images: {str(e)}")
+            raise
         
-        return uploaded_images
+        await ProductController.invalidate_cache(product_id)
+        # One query reloads the committed rows (ids and uploaded_at)
+        return list((await db.scalars(select(ProductImage).filter(
+            ProductImage.id.in_(image_ids)
+        ).order_by(ProductImage.id).execution_options(populate_existing=True))).all())
+    
+    @staticmethod
+    def _store_original(data: bytes, key: str, content_type: str) -> str:
+        """Validate and upload an original image (runs on the upload pool)"""
+        verify_image(data)
+        return upload_bytes_to_s3(data, key, content_type)
+    
+    @staticmethod
+    def schedule_renditions(image_hash: str, data: Optional[bytes] = None, source_key: Optional[str] = None) -> None:
+        """Generate and store renditions of an image in the background
+
+        Pass the image bytes, or the key of an original to download from S3.
+        Images with this hash list their renditions once all are stored.
+        """
+        if image_hash in rendition_hashes_in_flight:
+            return
+        rendition_hashes_in_flight.add(image_hash)
+        task = asyncio.get_running_loop().create_task(
+            ProductImageController._store_renditions(image_hash, data, source_key)
+        )
+        rendition_tasks.add(task)
+        task.add_done_callback(rendition_tasks.discard)
+    
+    @staticmethod
+    async def _store_renditions(image_hash: str, data: Optional[bytes], source_key: Optional[str]) -> None:
+        """Resize in the process pool, then upload every rendition"""
+        loop = asyncio.get_running_loop()
+        try:
+            marker_key = rendition_key(image_hash, "full", "jpg")
+            if await loop.run_in_executor(_upload_pool(), s3_object_exists, marker_key):
+                await ProductImageController._mark_renditions_ready(image_hash)
+                return
+            
+            if data is None:
+                data = await loop.run_in_executor(_upload_pool(), download_bytes_from_s3, source_key)
+                if content_hash(data) != image_hash:
+                    logging.error(f"Uploaded object {source_key} does not match hash {image_hash}")
+                    return
+            
+            renditions = await loop.run_in_executor(_processing_pool(), render_renditions, data)
+            # The marker rendition goes last so a partial run is redone next time
+            keys = sorted(renditions, key=lambda key: key == marker_key)
+            await asyncio.gather(*(
+                loop.run_in_executor(_upload_pool(), upload_bytes_to_s3, renditions[key][0], key, renditions[key][1])
+                for key in keys[:-1]
+            ))
+            await loop.run_in_executor(
+                _upload_pool(), upload_bytes_to_s3, renditions[marker_key][0], marker_key, renditions[marker_key][1]
+            )
+            await ProductImageController._mark_renditions_ready(image_hash)
+        except Exception as e:
+            logging.error(f"Error generating renditions for image {image_hash}: {str(e)}")
+        finally:
+            rendition_hashes_in_flight.discard(image_hash)
+    
+    @staticmethod
+    async def _mark_renditions_ready(image_hash: str) -> None:
+        """Flag every image with this hash as having its renditions stored
+
+        Runs in its own session, after the renditions are uploaded. The
+        products get a new version, since their responses change.
+        """
+        async with AsyncSessionLocal() as db:
+            db_images = (await db.scalars(
+                update(ProductImage)
+                .where(ProductImage.content_hash == image_hash, ProductImage.renditions_ready.is_(False))
+                .values(renditions_ready=True)
+                .returning(ProductImage)
+            )).all()
+            if not db_images:
+                return
+            product_ids = sorted({db_image.product_id for db_image in db_images})
+            await ProductController.bump_versions(db, product_ids)
+            await OutboxController.record_events(db, [
+                ("image.updated", db_image.product_id, row_payload(db_image)) for db_image in db_images
+            ])
+            await db.commit()
+        for product_id in product_ids:
+            await ProductController.invalidate_cache(product_id)
     
     @staticmethod
-    def get_image(db: Session, image_id: int, product_id: int) -> Optional[ProductImage]:
+    async def get_image(db: AsyncSession, image_id: int, product_id: int) -> Optional[ProductImage]:
         """Get image by ID and product ID"""
-        return db.query(ProductImage).filter(
+        return await db.scalar(select(ProductImage).filter(
             ProductImage.id == image_id,
             ProductImage.product_id == product_id
-        ).first()
+        ))
     
     @staticmethod
-    def delete_image(db: Session, db_image: ProductImage) -> None:
+    async def delete_image(db: AsyncSession, db_image: ProductImage) -> None:
         """Delete product image"""
-        db.delete(db_image)
-        db.commit()
\ No newline at end of file
+        await db.delete(db_image)
+        await db.flush()
+        await ProductController.bump_versions(db, [db_image.product_id])
+        await OutboxController.record(db, "image.deleted", db_image)
+        await db.commit()
+        await ProductController.invalidate_cache(db_image.product_id)
\ No newline at end of file
@@ -1,39 +1,54 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
+from src.controllers.outbox_controller import OutboxController
+from src.controllers.product_controller import ProductController
 from src.models import ProductVariant
 from src.schemas.product_schemas import ProductVariantCreate, ProductVariantUpdate
 
 class ProductVariantController:
     @staticmethod
-    def create_variant(db: Session, product_id: int, variant_data: ProductVariantCreate) -> ProductVariant:
+    async def create_variant(db: AsyncSession, product_id: int, variant_data: ProductVariantCreate) -> ProductVariant:
         """Create a new product variant"""
         db_variant = ProductVariant(**variant_data.dict(), product_id=product_id)
         db.add(db_variant)
-        db.commit()
-        db.refresh(db_variant)
+        await db.flush()
+        await ProductController.bump_versions(db, [product_id])
+        await OutboxController.record(db, "variant.created", db_variant)
+        await db.commit()
+        await db.refresh(db_variant)
+        await ProductController.invalidate_cache(product_id)
         return db_variant
     
     @staticmethod
-    def get_variant(db: Session, variant_id: int, product_id: int) -> Optional[ProductVariant]:
+    async def get_variant(db: AsyncSession, variant_id: int, product_id: int) -> Optional[ProductVariant]:
         """Get variant by ID and product ID"""
-        return db.query(ProductVariant).filter(
+        return await db.scalar(select(ProductVariant).filter(
             ProductVariant.id == variant_id,
             ProductVariant.product_id == product_id
-        ).first()
+        ))
     
     @staticmethod
-    def update_variant(db: Session, db_variant: ProductVariant, variant_update: dict) -> ProductVariant:
+    async def update_variant(db: AsyncSession, db_variant: ProductVariant, variant_update: dict) -> ProductVariant:
         """Update product variant"""
         for field, value in variant_update.items():
             setattr(db_variant, field, value)
         
-        db.commit()
-        db.refresh(db_variant)
+        await db.flush()
+        await ProductController.bump_versions(db, [db_variant.product_id])
+        await OutboxController.record(db, "variant.updated", db_variant)
+        await db.commit()
+        await db.refresh(db_variant)
+        await ProductController.invalidate_cache(db_variant.product_id)
         return db_variant
     
     @staticmethod
-    def delete_variant(db: Session, db_variant: ProductVariant) -> None:
+    async def delete_variant(db: AsyncSession, db_variant: ProductVariant) -> None:
         """Delete product variant"""
-        db.delete(db_variant)
-        db.commit()
\ No newline at end of file
+        await db.delete(db_variant)
+        await db.flush()
+        await ProductController.bump_versions(db, [db_variant.product_id])
+        await OutboxController.record(db, "variant.deleted", db_variant)
+        await db.commit()
+        await ProductController.invalidate_cache(db_variant.product_id)
\ No newline at end of file
@@ -0,0 +1,194 @@
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import timedelta
+from uuid import uuid4
+
+from src.controllers.outbox_controller import OutboxController
+from src.controllers.product_controller import ProductController
+from src.models import ProductVariant, StockReservation, StockReservationItem
+
+class StockReservationController:
+    @staticmethod
+    async def reserve(
+        db: AsyncSession,
+        items: Dict[int, int],
+        ttl_seconds: int,
+        reference: Optional[str] = None
+    ) -> Tuple[Optional[StockReservation], List[dict]]:
+        """Take stock for every variant in items ({variant_id: quantity}) or none of it
+        
+        Each variant is decremented by one conditional UPDATE, so stock can
+        never go negative and no row is read and locked before being written.
+        Variants are updated in id order so concurrent carts lock rows in the
+        same order and cannot deadlock. Returns (reservation, []) on success
+        or (None, shortages) after rolling back.
+        """
+        stock = []
+        for variant_id in sorted(items):
+            row = (await db.execute(
+                update(ProductVariant)
+                .where(ProductVariant.id == variant_id, ProductVariant.quantity >= items[variant_id])
+                .values(quantity=ProductVariant.quantity - items[variant_id])
+                .returning(ProductVariant.product_id, ProductVariant.id, ProductVariant.quantity)
+                .execution_options(synchronize_session=False)
+            )).first()
+            if row is None:
+                await db.rollback()
+                return None, await StockReservationController._shortages(db, items)
+            stock.append(row)
+        
+        reservation = await db.scalar(
+            insert(StockReservation)
+            .values(token=uuid4().hex, reference=reference, expires_at=func.now() + timedelta(seconds=ttl_seconds))
+            .returning(StockReservation)
+        )
+        await db.execute(insert(StockReservationItem), [
+            {"reservation_id": reservation.id, "variant_id": variant_id, "quantity": quantity}
+            for variant_id, quantity in sorted(items.items())
+        ])
+        product_ids = await StockReservationController._stock_changed(db, stock)
+        await db.commit()
+        
+        await StockReservationController._invalidate_products(product_ids)
+        return reservation, []
+    
+    @staticmethod
+    async def _shortages(db: AsyncSession, items: Dict[int, int]) -> List[dict]:
+        """Describe the variants that cannot cover the requested quantity"""
+        available = dict((await db.execute(
+            select(ProductVariant.id, ProductVariant.quantity).where(ProductVariant.id.in_(list(items)))
+        )).all())
+        return [
+            {"variant_id": variant_id, "requested": quantity, "available": available.get(variant_id)}
+            for variant_id, quantity in sorted(items.items())
+            if available.get(variant_id) is None or available[variant_id] < quantity
+        ]
+    
+    @staticmethod
+    async def get_reservation(db: AsyncSession, token: str) -> Optional[StockReservation]:
+        """Get a reservation by token"""
+        return await db.scalar(select(StockReservation).where(StockReservation.token == token))
+    
+    @staticmethod
+    async def get_items(db: AsyncSession, reservation_id: int) -> List[StockReservationItem]:
+        """Get the reserved variants of a reservation"""
+        return list((await db.scalars(
+            select(StockReservationItem)
+            .where(StockReservationItem.reservation_id == reservation_id)
+            .order_by(StockReservationItem.variant_id)
+        )).all())
+    
+    @staticmethod
+    async def commit_reservation(db: AsyncSession, token: str) -> Optional[StockReservation]:
+        """Make a pending, unexpired reservation permanent; None if it is not"""
+        reservation = await db.scalar(
+            update(StockReservation)
+            .where(
+                StockReservation.token == token,
+                StockReservation.status == "pending",
+                StockReservation.expires_at > func.now()
+            )
+            .values(status="committed")
+            .returning(StockReservation)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        await db.commit()
+        return reservation
+    
+    @staticmethod
+    async def release_reservation(db: AsyncSession, token: str) -> Optional[StockReservation]:
+        """Return a pending reservation's stock; None if it was not pending"""
+        reservation = await db.scalar(
+            update(StockReservation)
+            .where(StockReservation.token == token, StockReservation.status == "pending")
+            .values(status="released")
+            .returning(StockReservation)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        if reservation is None:
+            await db.rollback()
+            return None
+        
+        product_ids = await StockReservationController._restore_stock(db, [reservation.id])
+        await db.commit()
+        await StockReservationController._invalidate_products(product_ids)
+        return reservation
+    
+    @staticmethod
+    async def expire_reservations(db: AsyncSession, limit: int = 500) -> int:
+        """Return the stock of pending reservations past their expiry
+        
+        Rows being committed or released concurrently are skipped rather
+        than waited on. Returns the number of reservations expired.
+        """
+        reservation_ids = list((await db.scalars(
+            select(StockReservation.id)
+            .where(StockReservation.status == "pending", StockReservation.expires_at <= func.now())
+            .order_by(StockReservation.expires_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )).all())
+        if not reservation_ids:
+            await db.rollback()
+            return 0
+        
+        await db.execute(
+            update(StockReservation)
+            .where(StockReservation.id.in_(reservation_ids))
+            .values(status="expired")
+            .execution_options(synchronize_session=False)
+        )
+        product_ids = await StockReservationController._restore_stock(db, reservation_ids)
+        await db.commit()
+        await StockReservationController._invalidate_products(product_ids)
+        return len(reservation_ids)
+    
+    @staticmethod
+    async def _restore_stock(db: AsyncSession, reservation_ids: List[int]) -> Set[int]:
+        """Add reserved quantities back to their variants, in variant id order
+        
+        Returns the ids of the affected products.
+        """
+        totals = (await db.execute(
+            select(StockReservationItem.variant_id, func.sum(StockReservationItem.quantity))
+            .where(StockReservationItem.reservation_id.in_(reservation_ids))
+            .group_by(StockReservationItem.variant_id)
+            .order_by(StockReservationItem.variant_id)
+        )).all()
+        
+        stock = []
+        for variant_id, quantity in totals:
+            row = (await db.execute(
+                update(ProductVariant)
+                .where(ProductVariant.id == variant_id)
+                .values(quantity=ProductVariant.quantity + quantity)
+                .returning(ProductVariant.product_id, ProductVariant.id, ProductVariant.quantity)
+                .execution_options(synchronize_session=False)
+            )).first()
+            # The variant may have been deleted since it was reserved
+            if row is not None:
+                stock.append(row)
+        return await StockReservationController._stock_changed(db, stock)
+    
+    @staticmethod
+    async def _stock_changed(db: AsyncSession, stock: List[tuple]) -> Set[int]:
+        """Queue one variant.stock_changed event per product
+        
+        stock holds (product_id, variant_id, new quantity) rows. Returns the
+        ids of the affected products.
+        """
+        variants_by_product: Dict[int, List[dict]] = {}
+        for product_id, variant_id, quantity in stock:
+            variants_by_product.setdefault(product_id, []).append({"id": variant_id, "quantity": quantity})
+        await OutboxController.record_events(db, [
+            ("variant.stock_changed", product_id, {"product_id": product_id, "variants": variants})
+            for product_id, variants in sorted(variants_by_product.items())
+        ])
+        return set(variants_by_product)
+    
+    @staticmethod
+    async def _invalidate_products(product_ids: Set[int]) -> None:
+        """Cached products show variant stock, so drop them after it changes"""
+        for product_id in product_ids:
+            await ProductController.invalidate_cache(product_id)
\ No newline at end of file
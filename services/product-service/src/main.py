@@ -1,17 +1,30 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from fastapi.staticfiles import StaticFiles
+import asyncio
+import os
 import uvicorn
-from src.database import engine
+from src.controllers.product_controller import product_cache
+from src.controllers.product_image_controller import start_image_workers, stop_image_workers
+from src.database import engine, async_engine
 from src.models import Base
 from src.routes.product_routes import router as product_router
+from src.services.outbox_service import OutboxService
+from src.services.stock_reservation_service import StockReservationService
 from src.config import settings
+from src.utils.compression import CompressionMiddleware
+from src.utils.db_pool import render_pool_metrics
+from src.utils.json_response import ORJSONResponse
+from src.utils.outbox import get_sink
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="Product Service",
     description="Product management microservice for Smart Verify E-commerce",
-    version=settings.SERVICE_VERSION
+    version=settings.SERVICE_VERSION,
+    default_response_class=ORJSONResponse
 )
 app.add_middleware(
     CORSMiddleware,
@@ -19,8 +32,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(CompressionMiddleware)
 app.include_router(product_router, prefix="/api/v1")
+@app.get("/metrics/db", response_class=PlainTextResponse, include_in_schema=False)
+async def db_pool_metrics():
+    """Connection pool metrics in Prometheus text format"""
+    return render_pool_metrics()
+if settings.STORAGE_BACKEND == "local":
+    # Serve locally stored images at the URLs the storage backend hands out
+    os.makedirs(settings.LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount(settings.LOCAL_STORAGE_URL, StaticFiles(directory=settings.LOCAL_STORAGE_DIR), name="media")
+@app.on_event("startup")
+async def start_image_processing():
+    start_image_workers()
+@app.on_event("startup")
+async def start_reservation_sweeper():
+    app.state.reservation_sweeper = asyncio.create_task(StockReservationService.run_expiry_sweeper())
+@app.on_event("startup")
+async def start_outbox_relay():
+    sink = get_sink()
+    app.state.outbox_relay = asyncio.create_task(OutboxService.run_relay(sink)) if sink else None
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    app.state.reservation_sweeper.cancel()
+    if app.state.outbox_relay:
+        app.state.outbox_relay.cancel()
+        await get_sink().close()
+    await product_cache.close()
+    stop_image_workers()
+    await async_engine.dispose()
 @app.get("/")
 async def root():
     return {
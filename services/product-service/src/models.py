@@ -1,7 +1,24 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, Column, Integer, Sequence, String, Text, DateTime, UniqueConstraint, Index, Computed, DDL, event, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from src.database import Base
 
+# Full-text search over name/brand/description. Vietnamese has no Postgres
+# dictionary, so text is unaccented and tokenized with the 'simple' config.
+# unaccent() is only STABLE, hence the IMMUTABLE wrapper needed by the
+# generated column and the trigram index.
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple', product_service.immutable_unaccent(coalesce(name, ''))), 'A') || "
+    "setweight(to_tsvector('simple', product_service.immutable_unaccent(coalesce(brand, ''))), 'B') || "
+    "setweight(to_tsvector('simple', product_service.immutable_unaccent(coalesce(description, ''))), 'C')"
+)
+
+# Every change to a product, its variants or images takes the next value as the
+# product's version, which its HTTP ETag is derived from. Stock changes do not,
+# so checkouts never write product rows; ETags hash variant quantities instead.
+PRODUCT_VERSION_SEQ = Sequence('product_version_seq', schema='product_service')
+
 class Category(Base):
     __tablename__ = "categories"
     __table_args__ = (
@@ -15,6 +32,12 @@ class Category(Base):
 class Product(Base):
     __tablename__ = "products"
     __table_args__ = (
+        Index('ix_products_search_vector', 'search_vector', postgresql_using='gin'),
+        Index(
+            'ix_products_name_trgm',
+            text('product_service.immutable_unaccent(name) gin_trgm_ops'),
+            postgresql_using='gin'
+        ),
         {'schema': 'product_service'}
     )
     
@@ -27,6 +50,21 @@ class Product(Base):
     category_id = Column(Integer, nullable=True, index=True)
     price = Column(Integer)
     created_at = Column(DateTime, server_default=func.current_timestamp())
+    version = Column(BigInteger, PRODUCT_VERSION_SEQ, server_default=PRODUCT_VERSION_SEQ.next_value(), nullable=False)
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_EXPRESSION, persisted=True)))
+
+# Extensions and helper function must exist before the products table is created
+event.listen(
+    Product.__table__,
+    "before_create",
+    DDL("""
+        CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA public;
+        CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+        CREATE OR REPLACE FUNCTION product_service.immutable_unaccent(text)
+        RETURNS text AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+    """).execute_if(dialect="postgresql")
+)
 
 class ProductVariant(Base):
     __tablename__ = "product_variants"
@@ -53,4 +91,50 @@ class ProductImage(Base):
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, nullable=False, index=True)
     image_url = Column(Text, nullable=False)
+    content_hash = Column(Text, nullable=True, index=True)  # SHA-256 of the original upload
+    renditions_ready = Column(Boolean, nullable=False, default=False, server_default=text("false"))  # Every rendition is stored
     uploaded_at = Column(DateTime, server_default=func.current_timestamp())
+
+class StockReservation(Base):
+    """Stock held for a cart/checkout until committed, released or expired"""
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        Index('ix_stock_reservations_pending_expiry', 'expires_at', postgresql_where=text("status = 'pending'")),
+        {'schema': 'product_service'}
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    token = Column(Text, nullable=False, unique=True)
+    status = Column(Text, nullable=False, server_default='pending')  # pending, committed, released, expired
+    reference = Column(Text, nullable=True)  # e.g. cart or order id of the caller
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+
+class StockReservationItem(Base):
+    __tablename__ = "stock_reservation_items"
+    __table_args__ = (
+        {'schema': 'product_service'}
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    reservation_id = Column(Integer, nullable=False, index=True)
+    variant_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+class ProductOutboxEvent(Base):
+    """Product, variant or image change written in the transaction that made it
+
+    The relay publishes unpublished rows in id order and stamps published_at.
+    """
+    __tablename__ = "product_outbox"
+    __table_args__ = (
+        Index('ix_product_outbox_unpublished', 'id', postgresql_where=text("published_at IS NULL")),
+        {'schema': 'product_service'}
+    )
+    
+    id = Column(BigInteger, primary_key=True)
+    event_type = Column(Text, nullable=False)  # e.g. product.updated, variant.deleted, image.created
+    product_id = Column(Integer, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+    published_at = Column(DateTime, nullable=True)
@@ -1,20 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from src.database import get_db
+from src.config import settings
+from src.database import get_async_db
 from src.models import Product, ProductVariant, ProductImage, Category
 from src.utils.s3_utils import upload_image_to_s3
+from src.utils.http_cache import cache_headers, etag_matches, not_modified
+from src.utils.json_response import ORJSONResponse, model_response
+from src.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor
 from src.schemas.product_schemas import (
     ProductCreate, ProductUpdate, ProductResponse,
     ProductVariantCreate, ProductVariantUpdate, ProductVariantResponse,
     ProductImageCreate, ProductImageResponse,
-    CategoryCreate, CategoryUpdate, CategoryResponse
+    PresignUploadRequest, PresignedUpload, CompleteUploadRequest,
+    CategoryCreate, CategoryUpdate, CategoryResponse, CategoryTreeNode,
+    ProductFacetsResponse, BulkImportResponse, ProductBatchRequest, ProductBatchResponse,
+    ReservationCreate, ReservationResponse
 )
 from src.services.product_service import ProductService
 from src.services.category_service import CategoryService
 from src.services.product_variant_service import ProductVariantService
 from src.services.product_image_service import ProductImageService
+from src.services.stock_reservation_service import StockReservationService
 
 router = APIRouter()
 
@@ -25,33 +33,51 @@ async def health_check():
 
 # Category endpoints
 @router.post("/categories", response_model=CategoryResponse)
-async def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new category"""
-    return CategoryService.create_category(db, category)
+    return await CategoryService.create_category(db, category)
 
 @router.get("/categories", response_model=List[CategoryResponse])
-async def get_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_categories(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get all categories"""
-    return CategoryService.get_categories(db, skip, limit)
+    categories = await CategoryService.get_categories(db, skip, limit)
+    headers = cache_headers(CategoryService.categories_etag(categories), settings.CACHE_CONTROL_CATEGORIES)
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    return model_response(List[CategoryResponse], categories, headers)
+
+@router.get("/categories/tree", response_model=List[CategoryTreeNode])
+async def get_category_tree(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get all categories as a nested tree"""
+    tree = await CategoryService.get_category_tree(db)
+    headers = cache_headers(CategoryService.category_tree_etag(tree), settings.CACHE_CONTROL_CATEGORIES)
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    return ORJSONResponse(tree.to_nested(), headers=headers)
 
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
-async def get_category(category_id: int, db: Session = Depends(get_db)):
+async def get_category(category_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get category by ID"""
-    return CategoryService.get_category(db, category_id)
+    return await CategoryService.get_category(db, category_id)
 
 @router.put("/categories/{category_id}", response_model=CategoryResponse)
 async def update_category(
     category_id: int, 
     category_update: CategoryUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update category"""
-    return CategoryService.update_category(db, category_id, category_update)
+    return await CategoryService.update_category(db, category_id, category_update)
 
 @router.delete("/categories/{category_id}")
-async def delete_category(category_id: int, db: Session = Depends(get_db)):
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete category"""
-    return CategoryService.delete_category(db, category_id)
+    return await CategoryService.delete_category(db, category_id)
 
 # Product endpoints
 @router.post("/products", response_model=ProductResponse)
@@ -63,15 +89,28 @@ async def create_product(
     price: int = Form(...),
     seller_id: int = Form(...),
     images: list[UploadFile] = File([]),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new product with image upload"""
     return await ProductService.create_product(
         db, name, description, brand, category_id, price, seller_id, images
     )
 
+@router.post("/products/bulk", response_model=BulkImportResponse)
+async def bulk_import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Overrides the Content-Type"),
+    batch_size: Optional[int] = Query(None, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Import products, variants and image URLs from a streamed CSV or NDJSON body"""
+    return await ProductService.bulk_import(
+        db, request.stream(), request.headers.get("content-type"), format, batch_size
+    )
+
 @router.get("/products", response_model=List[ProductResponse])
 async def get_products(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     category_id: Optional[int] = None,
@@ -80,38 +119,110 @@ async def get_products(
     min_price: Optional[int] = None,
     max_price: Optional[int] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    include_descendants: bool = False,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,price,images"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all products with optional filters
+
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next
+    page by keyset instead of offset. Send the page's ETag back in
+    If-None-Match to get a 304 while the page is unchanged.
+    """
+    field_names = ProductService.parse_fields(fields)
+    product_ids, etag = await ProductService.get_products_page(
+        db, skip, limit, category_id, seller_id, brand, min_price, max_price, search, cursor,
+        include_descendants, field_names
+    )
+    headers = cache_headers(etag, settings.CACHE_CONTROL_PRODUCT_LIST)
+    if etag_matches(request, etag):
+        return not_modified(headers)
+    
+    products = await ProductService.load_products_page(db, product_ids, field_names)
+    # From the listed ids, so products deleted since listing do not end the paging early
+    if not search and product_ids and len(product_ids) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(product_ids[-1])
+    if field_names is not None:
+        # Partial products do not fit ProductResponse, so bypass response_model
+        return ORJSONResponse(ProductService.project_products(products, field_names), headers=headers)
+    return model_response(List[ProductResponse], products, headers)
+
+@router.get("/products/facets", response_model=ProductFacetsResponse)
+async def get_product_facets(
+    category_id: Optional[int] = None,
+    seller_id: Optional[int] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    search: Optional[str] = None,
+    price_bucket_size: int = 100000,
+    include_descendants: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all products with optional filters"""
-    return ProductService.get_products(
-        db, skip, limit, category_id, seller_id, brand, min_price, max_price, search
+    """Get brand, category and price counts for the same filters as /products"""
+    return await ProductService.get_facets(
+        db, category_id, seller_id, brand, min_price, max_price, search, price_bucket_size,
+        include_descendants
     )
 
+@router.get("/products:batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: str = Query(..., description="Comma-separated product IDs"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get several products by ID in request order, reporting missing IDs"""
+    try:
+        product_ids = [int(product_id) for product_id in ids.split(",") if product_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    # Products are already serialized (detail cache entries)
+    return ORJSONResponse(await ProductService.get_products_by_ids(db, product_ids))
+
+@router.post("/products:batch", response_model=ProductBatchResponse)
+async def post_products_batch(request: ProductBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """Same as GET /products:batch, for lists too long for a query string"""
+    return ORJSONResponse(await ProductService.get_products_by_ids(db, request.ids))
+
 @router.get("/products/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Get product by ID"""
-    return ProductService.get_product(db, product_id)
+async def get_product(
+    request: Request,
+    product_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,price,images"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get product by ID (304 while If-None-Match still holds its ETag)"""
+    field_names = ProductService.parse_fields(fields)
+    if request.headers.get("if-none-match"):
+        # Revalidation only needs the version and stock, not the product
+        etag = await ProductService.get_product_etag(db, product_id, field_names)
+        if etag_matches(request, etag):
+            return not_modified(cache_headers(etag, settings.CACHE_CONTROL_PRODUCT_DETAIL))
+    
+    # Already serialized, full or trimmed to field_names, with the ETag of this body
+    product, etag = await ProductService.get_product(db, product_id, field_names)
+    return ORJSONResponse(product, headers=cache_headers(etag, settings.CACHE_CONTROL_PRODUCT_DETAIL))
 
 @router.put("/products/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: int, 
     product_update: ProductUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update product"""
     return await ProductService.update_product(db, product_id, product_update)
 
 @router.delete("/products/{product_id}")
-async def delete_product(product_id: int, db: Session = Depends(get_db)):
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete product"""
-    return ProductService.delete_product(db, product_id)
+    return await ProductService.delete_product(db, product_id)
 
 # Product variant endpoints
 @router.post("/products/{product_id}/variants", response_model=ProductVariantResponse)
 async def create_product_variant(
     product_id: int,
     variant: ProductVariantCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new product variant"""
     return await ProductVariantService.create_variant(db, product_id, variant)
@@ -121,7 +232,7 @@ async def update_product_variant(
     product_id: int,
     variant_id: int,
     variant_update: ProductVariantUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update product variant"""
     return await ProductVariantService.update_variant(db, product_id, variant_id, variant_update)
@@ -130,17 +241,17 @@ async def update_product_variant(
 async def delete_product_variant(
     product_id: int,
     variant_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete product variant"""
-    return ProductVariantService.delete_variant(db, product_id, variant_id)
+    return await ProductVariantService.delete_variant(db, product_id, variant_id)
 
 # Product image endpoints
 @router.post("/products/{product_id}/images", response_model=ProductImageResponse)
 async def create_product_image(
     product_id: int,
     image: ProductImageCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a new product image URL"""
     return await ProductImageService.create_image(db, product_id, image)
@@ -149,16 +260,55 @@ async def create_product_image(
 async def upload_product_images(
     product_id: int,
     images: list[UploadFile] = File([]),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Upload multiple images for an existing product"""
-    return ProductImageService.upload_images(db, product_id, images)
+    return await ProductImageService.upload_images(db, product_id, images)
+
+@router.post("/products/{product_id}/images/presign", response_model=List[PresignedUpload])
+async def presign_product_image_uploads(
+    product_id: int,
+    request: PresignUploadRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get presigned URLs to PUT images directly to S3"""
+    return await ProductImageService.presign_uploads(db, product_id, request)
+
+@router.post("/products/{product_id}/images/complete", response_model=List[ProductImageResponse])
+async def complete_product_image_uploads(
+    product_id: int,
+    request: CompleteUploadRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Register images uploaded through presigned URLs"""
+    return await ProductImageService.complete_uploads(db, product_id, request)
 
 @router.delete("/products/{product_id}/images/{image_id}")
 async def delete_product_image(
     product_id: int,
     image_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete product image"""
-    return ProductImageService.delete_image(db, product_id, image_id)
\ No newline at end of file
+    return await ProductImageService.delete_image(db, product_id, image_id)
+
+# Stock reservation endpoints
+@router.post("/reservations", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(request: ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    """Reserve stock for a cart; all items are reserved or none (409 lists the shortages)"""
+    return await StockReservationService.reserve(db, request)
+
+@router.get("/reservations/{token}", response_model=ReservationResponse)
+async def get_reservation(token: str, db: AsyncSession = Depends(get_async_db)):
+    """Get a stock reservation"""
+    return await StockReservationService.get_reservation(db, token)
+
+@router.post("/reservations/{token}/commit", response_model=ReservationResponse)
+async def commit_reservation(token: str, db: AsyncSession = Depends(get_async_db)):
+    """Keep the reserved stock, e.g. once the order is placed"""
+    return await StockReservationService.commit_reservation(db, token)
+
+@router.post("/reservations/{token}/release", response_model=ReservationResponse)
+async def release_reservation(token: str, db: AsyncSession = Depends(get_async_db)):
+    """Return the reserved stock, e.g. when checkout is abandoned"""
+    return await StockReservationService.release_reservation(db, token)
\ No newline at end of file
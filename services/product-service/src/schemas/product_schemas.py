@@ -1,7 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, computed_field, model_validator
+from typing import Optional, List, Dict
 from datetime import datetime
 
+from src.utils.image_pipeline import rendition_urls
+
 # Category schemas
 class CategoryBase(BaseModel):
     name: str
@@ -20,6 +22,11 @@ class CategoryResponse(CategoryBase):
     class Config:
         from_attributes = True
 
+class CategoryTreeNode(CategoryResponse):
+    children: List["CategoryTreeNode"] = []
+
+CategoryTreeNode.model_rebuild()
+
 # Product schemas
 class ProductBase(BaseModel):
     name: str
@@ -67,17 +74,132 @@ class ProductImageResponse(BaseModel):
     id: int
     product_id: int
     image_url: str
+    content_hash: Optional[str] = None
+    renditions_ready: bool = False
     uploaded_at: datetime
 
+    @computed_field
+    @property
+    def renditions(self) -> Dict[str, Dict[str, str]]:
+        """Resized WebP/JPEG URLs of uploaded images, once they have all been stored"""
+        return rendition_urls(self.content_hash) if self.content_hash and self.renditions_ready else {}
+
     class Config:
         from_attributes = True
 
+# Presigned upload schemas
+class PresignUploadFile(BaseModel):
+    filename: str
+    content_type: str = "image/jpeg"
+    content_hash: Optional[str] = None  # Hex SHA-256 of the file; enables dedup and checksum enforcement
+
+class PresignUploadRequest(BaseModel):
+    files: List[PresignUploadFile]
+
+class PresignedUpload(BaseModel):
+    filename: str
+    key: str
+    upload_url: Optional[str] = None  # None when the content is already stored
+    headers: Dict[str, str] = {}  # Headers the client must send with the PUT
+    expires_in: int
+    already_uploaded: bool = False
+
+class CompleteUploadItem(BaseModel):
+    key: str
+    content_hash: Optional[str] = None
+
+class CompleteUploadRequest(BaseModel):
+    uploads: List[CompleteUploadItem]
+
 class ProductResponse(ProductBase):
     id: int
     seller_id: int
     created_at: datetime
+    version: int  # Changes whenever the product, its variants or images change, but not with stock
     variants: List[ProductVariantResponse] = []
     images: List[ProductImageResponse] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProductBatchRequest(BaseModel):
+    ids: List[int]
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse] = []  # In request order, duplicates dropped
+    missing_ids: List[int] = []
+
+# Facet schemas
+class BrandFacet(BaseModel):
+    brand: str
+    count: int
+
+class CategoryFacet(BaseModel):
+    category_id: int
+    name: Optional[str] = None
+    parent_id: Optional[int] = None
+    count: int  # Products in this category and all its descendants
+    direct_count: int  # Products assigned to this category itself
+
+class PriceBucketFacet(BaseModel):
+    min_price: int
+    max_price: int
+    count: int
+
+class ProductFacetsResponse(BaseModel):
+    total: int
+    brands: List[BrandFacet] = []
+    categories: List[CategoryFacet] = []
+    price_buckets: List[PriceBucketFacet] = []
+
+# Bulk import schemas
+class BulkProductRow(ProductCreate):
+    variants: List[ProductVariantCreate] = []
+    image_urls: List[str] = []
+
+    @model_validator(mode="after")
+    def check_unique_children(self):
+        combos = [(variant.size, variant.color) for variant in self.variants]
+        if len(set(combos)) != len(combos):
+            raise ValueError("Duplicate variant size/color")
+        self.image_urls = list(dict.fromkeys(self.image_urls))
+        return self
+
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportResponse(BaseModel):
+    total_rows: int
+    created: int
+    failed: int
+    product_ids: List[int] = []  # Created products, in input order
+    errors: List[BulkImportError] = []
+
+# Stock reservation schemas
+class ReservationItem(BaseModel):
+    variant_id: int
+    quantity: int = Field(gt=0)
+
+class ReservationCreate(BaseModel):
+    items: List[ReservationItem] = Field(min_length=1)
+    ttl_seconds: Optional[int] = Field(None, gt=0)
+    reference: Optional[str] = None  # e.g. cart or order id, for tracing
+
+class ReservationItemResponse(BaseModel):
+    variant_id: int
+    quantity: int
+
+    class Config:
+        from_attributes = True
+
+class ReservationResponse(BaseModel):
+    token: str
+    status: str
+    reference: Optional[str] = None
+    expires_at: datetime
+    created_at: Optional[datetime] = None
+    items: List[ReservationItemResponse] = []
+
+    class Config:
+        from_attributes = True
@@ -1,47 +1,64 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from fastapi import HTTPException
 
 from src.controllers.category_controller import CategoryController
 from src.models import Category
 from src.schemas.product_schemas import CategoryCreate, CategoryUpdate
+from src.utils.category_tree import CategoryTree
+from src.utils.http_cache import make_etag
 
 class CategoryService:
     @staticmethod
-    def create_category(db: Session, category: CategoryCreate) -> Category:
+    async def create_category(db: AsyncSession, category: CategoryCreate) -> Category:
         """Create a new category"""
-        return CategoryController.create_category(db, category)
+        return await CategoryController.create_category(db, category)
     
     @staticmethod
-    def get_categories(db: Session, skip: int = 0, limit: int = 100) -> List[Category]:
+    async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Category]:
         """Get all categories"""
-        return CategoryController.get_categories(db, skip, limit)
+        return await CategoryController.get_categories(db, skip, limit)
     
     @staticmethod
-    def get_category(db: Session, category_id: int) -> Category:
+    def categories_etag(categories: List[Category]) -> str:
+        """ETag of a category list page"""
+        return make_etag("categories", [(c.id, c.name, c.parent_id) for c in categories])
+    
+    @staticmethod
+    async def get_category_tree(db: AsyncSession) -> CategoryTree:
+        """Get the cached category hierarchy (see CategoryTree.to_nested)"""
+        return await CategoryController.get_category_tree(db)
+    
+    @staticmethod
+    def category_tree_etag(tree: CategoryTree) -> str:
+        """ETag of the nested category tree"""
+        return make_etag("category-tree", sorted(tree.nodes.items()))
+    
+    @staticmethod
+    async def get_category(db: AsyncSession, category_id: int) -> Category:
         """Get category by ID"""
-        category = CategoryController.get_category(db, category_id)
+        category = await CategoryController.get_category(db, category_id)
         if not category:
             raise HTTPException(status_code=404, detail="Category not found")
         return category
     
     @staticmethod
-    def update_category(db: Session, category_id: int, category_update: CategoryUpdate) -> Category:
+    async def update_category(db: AsyncSession, category_id: int, category_update: CategoryUpdate) -> Category:
         """Update category"""
-        db_category = CategoryController.get_category(db, category_id)
+        db_category = await CategoryController.get_category(db, category_id)
         if not db_category:
             raise HTTPException(status_code=404, detail="Category not found")
         
-        return CategoryController.update_category(
+        return await CategoryController.update_category(
             db, db_category, category_update.dict(exclude_unset=True)
         )
     
     @staticmethod
-    def delete_category(db: Session, category_id: int) -> dict:
+    async def delete_category(db: AsyncSession, category_id: int) -> dict:
         """Delete category"""
-        db_category = CategoryController.get_category(db, category_id)
+        db_category = await CategoryController.get_category(db, category_id)
         if not db_category:
             raise HTTPException(status_code=404, detail="Category not found")
         
-        CategoryController.delete_category(db, db_category)
+        await CategoryController.delete_category(db, db_category)
         return {"message": "Category deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,33 @@
+import asyncio
+import logging
+import time
+
+from src.config import settings
+from src.controllers.outbox_controller import OutboxController
+from src.database import AsyncSessionLocal
+from src.utils.outbox import OutboxSink
+
+class OutboxService:
+    @staticmethod
+    async def run_relay(sink: OutboxSink) -> None:
+        """Publish outbox events to the sink as they are committed (runs for the app's lifetime)
+        
+        Full batches are followed immediately by the next one; otherwise the
+        outbox is polled every OUTBOX_RELAY_INTERVAL_SECONDS. Published events
+        are purged once an hour after OUTBOX_RETENTION_HOURS.
+        """
+        next_purge = time.monotonic()
+        while True:
+            published = 0
+            try:
+                async with AsyncSessionLocal() as db:
+                    published = await OutboxController.publish_pending(db, sink, settings.OUTBOX_RELAY_BATCH_SIZE)
+                    if time.monotonic() >= next_purge:
+                        await OutboxController.purge_published(db, settings.OUTBOX_RETENTION_HOURS)
+                        next_purge = time.monotonic() + 3600
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error relaying product changes: {str(e)}")
+            if published < settings.OUTBOX_RELAY_BATCH_SIZE:
+                await asyncio.sleep(settings.OUTBOX_RELAY_INTERVAL_SECONDS)
\ No newline at end of file
@@ -1,40 +1,106 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from fastapi import HTTPException, UploadFile
+from contextlib import contextmanager
+import re
 
 from src.controllers.product_controller import ProductController
 from src.controllers.product_image_controller import ProductImageController
 from src.models import ProductImage
-from src.schemas.product_schemas import ProductImageCreate
+from src.schemas.product_schemas import ProductImageCreate, PresignUploadRequest, CompleteUploadRequest
+
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+
+@contextmanager
+def upload_errors():
+    """Map failures while storing and saving images to HTTP errors"""
+    try:
+        yield
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Error saving uploaded images")
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        # Raised by the storage backend
+        raise HTTPException(status_code=502, detail=f"Image storage failed: {e}")
 
 class ProductImageService:
     @staticmethod
-    def create_image(db: Session, product_id: int, image: ProductImageCreate) -> ProductImage:
+    async def create_image(db: AsyncSession, product_id: int, image: ProductImageCreate) -> ProductImage:
         """Add a new product image URL"""
         # Check if product exists
-        product = ProductController.get_product(db, product_id)
+        product = await ProductController.get_product(db, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        return ProductImageController.create_image(db, product_id, image)
+        return await ProductImageController.create_image(db, product_id, image)
     
     @staticmethod
-    def upload_images(db: Session, product_id: int, images: List[UploadFile]) -> List[ProductImage]:
+    async def upload_images(db: AsyncSession, product_id: int, images: List[UploadFile]) -> List[ProductImage]:
         """Upload multiple images for a product"""
-        import asyncio
         # Check if product exists
-        product = ProductController.get_product(db, product_id)
+        product = await ProductController.get_product(db, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        with upload_errors():
+            return await ProductImageController.upload_images(db, product_id, images)
+    
+    @staticmethod
+    async def presign_uploads(db: AsyncSession, product_id: int, request: PresignUploadRequest) -> List[dict]:
+        """Issue presigned URLs for uploading images directly to S3"""
+        product = await ProductController.get_product(db, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        return asyncio.run(ProductImageController.upload_images(db, product_id, images))
+        for f in request.files:
+            if f.content_hash is not None:
+                f.content_hash = f.content_hash.lower()
+                if not SHA256_HEX.match(f.content_hash):
+                    raise HTTPException(status_code=400, detail=f"Invalid content_hash for {f.filename}")
+            if not f.content_type.startswith("image/"):
+                raise HTTPException(status_code=400, detail=f"Unsupported content type for {f.filename}")
+        
+        try:
+            return await ProductImageController.presign_uploads(db, product_id, request.files)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    
+    @staticmethod
+    async def complete_uploads(db: AsyncSession, product_id: int, request: CompleteUploadRequest) -> List[ProductImage]:
+        """Register images that were uploaded through presigned URLs"""
+        product = await ProductController.get_product(db, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        # Only keys that presign_uploads could have issued for this product
+        for upload in request.uploads:
+            if upload.content_hash is not None:
+                upload.content_hash = upload.content_hash.lower()
+                allowed = bool(SHA256_HEX.match(upload.content_hash)) and \
+                    upload.key.startswith(f"products/originals/{upload.content_hash}")
+            else:
+                allowed = upload.key.startswith(f"products/{product_id}/uploads/")
+            if not allowed or ".." in upload.key:
+                raise HTTPException(status_code=400, detail=f"Invalid upload key: {upload.key}")
+        
+        with upload_errors():
+            missing = await ProductImageController.missing_uploads(db, product_id, request.uploads)
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Uploads not found in storage: {', '.join(missing)}")
+        
+        with upload_errors():
+            return await ProductImageController.register_uploads(db, product_id, request.uploads)
     
     @staticmethod
-    def delete_image(db: Session, product_id: int, image_id: int) -> dict:
+    async def delete_image(db: AsyncSession, product_id: int, image_id: int) -> dict:
         """Delete product image"""
-        db_image = ProductImageController.get_image(db, image_id, product_id)
+        db_image = await ProductImageController.get_image(db, image_id, product_id)
         if not db_image:
             raise HTTPException(status_code=404, detail="Product image not found")
         
-        ProductImageController.delete_image(db, db_image)
+        await ProductImageController.delete_image(db, db_image)
         return {"message": "Product image deleted successfully"}
\ No newline at end of file
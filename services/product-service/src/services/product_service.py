@@ -1,18 +1,38 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional, Tuple
 from fastapi import HTTPException, UploadFile
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
 import logging
 import asyncio
 
+from src.controllers.category_controller import CategoryController
 from src.controllers.product_controller import ProductController
 from src.controllers.product_image_controller import ProductImageController
+from src.services.product_image_service import upload_errors
 from src.models import Product, ProductImage
-from src.schemas.product_schemas import ProductCreate, ProductUpdate, ProductResponse
+from src.config import settings
+from src.schemas.product_schemas import (
+    ProductCreate, ProductUpdate, ProductResponse, BulkProductRow,
+    ProductVariantResponse, ProductImageResponse
+)
+from src.utils.bulk_import import detect_format, format_validation_errors, iter_rows
+from src.utils.http_cache import make_etag
+from src.utils.pagination import decode_id_cursor
+
+# Fields selectable with `fields=`; id is always returned
+PRODUCT_FIELDS = list(ProductResponse.model_fields)
+RELATION_FIELDS = {"variants": ProductVariantResponse, "images": ProductImageResponse}
+
+def _database_error(error: Exception) -> str:
+    """First line of the driver's message, without SQLAlchemy's SQL dump"""
+    message = str(getattr(error, "orig", None) or error)
+    return f"Database error: {message.strip().splitlines()[0] if message.strip() else type(error).__name__}"
 
 class ProductService:
     @staticmethod
     async def create_product(
-        db: Session, 
+        db: AsyncSession, 
         name: str,
         description: str,
         brand: str,
@@ -21,7 +41,12 @@ class ProductService:
         seller_id: int,
         images: List[UploadFile] = []
     ) -> Product:
-        """Create a new product with images"""
+        """Create a new product with images
+
+        If the images cannot be stored, the product is deleted again and the
+        upload error is raised (see upload_errors), so a product is never
+        left without the images it was submitted with.
+        """
         try:
             # Create product
             product_data = {
@@ -33,27 +58,93 @@ class ProductService:
                 "seller_id": seller_id
             }
             
-            db_product = ProductController.create_product(db, product_data)
+            db_product = await ProductController.create_product(db, product_data)
             
             # Upload images if provided
             if images:
+                product_id = getattr(db_product, "id")
                 try:
-                    await ProductImageController.upload_images(db, getattr(db_product, "id"), images)
-                except Exception as e:
-                    import logging
-                    logging.error(f"Error uploading images: {str(e)}")
-                    # Tiếp tục với sản phẩm đã tạo, ngay cả khi upload ảnh thất bại
+                    with upload_errors():
+                        await ProductImageController.upload_images(db, product_id, images)
+                except HTTPException:
+                    await db.rollback()
+                    await ProductController.delete_product(db, await db.get(Product, product_id))
+                    raise
             
             # Load images for response
-            return ProductController.load_product_relations(db, db_product)
+            return await ProductController.load_product_relations(db, db_product)
+        except HTTPException:
+            raise
         except Exception as e:
             import logging
             logging.error(f"Error in create_product: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error creating product: {str(e)}")
     
     @staticmethod
-    def get_products(
-        db: Session, 
+    async def bulk_import(
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str] = None,
+        fmt: Optional[str] = None,
+        batch_size: Optional[int] = None
+    ) -> dict:
+        """Import products from a streamed CSV or NDJSON body
+
+        Rows are validated as they arrive and inserted in batches, one
+        transaction per batch. Invalid rows are reported and skipped; they
+        never abort the rest of the import.
+        """
+        fmt = fmt or detect_format(content_type)
+        if fmt is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson"
+            )
+        batch_size = batch_size or settings.BULK_IMPORT_BATCH_SIZE
+        
+        report = {"total_rows": 0, "created": 0, "failed": 0, "product_ids": [], "errors": []}
+        batch = []
+        async for row_number, data, error in iter_rows(chunks, fmt):
+            report["total_rows"] = max(report["total_rows"], row_number)
+            if error is None:
+                try:
+                    batch.append((row_number, BulkProductRow.model_validate(data)))
+                except ValidationError as e:
+                    error = format_validation_errors(e.errors())
+            if error is not None:
+                report["errors"].append({"row": row_number, "error": error})
+            
+            if len(batch) >= batch_size:
+                await ProductService._insert_batch(db, batch, report)
+                batch = []
+        if batch:
+            await ProductService._insert_batch(db, batch, report)
+        
+        report["errors"].sort(key=lambda e: e["row"])
+        report["created"] = len(report["product_ids"])
+        report["failed"] = len(report["errors"])
+        return report
+    
+    @staticmethod
+    async def _insert_batch(db: AsyncSession, batch: List[Tuple[int, BulkProductRow]], report: dict) -> None:
+        """Insert one batch; if the database rejects it, retry row by row to find the bad rows"""
+        try:
+            report["product_ids"].extend(await ProductController.bulk_create_products(db, [row for _, row in batch]))
+            await db.commit()
+            return
+        except Exception as e:
+            await db.rollback()
+            if len(batch) == 1:
+                report["errors"].append({"row": batch[0][0], "error": _database_error(e)})
+                return
+            logging.warning(f"Bulk insert of {len(batch)} rows failed, retrying row by row: {str(e)}")
+        
+        for item in batch:
+            await ProductService._insert_batch(db, [item], report)
+    
+    @staticmethod
+    async def get_products_page(
+        db: AsyncSession, 
         skip: int = 0, 
         limit: int = 100,
         category_id: Optional[int] = None,
@@ -61,47 +152,271 @@ class ProductService:
         brand: Optional[str] = None,
         min_price: Optional[int] = None,
         max_price: Optional[int] = None,
-        search: Optional[str] = None
-    ) -> List[Product]:
-        """Get all products with optional filters"""
-        products = ProductController.get_products(
-            db, skip, limit, category_id, seller_id, brand, min_price, max_price, search
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_descendants: bool = False,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[int], str]:
+        """Ids and ETag of a product listing page
+
+        Runs the listing query once, for id and version only, so an
+        unchanged page is answered before any product is loaded; load a
+        changed page from the ids with load_products_page.
+        """
+        after_id = ProductService._after_id(cursor, search)
+        rows = await ProductController.get_products(
+            db, skip, limit, category_id, seller_id, brand, min_price, max_price, search, after_id,
+            include_descendants, ["version"]
         )
+        product_ids = [row.id for row in rows]
+        stock = await ProductController.get_variant_stock(db, product_ids) if ProductService._shows_stock(fields) else {}
+        etag = make_etag("products", fields, [(row.id, row.version, stock.get(row.id)) for row in rows])
+        return product_ids, etag
+    
+    @staticmethod
+    async def load_products_page(db: AsyncSession, product_ids: List[int], fields: Optional[List[str]] = None) -> List[Product]:
+        """Load the products of a listing page in page order
+
+        With fields (see parse_fields), only those columns and relations are
+        loaded; pass the result through project_products to serialize it.
+        """
+        columns, relations = ProductService._split_fields(fields)
+        loaded = {product.id: product for product in await ProductController.get_products_by_ids(db, product_ids, columns)}
+        # Products deleted since the page was listed are dropped
+        products = [loaded[product_id] for product_id in product_ids if product_id in loaded]
         
-        # Load relations for each product
+        # Load relations for the whole page at once
+        return await ProductController.load_products_relations(db, products, relations)
+    
+    @staticmethod
+    def _shows_stock(fields: Optional[List[str]]) -> bool:
+        """Whether responses with these fields include variant quantities"""
+        return fields is None or "variants" in fields
+    
+    @staticmethod
+    def _product_etag(product_id: int, version: int, stock: Optional[list], fields: Optional[List[str]]) -> str:
+        """ETag of a product from its version and, when shown, its variants' (id, quantity)
+
+        Reserving stock does not bump the version, so the quantities stand
+        in for it; responses without variants keep their ETag across checkouts.
+        """
+        return make_etag("product", product_id, version, stock if ProductService._shows_stock(fields) else None, fields)
+    
+    @staticmethod
+    def _after_id(cursor: Optional[str], search: Optional[str]) -> Optional[int]:
+        """Decode a listing cursor"""
+        if cursor and search:
+            # Search results are ranked by relevance, so only offset paging applies
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported with search")
+        return decode_id_cursor(cursor) if cursor else None
+    
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+        """Parse a comma-separated `fields=` value into ProductResponse field names"""
+        if fields is None:
+            return None
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(PRODUCT_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(PRODUCT_FIELDS)}"
+            )
+        requested.add("id")
+        return [field for field in PRODUCT_FIELDS if field in requested]
+    
+    @staticmethod
+    def project_products(products: List[Product], fields: List[str]) -> List[dict]:
+        """Serialize products with only the requested fields"""
+        projected = []
         for product in products:
-            ProductController.load_product_relations(db, product)
+            data = {}
+            for field in fields:
+                if field in RELATION_FIELDS:
+                    schema = RELATION_FIELDS[field]
+                    data[field] = [schema.model_validate(item).model_dump(mode="json") for item in getattr(product, field)]
+                else:
+                    data[field] = getattr(product, field)
+            projected.append(jsonable_encoder(data))
+        return projected
+    
+    @staticmethod
+    def _split_fields(fields: Optional[List[str]]) -> Tuple[Optional[List[str]], Tuple[str, ...]]:
+        """Split field names into product columns and relations to load"""
+        if fields is None:
+            return None, tuple(RELATION_FIELDS)
+        columns = [field for field in fields if field not in RELATION_FIELDS]
+        relations = tuple(field for field in fields if field in RELATION_FIELDS)
+        return columns, relations
+    
+    @staticmethod
+    async def get_facets(
+        db: AsyncSession,
+        category_id: Optional[int] = None,
+        seller_id: Optional[int] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        search: Optional[str] = None,
+        price_bucket_size: int = 100000,
+        include_descendants: bool = False
+    ) -> dict:
+        """Get brand, category and price facet counts for a product filter set"""
+        if price_bucket_size <= 0:
+            raise HTTPException(status_code=400, detail="price_bucket_size must be positive")
+        
+        rows = await ProductController.get_facets(
+            db, category_id, seller_id, brand, min_price, max_price, search, price_bucket_size,
+            include_descendants
+        )
+        
+        total = 0
+        brands = []
+        direct_counts = {}
+        price_buckets = []
+        for row_brand, row_category_id, price_bucket, count, facet in rows:
+            if facet == "total":
+                total = count
+            elif facet == "brand" and row_brand is not None:
+                brands.append({"brand": row_brand, "count": count})
+            elif facet == "category" and row_category_id is not None:
+                direct_counts[row_category_id] = count
+            elif facet == "price" and price_bucket is not None:
+                price_buckets.append({
+                    "min_price": price_bucket,
+                    "max_price": price_bucket + price_bucket_size - 1,
+                    "count": count
+                })
+        
+        # Roll each category's count up through its ancestors
+        tree = await CategoryController.get_category_tree(db)
+        rolled_up = {}
+        for leaf_id, count in direct_counts.items():
+            for cat_id in [leaf_id] + tree.ancestors(leaf_id):
+                rolled_up[cat_id] = rolled_up.get(cat_id, 0) + count
+        
+        category_facets = [
+            {
+                "category_id": cat_id,
+                "name": tree.nodes.get(cat_id, {}).get("name"),
+                "parent_id": tree.nodes.get(cat_id, {}).get("parent_id"),
+                "count": count,
+                "direct_count": direct_counts.get(cat_id, 0)
+            }
+            for cat_id, count in rolled_up.items()
+        ]
         
-        return products
+        return {
+            "total": total,
+            "brands": sorted(brands, key=lambda b: (-b["count"], b["brand"])),
+            "categories": sorted(category_facets, key=lambda c: (-c["count"], c["category_id"])),
+            "price_buckets": sorted(price_buckets, key=lambda b: b["min_price"])
+        }
     
     @staticmethod
-    def get_product(db: Session, product_id: int) -> Product:
-        """Get product by ID"""
-        product = ProductController.get_product(db, product_id)
+    async def get_product(db: AsyncSession, product_id: int, fields: Optional[List[str]] = None) -> Tuple[dict, str]:
+        """Get product by ID with its ETag, served from the detail cache when possible
+
+        The cache holds full products. With fields, a cached product is
+        trimmed to them; on a miss only the requested columns and relations
+        (plus the version) are loaded and nothing is cached. The ETag is
+        computed from the same cache entry or rows as the body, so a write
+        in between cannot pair an old ETag with a newer body.
+        """
+        cached = await ProductController.get_cached_product(product_id)
+        if cached is not None and cached.get("version") is not None:
+            etag = ProductService._cached_etag(product_id, cached, fields)
+            if fields is not None:
+                return {field: cached[field] for field in fields}, etag
+            return cached, etag
+        
+        generation = (await ProductController.get_cache_generations([product_id]))[product_id]
+        columns, relations = ProductService._split_fields(fields)
+        if columns is not None and "version" not in columns:
+            columns.append("version")
+        product = await ProductController.get_product(db, product_id, columns)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        return ProductController.load_product_relations(db, product)
+        await ProductController.load_products_relations(db, [product], relations)
+        stock = None
+        if ProductService._shows_stock(fields):
+            stock = [(variant.id, variant.quantity) for variant in product.variants]
+        etag = ProductService._product_etag(product_id, product.version, stock, fields)
+        if fields is not None:
+            return ProductService.project_products([product], fields)[0], etag
+        product_data = ProductResponse.model_validate(product).model_dump(mode="json")
+        await ProductController.cache_product(product_id, product_data, generation)
+        return product_data, etag
+    
+    @staticmethod
+    async def get_product_etag(db: AsyncSession, product_id: int, fields: Optional[List[str]] = None) -> str:
+        """ETag of a product, from the detail cache or the database, without loading the product"""
+        cached = await ProductController.get_cached_product(product_id)
+        if cached is not None and cached.get("version") is not None:
+            return ProductService._cached_etag(product_id, cached, fields)
+        
+        version = await ProductController.get_product_version(db, product_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        stock = None
+        if ProductService._shows_stock(fields):
+            stock = (await ProductController.get_variant_stock(db, [product_id]))[product_id]
+        return ProductService._product_etag(product_id, version, stock, fields)
+    
+    @staticmethod
+    def _cached_etag(product_id: int, cached: dict, fields: Optional[List[str]]) -> str:
+        stock = [(variant["id"], variant["quantity"]) for variant in cached["variants"]]
+        return ProductService._product_etag(product_id, cached["version"], stock, fields)
+    
+    @staticmethod
+    async def get_products_by_ids(db: AsyncSession, product_ids: List[int]) -> dict:
+        """Get products for a list of IDs, preserving request order
+
+        Products in the detail cache are served from it; the rest are loaded
+        with their variants and images in three queries whatever the list size.
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if len(product_ids) > settings.PRODUCT_BATCH_MAX_IDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.PRODUCT_BATCH_MAX_IDS} ids can be requested at once"
+            )
+        
+        found = await ProductController.get_cached_products(product_ids)
+        uncached_ids = [product_id for product_id in product_ids if product_id not in found]
+        generations = await ProductController.get_cache_generations(uncached_ids)
+        products = await ProductController.get_products_by_ids(db, uncached_ids)
+        await ProductController.load_products_relations(db, products)
+        for product in products:
+            product_data = ProductResponse.model_validate(product).model_dump(mode="json")
+            await ProductController.cache_product(product.id, product_data, generations[product.id])
+            found[product.id] = product_data
+        
+        return {
+            "products": [found[product_id] for product_id in product_ids if product_id in found],
+            "missing_ids": [product_id for product_id in product_ids if product_id not in found]
+        }
     
     @staticmethod
-    def update_product(db: Session, product_id: int, product_update: ProductUpdate) -> Product:
+    async def update_product(db: AsyncSession, product_id: int, product_update: ProductUpdate) -> Product:
         """Update product"""
-        db_product = ProductController.get_product(db, product_id)
+        db_product = await ProductController.get_product(db, product_id)
         if not db_product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        updated_product = ProductController.update_product(
+        updated_product = await ProductController.update_product(
             db, db_product, product_update.dict(exclude_unset=True)
         )
         
-        return ProductController.load_product_relations(db, updated_product)
+        return await ProductController.load_product_relations(db, updated_product)
     
     @staticmethod
-    def delete_product(db: Session, product_id: int) -> dict:
+    async def delete_product(db: AsyncSession, product_id: int) -> dict:
         """Delete product"""
-        db_product = ProductController.get_product(db, product_id)
+        db_product = await ProductController.get_product(db, product_id)
         if not db_product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        ProductController.delete_product(db, db_product)
+        await ProductController.delete_product(db, db_product)
         return {"message": "Product deleted successfully"}
\ No newline at end of file
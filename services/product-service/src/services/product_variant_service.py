@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
 from src.controllers.product_controller import ProductController
@@ -8,37 +8,37 @@ from src.schemas.product_schemas import ProductVariantCreate, ProductVariantUpda
 
 class ProductVariantService:
     @staticmethod
-    def create_variant(db: Session, product_id: int, variant: ProductVariantCreate) -> ProductVariant:
+    async def create_variant(db: AsyncSession, product_id: int, variant: ProductVariantCreate) -> ProductVariant:
         """Create a new product variant"""
         # Check if product exists
-        product = ProductController.get_product(db, product_id)
+        product = await ProductController.get_product(db, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        return ProductVariantController.create_variant(db, product_id, variant)
+        return await ProductVariantController.create_variant(db, product_id, variant)
     
     @staticmethod
-    def update_variant(
-        db: Session, 
+    async def update_variant(
+        db: AsyncSession, 
         product_id: int, 
         variant_id: int, 
         variant_update: ProductVariantUpdate
     ) -> ProductVariant:
         """Update product variant"""
-        db_variant = ProductVariantController.get_variant(db, variant_id, product_id)
+        db_variant = await ProductVariantController.get_variant(db, variant_id, product_id)
         if not db_variant:
             raise HTTPException(status_code=404, detail="Product variant not found")
         
-        return ProductVariantController.update_variant(
+        return await ProductVariantController.update_variant(
             db, db_variant, variant_update.dict(exclude_unset=True)
         )
     
     @staticmethod
-    def delete_variant(db: Session, product_id: int, variant_id: int) -> dict:
+    async def delete_variant(db: AsyncSession, product_id: int, variant_id: int) -> dict:
         """Delete product variant"""
-        db_variant = ProductVariantController.get_variant(db, variant_id, product_id)
+        db_variant = await ProductVariantController.get_variant(db, variant_id, product_id)
         if not db_variant:
             raise HTTPException(status_code=404, detail="Product variant not found")
         
-        ProductVariantController.delete_variant(db, db_variant)
+        await ProductVariantController.delete_variant(db, db_variant)
         return {"message": "Product variant deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,89 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+import asyncio
+import logging
+
+from src.config import settings
+from src.controllers.stock_reservation_controller import StockReservationController
+from src.database import AsyncSessionLocal
+from src.models import StockReservation
+from src.schemas.product_schemas import ReservationCreate
+
+class StockReservationService:
+    @staticmethod
+    async def reserve(db: AsyncSession, request: ReservationCreate) -> StockReservation:
+        """Reserve stock for a whole cart, all or nothing"""
+        ttl_seconds = request.ttl_seconds or settings.RESERVATION_TTL_SECONDS
+        if ttl_seconds > settings.RESERVATION_MAX_TTL_SECONDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"ttl_seconds must be at most {settings.RESERVATION_MAX_TTL_SECONDS}"
+            )
+        
+        # Repeated variants are reserved as one line
+        items = {}
+        for item in request.items:
+            items[item.variant_id] = items.get(item.variant_id, 0) + item.quantity
+        
+        reservation, shortages = await StockReservationController.reserve(db, items, ttl_seconds, request.reference)
+        if reservation is None:
+            raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "shortages": shortages})
+        return await StockReservationService._with_items(db, reservation)
+    
+    @staticmethod
+    async def get_reservation(db: AsyncSession, token: str) -> StockReservation:
+        """Get a reservation by token"""
+        reservation = await StockReservationController.get_reservation(db, token)
+        if not reservation:
+            raise HTTPException(status_code=404, detail="Reservation not found")
+        return await StockReservationService._with_items(db, reservation)
+    
+    @staticmethod
+    async def commit_reservation(db: AsyncSession, token: str) -> StockReservation:
+        """Turn a pending reservation into a permanent stock decrement"""
+        reservation = await StockReservationController.commit_reservation(db, token)
+        if reservation is None:
+            current = await StockReservationService.get_reservation(db, token)
+            if current.status != "committed":
+                raise HTTPException(status_code=409, detail=f"Reservation is {StockReservationService._state(current)}")
+            # Committing twice is a no-op
+            return current
+        return await StockReservationService._with_items(db, reservation)
+    
+    @staticmethod
+    async def release_reservation(db: AsyncSession, token: str) -> StockReservation:
+        """Give a pending reservation's stock back"""
+        reservation = await StockReservationController.release_reservation(db, token)
+        if reservation is None:
+            current = await StockReservationService.get_reservation(db, token)
+            if current.status == "committed":
+                raise HTTPException(status_code=409, detail="Reservation is already committed")
+            # Released or expired: the stock is already back
+            return current
+        return await StockReservationService._with_items(db, reservation)
+    
+    @staticmethod
+    async def run_expiry_sweeper() -> None:
+        """Periodically return the stock of expired reservations (runs for the app's lifetime)"""
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    while await StockReservationController.expire_reservations(db):
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error expiring stock reservations: {str(e)}")
+            await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
+    
+    @staticmethod
+    async def _with_items(db: AsyncSession, reservation: StockReservation) -> StockReservation:
+        reservation.items = await StockReservationController.get_items(db, reservation.id)
+        return reservation
+    
+    @staticmethod
+    def _state(reservation: StockReservation) -> str:
+        if reservation.status == "pending":
+            # Past its expiry but not swept yet
+            return "expired"
+        return reservation.status
\ No newline at end of file
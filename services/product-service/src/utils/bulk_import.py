@@ -0,0 +1,109 @@
+import codecs
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Parsed rows are (1-based row number, row dict or None, error message or None)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+CSV_LIST_SEPARATOR = "|"
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally and yield complete lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """One JSON object per line; blank lines are skipped"""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Row must be a JSON object"
+            continue
+        yield row_number, row, None
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """CSV with a header line
+
+    Empty cells are treated as missing. `image_urls` holds URLs separated by
+    "|" and `variants` a JSON array of variant objects.
+    """
+    header = None
+    record = ""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        record += line
+        # A quoted field may span lines; the record is complete once quotes balance
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row_number += 1
+        if len(values) > len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        row = {name: value for name, value in zip(header, values) if value.strip() != ""}
+        try:
+            yield row_number, _expand_csv_row(row), None
+        except ValueError as e:
+            yield row_number, None, str(e)
+    if record.strip():
+        yield row_number + 1, None, "Unterminated quoted field"
+
+def _expand_csv_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    if "image_urls" in row:
+        row["image_urls"] = [url.strip() for url in row["image_urls"].split(CSV_LIST_SEPARATOR) if url.strip()]
+    if "variants" in row:
+        try:
+            row["variants"] = json.loads(row["variants"])
+        except ValueError as e:
+            raise ValueError(f"Invalid variants JSON: {e}")
+    return row
+
+def iter_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[ParsedRow]:
+    """Row parser for "csv" or "ndjson" input"""
+    if fmt == "csv":
+        return iter_csv_rows(chunks)
+    if fmt == "ndjson":
+        return iter_ndjson_rows(chunks)
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """Map a request Content-Type to an import format"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"):
+        return "ndjson"
+    return None
+
+def format_validation_errors(errors: List[dict]) -> str:
+    """Flatten pydantic errors into one readable message"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in errors
+    )
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Minimal async key/value cache interface used by the controllers
+
+    Every key has a generation that delete() advances. Read it with
+    generations() before loading a value from the database and pass it to
+    set(): the value is then only stored if the key was not invalidated
+    in between, so a slow fill cannot cache data older than a write.
+    """
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Cached values of the keys that are present"""
+        raise NotImplementedError
+
+    async def generations(self, keys: Iterable[str]) -> Dict[str, int]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, generation: Optional[int] = None) -> None:
+        """Store a value; with `generation`, only if the key is still at it"""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Drop a value and advance the key's generation"""
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class NullCache(CacheBackend):
+    """Cache that never stores anything"""
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return {}
+
+    async def generations(self, keys: Iterable[str]) -> Dict[str, int]:
+        return {key: 0 for key in keys}
+
+    async def set(self, key: str, value: Any, generation: Optional[int] = None) -> None:
+        pass
+
+    async def delete(self, key: str) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+
+class InMemoryLRUCache(CacheBackend):
+    """Thread-safe in-process LRU cache with a per-entry TTL
+
+    Only invalidates the process it runs in, so with several workers the
+    others serve their copy until it expires; use Redis there.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Generations of recently invalidated keys; a key not listed is at 0
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    async def generations(self, keys: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            return {key: self._generations.get(key, 0) for key in keys}
+
+    async def set(self, key: str, value: Any, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and self._generations.get(key, 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.max_entries:
+                self._generations.popitem(last=False)
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Stores ARGV[1] under KEYS[1] only while the generation in KEYS[2] is ARGV[3]
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[3] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+"""
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by all workers, on redis.asyncio
+
+    Values are stored as JSON. Pass `client` to use a local stand-in such
+    as fakeredis; otherwise a client is created from `url`. Failed reads
+    and fills are logged and treated as cache misses, but a failed
+    invalidation is retried and then raised, since skipping it would keep
+    serving data older than a committed write. Generations live in their
+    own keys and outlast values by `ttl_seconds`, longer than any fill.
+    """
+
+    def __init__(
+        self,
+        url: str = "",
+        ttl_seconds: int = 60,
+        prefix: str = "product-service:",
+        client=None,
+        delete_attempts: int = 3,
+        retry_delay_seconds: float = 0.05
+    ):
+        if client is None:
+            import redis.asyncio
+            client = redis.asyncio.Redis.from_url(url)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.delete_attempts = delete_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self._set_if_generation = client.register_script(_SET_IF_GENERATION)
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.prefix}generation:{key}"
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = await self.client.mget([self.prefix + key for key in keys])
+        except Exception as e:
+            logger.error(f"Redis cache get failed: {e}")
+            return {}
+        return {key: json.loads(raw) for key, raw in zip(keys, values) if raw is not None}
+
+    async def generations(self, keys: Iterable[str]) -> Dict[str, int]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = await self.client.mget([self._generation_key(key) for key in keys])
+        except Exception as e:
+            logger.error(f"Redis cache get failed: {e}")
+            # -1 never matches, so nothing is cached while Redis is unreachable
+            return {key: -1 for key in keys}
+        return {key: int(raw) if raw is not None else 0 for key, raw in zip(keys, values)}
+
+    async def set(self, key: str, value: Any, generation: Optional[int] = None) -> None:
+        try:
+            if generation is None:
+                await self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl_seconds)
+            else:
+                await self._set_if_generation(
+                    keys=[self.prefix + key, self._generation_key(key)],
+                    args=[json.dumps(value), self.ttl_seconds, generation]
+                )
+        except Exception as e:
+            logger.error(f"Redis cache set failed: {e}")
+
+    async def delete(self, key: str) -> None:
+        """Drop a value and advance its generation; raises RuntimeError once retries run out"""
+        generation_key = self._generation_key(key)
+        for attempt in range(1, self.delete_attempts + 1):
+            try:
+                # Retrying after a lost reply may advance the generation twice, which is harmless
+                async with self.client.pipeline(transaction=True) as pipe:
+                    pipe.delete(self.prefix + key)
+                    pipe.incr(generation_key)
+                    pipe.expire(generation_key, 2 * self.ttl_seconds)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                if attempt == self.delete_attempts:
+                    raise RuntimeError(f"Redis cache delete of {key} failed: {e}") from e
+                logger.warning(f"Redis cache delete failed (attempt {attempt}/{self.delete_attempts}): {e}")
+                await asyncio.sleep(self.retry_delay_seconds * attempt)
+
+    async def clear(self) -> None:
+        try:
+            keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+            if keys:
+                await self.client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Redis cache clear failed: {e}")
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_cache(backend: str, ttl_seconds: int, max_entries: int = 10000, redis_url: str = "") -> CacheBackend:
+    """Build the cache backend named by configuration ("memory", "redis" or "none")
+
+    Raises when the backend is unknown or cannot be created, rather than
+    silently running with a per-process cache.
+    """
+    if backend == "none":
+        return NullCache()
+    if backend == "memory":
+        return InMemoryLRUCache(max_entries, ttl_seconds)
+    if backend == "redis":
+        try:
+            return RedisCache(redis_url, ttl_seconds)
+        except Exception as e:
+            raise RuntimeError(f"Failed to initialize the Redis cache at {redis_url}: {e}") from e
+    raise ValueError(f"Unknown cache backend {backend!r}, expected 'memory', 'redis' or 'none'")
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+
+class CategoryTree:
+    """Snapshot of the category hierarchy with precomputed descendant sets"""
+
+    def __init__(self, categories: Iterable):
+        self.nodes: Dict[int, dict] = {
+            c.id: {"id": c.id, "name": c.name, "parent_id": c.parent_id}
+            for c in categories
+        }
+        self.children: Dict[int, List[int]] = {node_id: [] for node_id in self.nodes}
+        self.roots: List[int] = []
+        
+        for node_id in sorted(self.nodes):
+            parent_id = self.nodes[node_id]["parent_id"]
+            # parent_id has no FK, so dangling parents are treated as roots
+            if parent_id is None or parent_id == node_id or parent_id not in self.nodes:
+                self.roots.append(node_id)
+            else:
+                self.children[parent_id].append(node_id)
+        
+        # Nodes caught in a parent_id cycle are unreachable from the roots;
+        # promote one node per cycle so every category shows up in the tree
+        reachable = self._walk(self.roots)
+        for node_id in sorted(self.nodes):
+            if node_id not in reachable:
+                self.roots.append(node_id)
+                reachable |= self._walk([node_id])
+        
+        self.descendants: Dict[int, Set[int]] = {
+            node_id: self._walk(self.children[node_id]) for node_id in self.nodes
+        }
+    
+    def _walk(self, start: List[int]) -> Set[int]:
+        """Collect start and everything below it"""
+        seen: Set[int] = set()
+        stack = list(start)
+        while stack:
+            node_id = stack.pop()
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            stack.extend(self.children.get(node_id, []))
+        return seen
+    
+    def subtree_ids(self, category_id: int) -> Set[int]:
+        """Return category_id together with all of its descendants"""
+        return {category_id} | self.descendants.get(category_id, set())
+    
+    def ancestors(self, category_id: int) -> List[int]:
+        """Return the parent chain of category_id, nearest first"""
+        result = []
+        node = self.nodes.get(category_id)
+        while node and node["parent_id"] in self.nodes:
+            parent_id = node["parent_id"]
+            if parent_id == category_id or parent_id in result:
+                break
+            result.append(parent_id)
+            node = self.nodes[parent_id]
+        return result
+    
+    def to_nested(self) -> List[dict]:
+        """Return the hierarchy as nested dicts with a children list"""
+        emitted: Set[int] = set()
+        
+        def build(node_id: int) -> dict:
+            emitted.add(node_id)
+            return {
+                **self.nodes[node_id],
+                "children": [build(child) for child in self.children[node_id] if child not in emitted]
+            }
+        
+        return [build(root) for root in self.roots if root not in emitted]
+
+
+class CategoryTreeCache:
+    """In-process cache of the CategoryTree
+
+    Invalidated explicitly on category writes in this process; the TTL bounds
+    staleness for writes made by other workers.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._tree: Optional[CategoryTree] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+    
+    async def get(self, loader: Callable[[], Awaitable[Iterable]]) -> CategoryTree:
+        """Return the cached tree, rebuilding it from await loader() when stale"""
+        tree = self._tree
+        if tree is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return tree
+        async with self._lock:
+            tree = self._tree
+            if tree is None or time.monotonic() - self._loaded_at >= self.ttl_seconds:
+                generation = self._generation
+                tree = CategoryTree(await loader())
+                # A write invalidated the cache while loading; serve this tree but don't keep it
+                if generation == self._generation:
+                    self._tree = tree
+                    self._loaded_at = time.monotonic()
+            return tree
+    
+    def invalidate(self) -> None:
+        """Drop the cached tree so the next read rebuilds it"""
+        self._generation += 1
+        self._tree = None
@@ -0,0 +1,39 @@
+"""ETag and Cache-Control helpers for conditional GETs
+
+A copy of this module ships with every service that serves ETags; the
+original is in services/shared (edit it there and run
+services/sync_shared.py).
+"""
+import hashlib
+import json
+from typing import Any, Dict
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag over JSON-serializable parts (e.g. ids and versions)
+
+    Weak because it identifies the data, not the exact bytes, which may
+    differ with compression.
+    """
+    raw = json.dumps(parts, separators=(",", ":"), default=str).encode()
+    return f'W/"{hashlib.blake2b(raw, digest_size=16).hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match lists etag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def cache_headers(etag: str, cache_control: str) -> Dict[str, str]:
+    """ETag and Cache-Control headers of a cacheable response"""
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Bodyless 304 carrying the same caching headers as a full response"""
+    return Response(status_code=304, headers=headers)
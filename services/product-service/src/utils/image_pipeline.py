@@ -0,0 +1,85 @@
+import hashlib
+import io
+import os
+from typing import Dict, Tuple
+from uuid import uuid4
+
+from PIL import Image, ImageOps
+
+from src.utils.s3_utils import get_s3_url
+
+# Longest edge in pixels for each rendition; images are never upscaled
+RENDITIONS = {
+    "thumb": 240,
+    "card": 640,
+    "full": 1600,
+}
+
+# extension -> (Pillow format, content type, save options)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+def content_hash(data: bytes) -> str:
+    """Return the SHA-256 hex digest used to deduplicate images"""
+    return hashlib.sha256(data).hexdigest()
+
+def original_key(image_hash: str, filename: str) -> str:
+    """Object key of an uploaded original"""
+    extension = os.path.splitext(filename)[1].lower() or ".jpg"
+    return f"products/originals/{image_hash}{extension}"
+
+def direct_upload_key(product_id: int, filename: str) -> str:
+    """Object key for a presigned upload whose content hash is unknown"""
+    safe_filename = os.path.basename(filename).replace(" ", "_") or "image.jpg"
+    return f"products/{product_id}/uploads/{uuid4().hex}_{safe_filename}"
+
+def rendition_key(image_hash: str, name: str, extension: str) -> str:
+    """Object key of one rendition of an image"""
+    return f"products/renditions/{image_hash}/{name}.{extension}"
+
+def rendition_urls(image_hash: str) -> Dict[str, Dict[str, str]]:
+    """Public URLs of every rendition, e.g. {"thumb": {"webp": ..., "jpg": ...}}"""
+    return {
+        name: {ext: get_s3_url(rendition_key(image_hash, name, ext)) for ext in RENDITION_FORMATS}
+        for name in RENDITIONS
+    }
+
+def verify_image(data: bytes) -> None:
+    """Raise ValueError unless data is an image Pillow can decode"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except Exception as e:
+        raise ValueError(f"Not a valid image: {e}")
+
+def render_renditions(data: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """Resize an image into every rendition and format
+
+    CPU-bound, meant to run in a worker process. Re-encoding without passing
+    exif/icc data strips all metadata. Returns {object key: (bytes, content type)}.
+    """
+    image_hash = content_hash(data)
+    results = {}
+    with Image.open(io.BytesIO(data)) as source:
+        # Apply the EXIF orientation before the EXIF block is dropped
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for name, max_size in RENDITIONS.items():
+            resized = image.copy()
+            resized.thumbnail((max_size, max_size), Image.LANCZOS)
+
+            for extension, (image_format, content_type, options) in RENDITION_FORMATS.items():
+                output = resized
+                if image_format == "JPEG" and resized.mode == "RGBA":
+                    # JPEG has no alpha channel; flatten onto white
+                    output = Image.new("RGB", resized.size, (255, 255, 255))
+                    output.paste(resized, mask=resized.split()[-1])
+
+                buffer = io.BytesIO()
+                output.save(buffer, image_format, **options)
+                results[rendition_key(image_hash, name, extension)] = (buffer.getvalue(), content_type)
+    return results
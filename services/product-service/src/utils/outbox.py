@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def row_payload(instance) -> Dict[str, Any]:
+    """JSON-ready snapshot of the loaded columns of an ORM instance
+
+    Unloaded attributes (deferred or expired ones such as server defaults
+    not yet fetched) are left out rather than loaded.
+    """
+    state = inspect(instance)
+    payload = {}
+    for attr in state.mapper.column_attrs:
+        if attr.deferred or attr.key in state.unloaded:
+            continue
+        value = getattr(instance, attr.key)
+        payload[attr.key] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return payload
+
+
+class OutboxSink:
+    """Destination of relayed change events
+
+    publish() receives events in outbox order and must raise if any of
+    them could not be delivered; the relay then retries the whole batch.
+    """
+
+    async def publish(self, events: List[dict]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LogSink(OutboxSink):
+    """Writes each event to the service log"""
+
+    async def publish(self, events: List[dict]) -> None:
+        for event in events:
+            logger.info(f"Product change {event['id']}: {event['type']} product {event['product_id']}")
+
+
+class InMemorySink(OutboxSink):
+    """In-process queue of events, for tests and local consumers"""
+
+    def __init__(self, maxsize: int = 0):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def publish(self, events: List[dict]) -> None:
+        for event in events:
+            await self.queue.put(event)
+
+
+class RedisStreamSink(OutboxSink):
+    """Appends events to a Redis stream, one entry per event
+
+    Consumers read the stream with XREAD/XREADGROUP; each entry carries
+    the outbox id so redelivered events can be recognised. Pass `client`
+    to use a local stand-in; otherwise a redis-py asyncio client is
+    created from `url`.
+    """
+
+    def __init__(self, url: str = "", stream: str = "product-service:changes", max_length: int = 100000, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.stream = stream
+        self.max_length = max_length
+
+    async def publish(self, events: List[dict]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for event in events:
+            pipeline.xadd(
+                self.stream,
+                {"id": event["id"], "type": event["type"], "event": json.dumps(event)},
+                maxlen=self.max_length,
+                approximate=True
+            )
+        await pipeline.execute()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def create_sink(backend: str) -> Optional[OutboxSink]:
+    """Build the sink named by configuration ("log", "memory", "redis"); None for "none" """
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return InMemorySink()
+    if backend == "redis":
+        return RedisStreamSink(settings.REDIS_URL, settings.OUTBOX_REDIS_STREAM, settings.OUTBOX_REDIS_MAX_LENGTH)
+    if backend != "log":
+        logger.error(f"Unknown outbox sink {backend!r}, using log")
+    return LogSink()
+
+
+_sink: Optional[OutboxSink] = None
+_sink_created = False
+
+def get_sink() -> Optional[OutboxSink]:
+    """Return the configured sink, creating it on first use (None when the outbox is off)"""
+    global _sink, _sink_created
+    if not _sink_created:
+        _sink = create_sink(settings.OUTBOX_SINK)
+        _sink_created = True
+    return _sink
+
+def set_sink(sink: Optional[OutboxSink]) -> None:
+    """Replace the sink; None turns the outbox off"""
+    global _sink, _sink_created
+    _sink = sink
+    _sink_created = True
+
+def outbox_enabled() -> bool:
+    """Whether changes are recorded in the outbox at all"""
+    return get_sink() is not None
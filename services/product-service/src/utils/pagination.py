@@ -0,0 +1,54 @@
+"""Keyset pagination cursors for list endpoints
+
+A copy of this module ships with every service that pages by keyset; the
+original is in services/shared (edit it there and run
+services/sync_shared.py).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int = 1) -> List[Any]:
+    """Decode an opaque cursor back into its sort key values"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def decode_id_cursor(cursor: str) -> int:
+    """Decode an id cursor"""
+    (row_id,) = decode_cursor(cursor)
+    try:
+        return int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def decode_datetime_cursor(cursor: str) -> tuple:
+    """Decode a (created_at, id) cursor"""
+    created_at, row_id = decode_cursor(cursor, size=2)
+    try:
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def next_cursor(rows: list, limit: int, *key_attrs: str) -> Optional[str]:
+    """Return the cursor for the page after rows, or None on the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(*(getattr(last, attr) for attr in key_attrs))
@@ -1,42 +1,18 @@
-import boto3
-import os
 import logging
+from typing import Dict, Optional, Tuple
 from uuid import uuid4
 
+from src.utils.storage import get_storage
+
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Lấy thông tin AWS từ biến môi trường
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_REGION", "ap-southeast-1")
-AWS_S3_BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME")
-
-# Kiểm tra xem các biến môi trường có được thiết lập không
-if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_S3_BUCKET_NAME]):
-    logger.warning("AWS credentials or bucket name not set. S3 upload will not work.")
-    # Sử dụng giá trị mặc định cho môi trường phát triển
-    AWS_ACCESS_KEY_ID = AWS_ACCESS_KEY_ID or "dummy_key"
-    AWS_SECRET_ACCESS_KEY = AWS_SECRET_ACCESS_KEY or "dummy_secret"
-    AWS_S3_BUCKET_NAME = AWS_S3_BUCKET_NAME or "dummy_bucket"
-
-try:
-    s3_client = boto3.client(
-        "s3",
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name=AWS_REGION,
-    )
-    logger.info("S3 client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize S3 client: {e}")
-    s3_client = None
-
-from typing import Optional
+# The functions below delegate to the configured storage backend
+# (see src.utils.storage); the client is created on first use.
 
 def upload_image_to_s3(file_obj, filename: str, content_type: str, product_id: Optional[int] = None) -> str:
-    """Upload file_obj to S3 and return the public URL"""
+    """Upload file_obj to S3 and return the public URL; storage errors are logged and re-raised"""
     try:
         # Xử lý tên file an toàn
         safe_filename = filename.replace(' ', '_')
@@ -47,25 +23,39 @@ def upload_image_to_s3(file_obj, filename: str, content_type: str, product_id: O
         else:
             key = f"products/{uuid4()}_{safe_filename}"
         
-        logger.info(f"Uploading file {safe_filename} to S3 bucket {AWS_S3_BUCKET_NAME}")
-        
-        # Kiểm tra nếu s3_client không khởi tạo thành công
-        if s3_client is None:
-            logger.error("S3 client not initialized. Cannot upload file.")
-            # Trả về URL giả lập cho môi trường phát triển
-            return f"/mock-s3-url/{key}"
-        
-        # Upload file lên S3
-        s3_client.upload_fileobj(
-            file_obj,
-            AWS_S3_BUCKET_NAME,
-            key,
-        )
-        
-        url = f"https://{AWS_S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{key}"
+        logger.info(f"Uploading file {safe_filename} to storage")
+        url = get_storage().put(key, file_obj.read(), content_type)
         logger.info(f"File uploaded successfully. URL: {url}")
         return url
     except Exception as e:
         logger.error(f"Error uploading file to S3: {e}")
-        # Trả về URL giả lập trong trường hợp lỗi
-        return f"/error-upload/{filename}"
+        raise
+
+
+def get_s3_url(key: str) -> str:
+    """Return the public URL of an object key"""
+    return get_storage().url(key)
+
+def upload_bytes_to_s3(data: bytes, key: str, content_type: str) -> str:
+    """Upload raw bytes under an exact key and return the public URL"""
+    return get_storage().put(key, data, content_type)
+
+def s3_object_exists(key: str) -> bool:
+    """Check whether an object key is already stored"""
+    return get_storage().exists(key)
+
+def download_bytes_from_s3(key: str) -> bytes:
+    """Read an object's bytes"""
+    return get_storage().get(key)
+
+def generate_presigned_put(
+    key: str,
+    content_type: str,
+    expires_in: int,
+    checksum_sha256: Optional[str] = None
+) -> Tuple[str, Dict[str, str]]:
+    """Presign a direct PUT of one object (S3 backend only)
+
+    Returns the URL and the headers the client must send with the PUT.
+    """
+    return get_storage().presign_put(key, content_type, expires_in, checksum_sha256)
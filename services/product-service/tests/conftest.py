@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the service as `src`, like the app does when started from the service directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+from src.services.product_service import ProductService
+from src.utils.bulk_import import detect_format, iter_rows
+
+
+async def chunked(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def parse(data: bytes, fmt: str):
+    async def collect():
+        return [row async for row in iter_rows(chunked(data), fmt)]
+    return asyncio.run(collect())
+
+
+def test_ndjson_rows():
+    data = b'{"name":"a","price":1}\n\n[1]\n{broken\n{"name":"\xc3\xa1o","price":2}'
+    rows = parse(data, "ndjson")
+    assert [(number, error is None) for number, _, error in rows] == [(1, True), (2, False), (3, False), (4, True)]
+    assert rows[1][2] == "Row must be a JSON object"
+    assert rows[2][2].startswith("Invalid JSON")
+    # Multi-byte characters split across chunks are decoded intact
+    assert rows[3][1]["name"] == "áo"
+
+
+def test_csv_rows():
+    data = (
+        "﻿name,price,seller_id,image_urls,variants,description\n"
+        'a,1,2,http://x/1.jpg | http://x/2.jpg,"[{""size"":""M"",""color"":""red"",""quantity"":3}]",\n'
+        '"multi\nline",2,2,,,"quoted, with comma"\n'
+        "b,3,2,,not json,\n"
+        "c,4,2,,,,extra\n"
+        '"unterminated,5,2\n'
+    ).encode()
+    rows = parse(data, "csv")
+    assert rows[0] == (1, {
+        "name": "a",
+        "price": "1",
+        "seller_id": "2",
+        "image_urls": ["http://x/1.jpg", "http://x/2.jpg"],
+        "variants": [{"size": "M", "color": "red", "quantity": 3}],
+    }, None)
+    assert rows[1][1]["name"] == "multi\nline"
+    assert rows[1][1]["description"] == "quoted, with comma"
+    assert "image_urls" not in rows[1][1]
+    assert rows[2][2].startswith("Invalid variants JSON")
+    assert rows[3][2] == "Expected 6 columns, got 7"
+    assert rows[4] == (5, None, "Unterminated quoted field")
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == "csv"
+    assert detect_format("application/x-ndjson") == "ndjson"
+    assert detect_format("application/json") is None
+    assert detect_format(None) is None
+    with pytest.raises(ValueError):
+        iter_rows(chunked(b""), "xml")
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def test_failed_batch_is_retried_row_by_row(monkeypatch):
+    inserted = []
+    batch_sizes = []
+
+    async def bulk_create_products(db, rows):
+        batch_sizes.append(len(rows))
+        if any(row.name.startswith("dup") for row in rows):
+            raise Exception("duplicate key value violates unique constraint\nDETAIL: ...")
+        ids = list(range(len(inserted) + 1, len(inserted) + len(rows) + 1))
+        inserted.extend(row.name for row in rows)
+        return ids
+
+    monkeypatch.setattr("src.services.product_service.ProductController.bulk_create_products", bulk_create_products)
+    lines = [
+        {"name": "p1", "price": 1, "seller_id": 1},
+        {"name": "dup2", "price": 2, "seller_id": 1},
+        {"name": "p3", "price": 3, "seller_id": 1},
+        {"name": "p4", "seller_id": 1},  # no price: rejected before the database
+        {"name": "p5", "price": 5, "seller_id": 1},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines).encode()
+    db = FakeSession()
+
+    report = asyncio.run(ProductService.bulk_import(db, chunked(body), "application/x-ndjson", batch_size=3))
+
+    assert inserted == ["p1", "p3", "p5"]
+    # The first batch of three fails and is retried one row at a time
+    assert batch_sizes == [3, 1, 1, 1, 1]
+    assert report["total_rows"] == 5
+    assert report["created"] == 3
+    assert report["product_ids"] == [1, 2, 3]
+    assert [error["row"] for error in report["errors"]] == [2, 4]
+    assert report["errors"][0]["error"] == "Database error: duplicate key value violates unique constraint"
+    assert report["errors"][1]["error"].startswith("price")
+    assert db.rollbacks == 2
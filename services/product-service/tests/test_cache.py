@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from src.utils.cache import InMemoryLRUCache, RedisCache
+
+
+def fake_redis_cache():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCache(ttl_seconds=60, client=fakeredis.aioredis.FakeRedis())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_cache(request):
+    if request.param == "memory":
+        return lambda: InMemoryLRUCache(max_entries=10, ttl_seconds=60)
+    return fake_redis_cache
+
+
+def test_fill_at_current_generation_is_stored(make_cache):
+    async def run():
+        cache = make_cache()
+        generation = (await cache.generations(["p:1"]))["p:1"]
+        await cache.set("p:1", {"name": "a"}, generation)
+        return await cache.get("p:1")
+    assert asyncio.run(run()) == {"name": "a"}
+
+
+def test_fill_started_before_invalidation_is_not_stored(make_cache):
+    async def run():
+        cache = make_cache()
+        await cache.set("p:1", {"name": "old"})
+        # A reader takes the generation, then a writer commits and invalidates
+        generation = (await cache.generations(["p:1"]))["p:1"]
+        await cache.delete("p:1")
+        await cache.set("p:1", {"name": "old"}, generation)
+        stale = await cache.get("p:1")
+        # The next fill, at the new generation, is stored
+        generation = (await cache.generations(["p:1"]))["p:1"]
+        await cache.set("p:1", {"name": "new"}, generation)
+        return stale, await cache.get("p:1")
+    assert asyncio.run(run()) == (None, {"name": "new"})
+
+
+def test_invalidation_only_affects_its_key(make_cache):
+    async def run():
+        cache = make_cache()
+        generations = await cache.generations(["p:1", "p:2"])
+        await cache.delete("p:1")
+        await cache.set("p:2", 2, generations["p:2"])
+        return await cache.get_many(["p:1", "p:2"])
+    assert asyncio.run(run()) == {"p:2": 2}
+
+
+class FlakyPipeline:
+    def __init__(self, client):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+    async def execute(self):
+        self.client.attempts += 1
+        if self.client.attempts <= self.client.failures:
+            raise ConnectionError("redis unreachable")
+
+
+class FlakyRedis:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = 0
+
+    def register_script(self, script):
+        return None
+
+    def pipeline(self, transaction=True):
+        return FlakyPipeline(self)
+
+
+def test_redis_delete_retries_transient_failures():
+    client = FlakyRedis(failures=2)
+    cache = RedisCache(client=client, delete_attempts=3, retry_delay_seconds=0)
+    asyncio.run(cache.delete("p:1"))
+    assert client.attempts == 3
+
+
+def test_redis_delete_raises_when_retries_run_out():
+    client = FlakyRedis(failures=5)
+    cache = RedisCache(client=client, delete_attempts=3, retry_delay_seconds=0)
+    with pytest.raises(RuntimeError, match="p:1"):
+        asyncio.run(cache.delete("p:1"))
+    assert client.attempts == 3
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.services.product_service import ProductService
+from src.utils.category_tree import CategoryTree
+
+
+def category(id, parent_id=None, name=None):
+    return SimpleNamespace(id=id, name=name or f"c{id}", parent_id=parent_id)
+
+
+# 1 ─┬─ 2 ─── 4
+#    └─ 3
+# 5 (parent 99 does not exist)
+TREE = [category(1), category(2, 1), category(3, 1), category(4, 2), category(5, 99)]
+
+
+def test_subtree_and_ancestors():
+    tree = CategoryTree(TREE)
+    assert tree.subtree_ids(1) == {1, 2, 3, 4}
+    assert tree.subtree_ids(2) == {2, 4}
+    assert tree.subtree_ids(4) == {4}
+    assert tree.ancestors(4) == [2, 1]
+    assert tree.ancestors(1) == []
+
+
+def test_dangling_parent_is_a_root():
+    tree = CategoryTree(TREE)
+    assert tree.roots == [1, 5]
+    assert tree.ancestors(5) == []
+
+
+def test_cycles_still_show_every_category():
+    tree = CategoryTree([category(1, 2), category(2, 1), category(3, 3)])
+    nested = tree.to_nested()
+    emitted = []
+
+    def walk(nodes):
+        for node in nodes:
+            emitted.append(node["id"])
+            walk(node["children"])
+
+    walk(nested)
+    assert sorted(emitted) == [1, 2, 3]
+    assert tree.ancestors(1) == [2]
+
+
+def test_to_nested():
+    nested = CategoryTree(TREE).to_nested()
+    assert [node["id"] for node in nested] == [1, 5]
+    assert [child["id"] for child in nested[0]["children"]] == [2, 3]
+    assert nested[0]["children"][0]["children"][0]["id"] == 4
+
+
+def test_facet_counts_roll_up_through_ancestors(monkeypatch):
+    rows = [
+        (None, None, None, 10, "total"),
+        (None, 4, None, 3, "category"),
+        (None, 3, None, 2, "category"),
+        (None, 1, None, 1, "category"),
+        (None, 5, None, 4, "category"),
+    ]
+
+    async def get_facets(*args):
+        return rows
+
+    async def get_category_tree(db):
+        return CategoryTree(TREE)
+
+    monkeypatch.setattr("src.services.product_service.ProductController.get_facets", get_facets)
+    monkeypatch.setattr("src.services.product_service.CategoryController.get_category_tree", get_category_tree)
+
+    facets = asyncio.run(ProductService.get_facets(None))
+    counts = {c["category_id"]: (c["count"], c["direct_count"]) for c in facets["categories"]}
+    assert counts == {1: (6, 1), 2: (3, 0), 3: (2, 2), 4: (3, 3), 5: (4, 4)}
+    assert facets["total"] == 10
@@ -0,0 +1,143 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.utils import compression
+from src.utils.compression import CompressionMiddleware, CompressionSettings, choose_encoding
+
+BIG = b'{"items":[' + b",".join(b'{"id":%d,"name":"product"}' % i for i in range(200)) + b"]}"
+
+
+def create_app(min_size=1024):
+    settings = CompressionSettings()
+    settings.enabled = True
+    settings.min_size = min_size
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, settings=settings)
+
+    @app.get("/big")
+    def big():
+        return Response(BIG, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"id":1}', media_type="application/json")
+
+    @app.get("/png")
+    def png():
+        return Response(b"\x89PNG" + b"\0" * 4000, media_type="image/png")
+
+    @app.get("/weak")
+    def weak():
+        return Response(BIG, media_type="application/json", headers={"ETag": 'W/"abc"', "Vary": "Origin"})
+
+    @app.get("/not-modified")
+    def not_modified():
+        return Response(status_code=304, headers={"ETag": '"abc"'})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((b'{"row":%d}\n' % i for i in range(500)), media_type="application/x-ndjson")
+
+    return app
+
+
+def get(app, path, accept_encoding="gzip"):
+    # stream=True keeps the body as sent, without httpx decoding it
+    with TestClient(app) as client:
+        with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+            return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("identity", None),
+    ("", None),
+    ("*", "br"),
+    ("gzip;q=0, br;q=0", None),
+    ("br;q=bogus, gzip", "gzip"),
+])
+def test_choose_encoding(header, expected):
+    if compression.brotli is None and expected == "br":
+        pytest.skip("brotli is not installed")
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br, gzip") == "gzip"
+    assert choose_encoding("br") is None
+
+
+def test_large_body_is_compressed_with_weak_etag():
+    response, body = get(create_app(), "/big")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) == len(body) < len(BIG)
+    assert gzip.decompress(body) == BIG
+
+
+def test_existing_vary_and_weak_etag_are_kept():
+    response, body = get(create_app(), "/weak")
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert gzip.decompress(body) == BIG
+
+
+def test_small_body_is_sent_as_is_but_varies():
+    response, body = get(create_app(), "/small")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert body == b'{"id":1}'
+
+
+def test_threshold_is_configurable():
+    response, body = get(create_app(min_size=1), "/small")
+    # Too small to shrink, so it is still sent as is
+    assert "content-encoding" not in response.headers
+    response, body = get(create_app(min_size=len(BIG) + 1), "/big")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_uncompressible_types_are_untouched():
+    response, body = get(create_app(), "/png")
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert body.startswith(b"\x89PNG")
+
+
+def test_client_without_encodings_gets_identity():
+    response, body = get(create_app(), "/big", accept_encoding="identity")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+    assert body == BIG
+
+
+def test_not_modified_is_untouched():
+    response, body = get(create_app(), "/not-modified")
+    assert response.status_code == 304
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_stream_is_compressed_chunk_by_chunk():
+    response, body = get(create_app(), "/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = gzip.decompress(body).splitlines()
+    assert len(lines) == 500 and lines[-1] == b'{"row":499}'
+
+
+def test_brotli():
+    if compression.brotli is None:
+        pytest.skip("brotli is not installed")
+    response, body = get(create_app(), "/big", accept_encoding="br")
+    assert response.headers["content-encoding"] == "br"
+    assert compression.brotli.decompress(body) == BIG
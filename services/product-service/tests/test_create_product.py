@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.controllers import product_image_controller
+from src.controllers.product_controller import ProductController
+from src.controllers.product_image_controller import ProductImageController
+from src.database import get_async_db
+from src.routes.product_routes import router
+
+
+class FakeSession:
+    def __init__(self):
+        self.rolled_back = False
+
+    async def rollback(self):
+        self.rolled_back = True
+
+    async def get(self, model, product_id):
+        return SimpleNamespace(id=product_id)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    session = FakeSession()
+    deleted = []
+
+    async def create_product(db, data):
+        return SimpleNamespace(id=7, **data)
+
+    async def delete_product(db, db_product):
+        deleted.append(db_product.id)
+
+    async def find_by_hashes(db, product_id, hashes):
+        return {}, {}
+
+    monkeypatch.setattr(ProductController, "create_product", staticmethod(create_product))
+    monkeypatch.setattr(ProductController, "delete_product", staticmethod(delete_product))
+    monkeypatch.setattr(ProductImageController, "_find_by_hashes", staticmethod(find_by_hashes))
+
+    async def get_db():
+        yield session
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_async_db] = get_db
+    with TestClient(app) as test_client:
+        yield test_client, session, deleted
+
+
+def post_product(test_client, image: bytes):
+    return test_client.post(
+        "/api/v1/products",
+        data={"name": "Áo", "category_id": "1", "price": "100", "seller_id": "2"},
+        files=[("images", ("bad.jpg", image, "image/jpeg"))]
+    )
+
+
+def test_invalid_image_is_rejected_and_product_removed(client, monkeypatch):
+    test_client, session, deleted = client
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        monkeypatch.setattr(product_image_controller, "upload_executor", pool)
+        response = post_product(test_client, b"not an image")
+
+    assert response.status_code == 400
+    assert "bad.jpg" in response.json()["detail"]
+    assert session.rolled_back
+    assert deleted == [7]
+
+
+def test_upload_without_workers_is_unavailable(client, monkeypatch):
+    test_client, _, deleted = client
+    monkeypatch.setattr(product_image_controller, "upload_executor", None)
+    response = post_product(test_client, b"not an image")
+
+    assert response.status_code == 503
+    assert deleted == [7]
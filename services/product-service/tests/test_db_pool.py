@@ -0,0 +1,66 @@
+import re
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.utils import db_pool
+from src.utils.db_pool import PoolMetrics, TimedQueuePool, render_pool_metrics
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_pool, "_registry", [])
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool,
+        pool_size=2,
+        max_overflow=0,
+        pool_timeout=0.1
+    )
+    db_pool._track(engine, PoolMetrics("test-service", "sync"))
+    yield engine
+    engine.dispose()
+
+
+def metric(name: str) -> float:
+    match = re.search(rf'^db_pool_{name}{{service="test-service",engine="sync"}} (\S+)$', render_pool_metrics(), re.M)
+    return float(match.group(1))
+
+
+def test_checkout_and_checkin_are_counted(engine):
+    with engine.connect() as first:
+        first.execute(text("select 1"))
+        assert (metric("checked_out"), metric("checkouts_total")) == (1, 1)
+        with engine.connect():
+            assert metric("checked_out") == 2
+    assert (metric("checked_out"), metric("checked_in")) == (0, 2)
+
+    with engine.connect():
+        pass
+    # The pooled connection is reused, not opened again
+    assert (metric("checkouts_total"), metric("connects_total")) == (3, 2)
+    assert metric("size") == 2
+    assert metric("timeouts_total") == 0
+
+
+def test_exhausted_pool_counts_a_timeout_and_the_wait(engine):
+    with engine.connect(), engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    assert metric("timeouts_total") == 1
+    assert metric("wait_seconds_max") >= 0.1
+    assert metric("wait_seconds_total") >= metric("wait_seconds_max")
+
+
+def test_metrics_render_in_prometheus_text_format(engine):
+    with engine.connect():
+        pass
+    output = render_pool_metrics()
+    assert output.endswith("\n")
+    assert "# TYPE db_pool_checkouts_total counter\n" in output
+    assert "# TYPE db_pool_checked_out gauge\n" in output
+    samples = [line for line in output.splitlines() if not line.startswith("#")]
+    # One sample per metric for the single registered engine
+    assert len(samples) == 9
+    assert 'db_pool_checkouts_total{service="test-service",engine="sync"} 1' in samples
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from starlette.requests import Request
+
+from src.controllers.product_controller import ProductController
+
+from src.services.product_service import ProductService
+from src.utils.http_cache import cache_headers, etag_matches, make_etag, not_modified
+
+
+def request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_make_etag_is_weak_and_stable():
+    etag = make_etag("product", 1, 5, None)
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == make_etag("product", 1, 5, None)
+    assert etag != make_etag("product", 1, 6, None)
+    # Tuples and lists are the same data
+    assert make_etag("products", [(1, 2)]) == make_etag("products", [[1, 2]])
+
+
+def test_etag_matches():
+    etag = make_etag("x")
+    assert not etag_matches(request(), etag)
+    assert etag_matches(request(etag), etag)
+    assert etag_matches(request(etag.removeprefix("W/")), etag)
+    assert etag_matches(request(f'"other", {etag}'), etag)
+    assert etag_matches(request("*"), etag)
+    assert not etag_matches(request('"other"'), etag)
+
+
+def test_not_modified_keeps_caching_headers():
+    headers = cache_headers(make_etag("x"), "public, no-cache")
+    response = not_modified(headers)
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == headers["ETag"]
+    assert response.headers["cache-control"] == "public, no-cache"
+
+
+def test_product_etag_follows_stock_only_when_variants_are_shown():
+    before = [(1, 5), (2, 3)]
+    after = [(1, 4), (2, 3)]
+    assert ProductService._product_etag(7, 10, before, None) != ProductService._product_etag(7, 10, after, None)
+    assert ProductService._product_etag(7, 10, before, ["id", "variants"]) != ProductService._product_etag(7, 10, after, ["id", "variants"])
+    assert ProductService._product_etag(7, 10, before, ["id", "name"]) == ProductService._product_etag(7, 10, after, ["id", "name"])
+    assert ProductService._product_etag(7, 10, before, None) != ProductService._product_etag(7, 11, before, None)
+
+
+def test_product_etag_comes_from_the_loaded_product(monkeypatch):
+    product = SimpleNamespace(
+        id=7, name="p", description=None, brand=None, category_id=1, price=10, seller_id=1,
+        created_at=datetime(2024, 1, 1), version=12, variants=[], images=[]
+    )
+    loaded_columns = []
+
+    async def none(*args):
+        return None
+
+    async def generations(product_ids):
+        return {product_id: 0 for product_id in product_ids}
+
+    async def get_product(db, product_id, columns=None):
+        loaded_columns.append(columns)
+        return product
+
+    async def load_relations(db, products, relations=("variants", "images")):
+        if "variants" in relations:
+            product.variants = [SimpleNamespace(
+                id=3, product_id=7, size="M", color="r", quantity=4, price=None, created_at=datetime(2024, 1, 1)
+            )]
+
+    async def separate_query(*args):
+        raise AssertionError("ETag read separately from the body")
+
+    monkeypatch.setattr(ProductController, "get_cached_product", staticmethod(none))
+    monkeypatch.setattr(ProductController, "cache_product", staticmethod(none))
+    monkeypatch.setattr(ProductController, "get_cache_generations", staticmethod(generations))
+    monkeypatch.setattr(ProductController, "get_product", staticmethod(get_product))
+    monkeypatch.setattr(ProductController, "load_products_relations", staticmethod(load_relations))
+    monkeypatch.setattr(ProductController, "get_product_version", staticmethod(separate_query))
+    monkeypatch.setattr(ProductController, "get_variant_stock", staticmethod(separate_query))
+
+    body, etag = asyncio.run(ProductService.get_product(None, 7))
+    assert etag == ProductService._product_etag(7, 12, [(3, 4)], None)
+    assert body["version"] == 12 and body["variants"][0]["quantity"] == 4
+
+    body, etag = asyncio.run(ProductService.get_product(None, 7, ["id", "name"]))
+    assert body == {"id": 7, "name": "p"}
+    assert etag == ProductService._product_etag(7, 12, None, ["id", "name"])
+    # The version is loaded even when not requested
+    assert loaded_columns[-1] == ["id", "name", "version"]
@@ -0,0 +1,86 @@
+import asyncio
+import io
+from datetime import datetime
+
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from src.controllers import product_image_controller
+from src.controllers.product_image_controller import ProductImageController
+from src.models import ProductImage
+from src.schemas.product_schemas import ProductImageResponse
+from src.utils.image_pipeline import RENDITIONS, content_hash, rendition_key, render_renditions
+
+
+def encode(image: Image.Image, image_format: str = "PNG") -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def test_renditions_cover_every_size_and_format():
+    data = encode(Image.new("RGBA", (2000, 1000), (255, 0, 0, 128)))
+    renditions = render_renditions(data)
+    image_hash = content_hash(data)
+
+    assert len(renditions) == len(RENDITIONS) * 2
+    for name, max_size in RENDITIONS.items():
+        webp, webp_type = renditions[rendition_key(image_hash, name, "webp")]
+        jpg, jpg_type = renditions[rendition_key(image_hash, name, "jpg")]
+        assert (webp_type, jpg_type) == ("image/webp", "image/jpeg")
+        with Image.open(io.BytesIO(webp)) as image:
+            assert image.format == "WEBP"
+            assert image.size == (max_size, max_size // 2)
+        with Image.open(io.BytesIO(jpg)) as image:
+            # Alpha is flattened for JPEG
+            assert (image.format, image.mode) == ("JPEG", "RGB")
+            assert image.size == (max_size, max_size // 2)
+
+
+def test_small_images_are_not_upscaled():
+    data = encode(Image.new("RGB", (100, 50), "blue"), "JPEG")
+    renditions = render_renditions(data)
+    for key, (rendered, _) in renditions.items():
+        with Image.open(io.BytesIO(rendered)) as image:
+            assert image.size == (100, 50), key
+
+
+def test_renditions_are_listed_once_stored():
+    image = dict(id=1, product_id=2, image_url="http://x/a.png", content_hash="ab" * 32, uploaded_at=datetime(2024, 1, 1))
+    assert ProductImageResponse(**image).renditions == {}
+    ready = ProductImageResponse(**image, renditions_ready=True).renditions
+    assert set(ready) == set(RENDITIONS)
+    assert ready["thumb"]["webp"].endswith(rendition_key("ab" * 32, "thumb", "webp"))
+
+
+def test_upload_reuses_an_original_stored_for_another_product(monkeypatch):
+    data = encode(Image.new("RGB", (10, 10), "red"))
+    image_hash = content_hash(data)
+    saved = []
+    scheduled = []
+
+    async def find_by_hashes(db, product_id, hashes):
+        return {image_hash: "http://x/original.png"}, {}
+
+    async def save_images(db, product_id, db_images):
+        saved.extend(db_images)
+        for db_image in db_images:
+            db_image.renditions_ready = True
+        return db_images
+
+    monkeypatch.setattr(ProductImageController, "_find_by_hashes", staticmethod(find_by_hashes))
+    monkeypatch.setattr(ProductImageController, "_save_images", staticmethod(save_images))
+    monkeypatch.setattr(ProductImageController, "schedule_renditions", staticmethod(lambda *args: scheduled.append(args)))
+    # Any upload would fail: the workers are not running
+    monkeypatch.setattr(product_image_controller, "upload_executor", None)
+
+    upload = UploadFile(io.BytesIO(data), filename="copy.png", headers=Headers({"content-type": "image/png"}))
+    result = asyncio.run(ProductImageController.upload_images(None, 5, [upload]))
+
+    assert [(image.product_id, image.image_url, image.content_hash) for image in result] == [
+        (5, "http://x/original.png", image_hash)
+    ]
+    assert saved == result
+    assert isinstance(result[0], ProductImage)
+    # Renditions already stored for the hash are not checked again
+    assert scheduled == []
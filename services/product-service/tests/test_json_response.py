@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, Field, computed_field
+
+from src.schemas.product_schemas import ProductResponse
+from src.utils.json_response import ORJSONResponse, model_response
+
+
+class LineResponse(BaseModel):
+    sku: str
+    unit_price: Decimal
+    quantity: int
+
+    @computed_field
+    @property
+    def total(self) -> Decimal:
+        return self.unit_price * self.quantity
+
+
+class OrderResponse(BaseModel):
+    id: int
+    placed_at: datetime
+    shipped_at: Optional[datetime] = None
+    discount: Optional[Decimal] = None
+    note: str = Field(serialization_alias="comment")
+    lines: List[LineResponse]
+
+    class Config:
+        from_attributes = True
+
+
+ORDERS = [
+    SimpleNamespace(
+        id=1,
+        placed_at=datetime(2024, 2, 29, 23, 59, 59, 123456),
+        shipped_at=datetime(2024, 3, 1, 8, 0, tzinfo=timezone(timedelta(hours=7))),
+        discount=Decimal("0.10"),
+        note="Giao hàng nhanh",
+        lines=[SimpleNamespace(sku="A-1", unit_price=Decimal("199000.50"), quantity=3)],
+    ),
+    SimpleNamespace(id=2, placed_at=datetime(2024, 1, 1), shipped_at=None, discount=None, note="", lines=[]),
+]
+
+PRODUCTS = [
+    SimpleNamespace(
+        id=7, name="Áo", description=None, brand="b", category_id=1, price=100, seller_id=2,
+        created_at=datetime(2024, 1, 1, 12, 30), version=3,
+        variants=[SimpleNamespace(id=1, product_id=7, size="M", color="đỏ", quantity=4, price=None, created_at=datetime(2024, 1, 1))],
+        images=[SimpleNamespace(
+            id=2, product_id=7, image_url="http://x/a.png", content_hash="ab" * 32,
+            renditions_ready=True, uploaded_at=datetime(2024, 1, 2)
+        )],
+    )
+]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    @app.get("/default/orders", response_model=List[OrderResponse])
+    def default_orders():
+        return ORDERS
+
+    @app.get("/fast/orders", response_model=List[OrderResponse])
+    def fast_orders():
+        return model_response(List[OrderResponse], ORDERS)
+
+    @app.get("/default/products", response_model=List[ProductResponse])
+    def default_products():
+        return PRODUCTS
+
+    @app.get("/fast/products", response_model=List[ProductResponse])
+    def fast_products():
+        return model_response(List[ProductResponse], PRODUCTS, {"ETag": '"1"'})
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("resource", ["orders", "products"])
+def test_model_response_matches_fastapi_serialization(client, resource):
+    default = client.get(f"/default/{resource}")
+    fast = client.get(f"/fast/{resource}")
+    assert fast.status_code == default.status_code == 200
+    assert fast.headers["content-type"] == default.headers["content-type"] == "application/json"
+    assert fast.json() == default.json()
+    assert fast.content == default.content
+
+
+def test_decimal_and_datetime_encoding(client):
+    order = client.get("/fast/orders").json()[0]
+    # Decimals keep their digits as strings, like FastAPI's default
+    assert order["discount"] == "0.10"
+    assert order["lines"][0] == {"sku": "A-1", "unit_price": "199000.50", "quantity": 3, "total": "597001.50"}
+    assert order["placed_at"] == "2024-02-29T23:59:59.123456"
+    assert order["shipped_at"] == "2024-03-01T08:00:00+07:00"
+    assert order["comment"] == "Giao hàng nhanh"
+
+
+def test_model_response_accepts_model_instances_and_headers():
+    orders = [OrderResponse.model_validate(order, from_attributes=True) for order in ORDERS]
+    response = model_response(List[OrderResponse], orders, {"ETag": '"x"'}, status_code=201)
+    assert response.status_code == 201
+    assert response.headers["etag"] == '"x"'
+    assert response.body == model_response(List[OrderResponse], ORDERS).body
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.controllers.outbox_controller import OutboxController, PRODUCT_EVENT_LOCK, RELAY_LOCK
+from src.utils.outbox import InMemorySink, OutboxSink, set_sink
+
+
+def compiled(statement):
+    return statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+
+
+class FakeSession:
+    """Records statements; answers the relay lock and the pending-events query"""
+
+    def __init__(self, relay_lock: bool = True, pending=()):
+        self.relay_lock = relay_lock
+        self.pending = list(pending)
+        self.statements = []
+        self.committed = False
+        self.rolled_back = False
+
+    async def execute(self, statement, params=None):
+        self.statements.append((str(compiled(statement)), params))
+        return SimpleNamespace(rowcount=4)
+
+    async def scalar(self, statement):
+        self.statements.append((str(compiled(statement)), None))
+        return self.relay_lock
+
+    async def scalars(self, statement):
+        self.statements.append((str(compiled(statement)), None))
+        return SimpleNamespace(all=lambda: self.pending)
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        self.rolled_back = True
+
+    def sql(self):
+        return [sql for sql, _ in self.statements]
+
+
+class FailingSink(OutboxSink):
+    async def publish(self, events):
+        raise ConnectionError("sink down")
+
+
+@pytest.fixture(autouse=True)
+def outbox_on():
+    set_sink(InMemorySink())
+    yield
+    set_sink(None)
+
+
+def event(event_id: int, product_id: int):
+    return SimpleNamespace(
+        id=event_id, event_type="product.updated", product_id=product_id,
+        payload={"id": product_id}, created_at=datetime(2024, 1, 1)
+    )
+
+
+def test_record_events_locks_products_in_one_statement():
+    db = FakeSession()
+    asyncio.run(OutboxController.record_events(db, [
+        ("product.updated", 9, {}),
+        ("variant.created", 3, {}),
+        ("image.created", 9, {}),
+        ("product.created", 5, {}),
+        ("variant.stock_changed", 7, {}),
+    ]))
+    lock_sql, insert = db.statements
+    # Only products that already existed, in id order
+    assert lock_sql[0].startswith(f"SELECT pg_advisory_xact_lock({PRODUCT_EVENT_LOCK}, product_id)")
+    assert "FROM unnest(ARRAY[3, 9])" in lock_sql[0]
+    assert insert[0].startswith("INSERT INTO")
+    assert [row["product_id"] for row in insert[1]] == [9, 3, 9, 5, 7]
+
+
+def test_record_events_without_locks():
+    db = FakeSession()
+    asyncio.run(OutboxController.record_events(db, [("variant.created", 3, {})], unlocked=True))
+    asyncio.run(OutboxController.record_events(db, [("product.created", 4, {})]))
+    assert len(db.statements) == 2
+    assert all("pg_advisory_xact_lock" not in sql for sql in db.sql())
+
+
+def test_record_events_skipped_when_outbox_is_off():
+    set_sink(None)
+    db = FakeSession()
+    asyncio.run(OutboxController.record_events(db, [("product.updated", 1, {})]))
+    assert db.statements == []
+
+
+def test_publish_pending_marks_published_events():
+    sink = InMemorySink()
+    db = FakeSession(pending=[event(1, 2), event(2, 3)])
+    assert asyncio.run(OutboxController.publish_pending(db, sink)) == 2
+    assert f"pg_try_advisory_xact_lock({RELAY_LOCK}, 0)" in db.sql()[0]
+    assert [sink.queue.get_nowait()["id"] for _ in range(2)] == [1, 2]
+    assert db.sql()[-1].startswith("UPDATE")
+    assert "IN (1, 2)" in db.sql()[-1]
+    assert db.committed
+
+
+def test_publish_pending_skips_when_another_relay_holds_the_lock():
+    db = FakeSession(relay_lock=False, pending=[event(1, 2)])
+    assert asyncio.run(OutboxController.publish_pending(db, InMemorySink())) == 0
+    assert len(db.statements) == 1
+    assert db.rolled_back and not db.committed
+
+
+def test_publish_pending_marks_nothing_when_the_sink_fails():
+    db = FakeSession(pending=[event(1, 2)])
+    with pytest.raises(ConnectionError):
+        asyncio.run(OutboxController.publish_pending(db, FailingSink()))
+    assert not any(sql.startswith("UPDATE") for sql in db.sql())
+    assert db.rolled_back and not db.committed
+
+
+def test_purge_published_deletes_only_old_published_events():
+    db = FakeSession()
+    assert asyncio.run(OutboxController.purge_published(db, 24)) == 4
+    sql = db.sql()[0]
+    assert sql.startswith("DELETE FROM")
+    assert "published_at < now() - " in sql
+    assert db.committed
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from src.utils.pagination import (
+    decode_cursor,
+    decode_datetime_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    next_cursor,
+)
+
+
+class Row:
+    def __init__(self, id, created_at=None):
+        self.id = id
+        self.created_at = created_at
+
+
+def test_id_cursor_round_trip():
+    cursor = encode_cursor(42)
+    assert "=" not in cursor
+    assert decode_id_cursor(cursor) == 42
+
+
+def test_datetime_cursor_round_trip():
+    created_at = datetime(2026, 10, 18, 12, 30, 15, 123456)
+    assert decode_datetime_cursor(encode_cursor(created_at, 7)) == (created_at, 7)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    encode_cursor(1)[:-2],  # truncated
+    encode_cursor("abc"),  # id is not an integer
+    encode_cursor(1, 2),  # wrong number of values
+    "eyJhIjoxfQ",  # a JSON object, not a list
+])
+def test_bad_id_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_id_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor(1),
+    encode_cursor("yesterday", 1),
+    encode_cursor(datetime(2026, 1, 1), "x"),
+])
+def test_bad_datetime_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_datetime_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_decode_cursor_checks_size():
+    assert decode_cursor(encode_cursor(1, "a"), size=2) == [1, "a"]
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor(1, "a"))
+
+
+def test_next_cursor_only_on_full_pages():
+    rows = [Row(1), Row(2), Row(3)]
+    assert next_cursor(rows, 4, "id") is None
+    assert next_cursor([], 3, "id") is None
+    assert decode_id_cursor(next_cursor(rows, 3, "id")) == 3
@@ -0,0 +1,202 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from src.controllers.product_controller import ProductController
+from src.controllers.stock_reservation_controller import StockReservationController
+from src.schemas.product_schemas import ReservationCreate
+from src.services.stock_reservation_service import StockReservationService
+from src.utils.outbox import set_sink
+
+
+class Result:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class ScriptedSession:
+    """Answers statements with scripted results, in order, and records their SQL"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.committed = False
+        self.rolled_back = False
+
+    def _next(self, statement):
+        self.statements.append(str(statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )))
+        return self.results.pop(0)
+
+    async def execute(self, statement, params=None):
+        return self._next(statement)
+
+    async def scalar(self, statement):
+        return self._next(statement)
+
+    async def scalars(self, statement):
+        return self._next(statement)
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture(autouse=True)
+def no_side_effects(monkeypatch):
+    set_sink(None)
+    invalidated = []
+
+    async def invalidate_cache(product_id):
+        invalidated.append(product_id)
+
+    monkeypatch.setattr(ProductController, "invalidate_cache", staticmethod(invalidate_cache))
+    return invalidated
+
+
+def test_reserve_decrements_each_variant_conditionally_in_id_order(no_side_effects):
+    reservation = SimpleNamespace(id=1, token="t")
+    db = ScriptedSession(
+        Result([(10, 3, 1)]),
+        Result([(11, 8, 0)]),
+        reservation,
+        Result(),
+    )
+    result, shortages = asyncio.run(StockReservationController.reserve(db, {8: 2, 3: 4}, 60))
+
+    assert (result, shortages) == (reservation, [])
+    first, second = db.statements[:2]
+    assert first.startswith("UPDATE product_service.product_variants SET quantity=")
+    assert "product_variants.id = 3 AND product_service.product_variants.quantity >= 4" in first
+    assert "product_variants.id = 8 AND product_service.product_variants.quantity >= 2" in second
+    assert db.committed and not db.rolled_back
+    assert sorted(no_side_effects) == [10, 11]
+
+
+def test_reserve_rolls_back_and_reports_shortages():
+    db = ScriptedSession(
+        Result([(10, 3, 1)]),
+        Result(),
+        # Available stock, read after the rollback; variant 9 does not exist
+        Result([(3, 5), (8, 1)]),
+    )
+    result, shortages = asyncio.run(StockReservationController.reserve(db, {3: 4, 8: 2, 9: 1}, 60))
+
+    assert result is None
+    assert shortages == [
+        {"variant_id": 8, "requested": 2, "available": 1},
+        {"variant_id": 9, "requested": 1, "available": None},
+    ]
+    assert db.rolled_back and not db.committed
+    # The third variant is never touched once one is short
+    assert sum(sql.startswith("UPDATE") for sql in db.statements) == 2
+
+
+def test_reserve_service_merges_repeated_variants_and_maps_shortage_to_409(monkeypatch):
+    calls = []
+
+    async def reserve(db, items, ttl_seconds, reference):
+        calls.append(items)
+        return None, [{"variant_id": 3, "requested": 5, "available": 1}]
+
+    monkeypatch.setattr(StockReservationController, "reserve", staticmethod(reserve))
+    request = ReservationCreate(items=[{"variant_id": 3, "quantity": 2}, {"variant_id": 3, "quantity": 3}])
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(StockReservationService.reserve(None, request))
+
+    assert calls == [{3: 5}]
+    assert error.value.status_code == 409
+    assert error.value.detail["shortages"][0]["available"] == 1
+
+
+def patch_transitions(monkeypatch, status, expired=False):
+    """Make every commit/release find the reservation already in `status`"""
+    current = SimpleNamespace(id=1, token="t", status=status)
+
+    async def no_transition(db, token):
+        return None
+
+    async def get_reservation(db, token):
+        return current
+
+    async def get_items(db, reservation_id):
+        return []
+
+    monkeypatch.setattr(StockReservationController, "commit_reservation", staticmethod(no_transition))
+    monkeypatch.setattr(StockReservationController, "release_reservation", staticmethod(no_transition))
+    monkeypatch.setattr(StockReservationController, "get_reservation", staticmethod(get_reservation))
+    monkeypatch.setattr(StockReservationController, "get_items", staticmethod(get_items))
+    return current
+
+
+def test_committing_twice_is_a_no_op(monkeypatch):
+    current = patch_transitions(monkeypatch, "committed")
+    assert asyncio.run(StockReservationService.commit_reservation(None, "t")) is current
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(StockReservationService.release_reservation(None, "t"))
+    assert error.value.status_code == 409
+
+
+@pytest.mark.parametrize("status", ["released", "expired"])
+def test_releasing_twice_is_a_no_op(monkeypatch, status):
+    current = patch_transitions(monkeypatch, status)
+    assert asyncio.run(StockReservationService.release_reservation(None, "t")) is current
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(StockReservationService.commit_reservation(None, "t"))
+    assert (error.value.status_code, error.value.detail) == (409, f"Reservation is {status}")
+
+
+def test_commit_after_expiry_before_the_sweep(monkeypatch):
+    # Still pending, but commit_reservation found it past expires_at
+    patch_transitions(monkeypatch, "pending")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(StockReservationService.commit_reservation(None, "t"))
+    assert error.value.detail == "Reservation is expired"
+
+
+def test_commit_only_matches_pending_unexpired_reservations():
+    db = ScriptedSession(None)
+    assert asyncio.run(StockReservationController.commit_reservation(db, "t")) is None
+    sql = db.statements[0]
+    assert "status = 'pending'" in sql
+    assert "expires_at > now()" in sql
+
+
+def test_expire_returns_stock_of_expired_reservations(no_side_effects):
+    db = ScriptedSession(
+        Result([4, 7]),
+        Result(),
+        # Reserved totals per variant, then the restored variants
+        Result([(3, 2), (8, 5)]),
+        Result([(10, 3, 6)]),
+        # Variant 8 was deleted since
+        Result(),
+    )
+    assert asyncio.run(StockReservationController.expire_reservations(db)) == 2
+
+    select_due, mark_expired, _, restore_3, restore_8 = db.statements
+    assert "expires_at <= now()" in select_due
+    assert "FOR UPDATE SKIP LOCKED" in select_due
+    assert "SET status='expired'" in mark_expired and "IN (4, 7)" in mark_expired
+    assert "quantity=(product_service.product_variants.quantity + 2)" in restore_3
+    assert "product_variants.id = 8" in restore_8
+    assert db.committed
+    assert no_side_effects == [10]
+
+
+def test_expire_with_nothing_due():
+    db = ScriptedSession(Result())
+    assert asyncio.run(StockReservationController.expire_reservations(db)) == 0
+    assert db.rolled_back and not db.committed
@@ -0,0 +1,35 @@
+"""add comment keyset pagination indexes
+
+Revision ID: 5d1e8a3c9b27
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e8a3c9b27'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps comments writable while the indexes build; it cannot run in a transaction
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_comments_created_at_id
+            ON review_service.comments (created_at DESC, id DESC)
+        """)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_comments_product_created_at_id
+            ON review_service.comments (product_id, created_at DESC, id DESC)
+        """)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS review_service.ix_comments_product_created_at_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS review_service.ix_comments_created_at_id")
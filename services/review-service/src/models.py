@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, Text, DateTime
+from sqlalchemy import Column, Integer, Text, DateTime, Index, text
 from sqlalchemy.sql import func
 from src.database import Base
 
 class Comment(Base):
     __tablename__ = "comments"
     __table_args__ = (
+        # Keyset pagination of /comments, newest first, overall and per product
+        Index('ix_comments_created_at_id', text('created_at DESC'), text('id DESC')),
+        Index('ix_comments_product_created_at_id', 'product_id', text('created_at DESC'), text('id DESC')),
         {'schema': 'review_service'}
     )
     
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import requests
 
 from src.database import get_db
+from src.utils.json_response import model_response
+from src.utils.pagination import NEXT_CURSOR_HEADER, decode_datetime_cursor, next_cursor
 from src.models import Comment
 from src.schemas.review_schemas import CommentCreate, CommentUpdate, CommentResponse
 from src.config import settings
@@ -55,9 +58,14 @@ async def get_comments(
     user_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get all comments with optional filters"""
+    """Get all comments with optional filters
+
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next
+    page by keyset instead of offset.
+    """
     query = db.query(Comment)
     
     # Apply filters
@@ -66,8 +74,17 @@ async def get_comments(
     if user_id:
         query = query.filter(Comment.user_id == user_id)
     
-    comments = query.order_by(Comment.created_at.desc()).offset(skip).limit(limit).all()
-    return comments
+    query = query.order_by(Comment.created_at.desc(), Comment.id.desc())
+    if cursor:
+        created_at, comment_id = decode_datetime_cursor(cursor)
+        query = query.filter(tuple_(Comment.created_at, Comment.id) < (created_at, comment_id))
+    else:
+        query = query.offset(skip)
+    comments = query.limit(limit).all()
+    
+    cursor_value = next_cursor(comments, limit, "created_at", "id")
+    headers = {NEXT_CURSOR_HEADER: cursor_value} if cursor_value else None
+    return model_response(List[CommentResponse], comments, headers)
 
 @router.get("/comments/{comment_id}", response_model=CommentResponse)
 async def get_comment(comment_id: int, db: Session = Depends(get_db)):
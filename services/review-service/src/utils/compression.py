@@ -0,0 +1,239 @@
+"""Response compression shared by every service
+
+Each service ships an identical copy of this module, since services are
+built from their own directories; the original is in services/shared (edit
+it there and run services/sync_shared.py). Compression is configured from
+environment variables, so every service can be tuned on its own:
+
+    COMPRESSION_ENABLED          compress responses at all (true)
+    COMPRESSION_MIN_SIZE         bodies below this many bytes are sent as is (1024)
+    COMPRESSION_GZIP_LEVEL       zlib level, 1 (fast) to 9 (small) (5)
+    COMPRESSION_BROTLI_QUALITY   brotli quality, 0 (fast) to 11 (small) (4)
+    COMPRESSION_CONTENT_TYPES    comma-separated media types to compress
+                                 (application/json, application/x-ndjson,
+                                 text/plain, text/csv, text/html, image/svg+xml)
+
+Brotli is preferred when the client accepts it and the brotli package is
+installed; gzip is used otherwise. Formats that are already compressed
+(PNG, JPEG, PDF) stay off the allowlist. Streamed responses are
+compressed chunk by chunk and flushed after every chunk so clients still
+receive rows as they are produced.
+
+services/benchmark_compression.py measures CPU cost against bytes saved
+for the levels above on representative listing payloads.
+"""
+import os
+import zlib
+from typing import FrozenSet, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+DEFAULT_CONTENT_TYPES = "application/json,application/x-ndjson,text/plain,text/csv,text/html,image/svg+xml"
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+class CompressionSettings:
+    """Compression configuration read from the environment"""
+
+    def __init__(self):
+        self.enabled = _env_bool("COMPRESSION_ENABLED", True)
+        self.min_size = _env_int("COMPRESSION_MIN_SIZE", 1024)
+        self.gzip_level = _env_int("COMPRESSION_GZIP_LEVEL", 5)
+        self.brotli_quality = _env_int("COMPRESSION_BROTLI_QUALITY", 4)
+        self.content_types: FrozenSet[str] = frozenset(
+            media_type.strip().lower()
+            for media_type in os.getenv("COMPRESSION_CONTENT_TYPES", DEFAULT_CONTENT_TYPES).split(",")
+            if media_type.strip()
+        )
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything compressed so far without ending the stream"""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def create_encoder(encoding: str, settings: CompressionSettings):
+    """Streaming encoder for "br" or "gzip" """
+    if encoding == "br":
+        return BrotliEncoder(settings.brotli_quality)
+    return GzipEncoder(settings.gzip_level)
+
+def compress_body(body: bytes, encoding: str, settings: CompressionSettings) -> bytes:
+    """Compress a complete body in one go"""
+    encoder = create_encoder(encoding, settings)
+    return encoder.compress(body) + encoder.finish()
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, None if neither is acceptable"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.strip()] = quality
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = None
+    for encoding in candidates:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        # Ties go to the earlier (preferred) encoding
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+class CompressionMiddleware:
+    """Compress eligible responses with brotli or gzip
+
+    A response is eligible when its media type is on the allowlist, it has
+    no Content-Encoding yet and it can carry a body. Eligible responses
+    always get Vary: Accept-Encoding; they are compressed when the client
+    accepts an encoding and the body reaches the minimum size (bodies that
+    would not shrink are sent as is).
+    """
+
+    def __init__(self, app: ASGIApp, settings: Optional[CompressionSettings] = None):
+        self.app = app
+        self.settings = settings or CompressionSettings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.settings.enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        responder = _CompressionResponder(send, encoding, self.settings)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Wraps `send` for one response; the start message is held back until
+    the first body chunk shows whether compressing is worthwhile"""
+
+    def __init__(self, send: Send, encoding: Optional[str], settings: CompressionSettings):
+        self._send = send
+        self.encoding = encoding
+        self.settings = settings
+        self.start: Optional[Message] = None
+        self.encoder = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            if self._eligible(message) and self.encoding is not None:
+                self.start = message
+            else:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+        elif self.start is not None:
+            await self._send_first_body(message)
+        elif self.encoder is not None:
+            await self._send_next_body(message)
+        else:
+            await self._send(message)
+
+    def _eligible(self, message: Message) -> bool:
+        if message["status"] in (204, 304) or message["status"] < 200:
+            return False
+        headers = MutableHeaders(raw=message["headers"])
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if media_type not in self.settings.content_types or "content-encoding" in headers:
+            return False
+        vary = headers.get("vary")
+        if not vary:
+            headers["Vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding"
+        return True
+
+    async def _send_first_body(self, message: Message) -> None:
+        start, self.start = self.start, None
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not more_body:
+            compressed = compress_body(body, self.encoding, self.settings) if len(body) >= self.settings.min_size else None
+            if compressed is None or len(compressed) >= len(body):
+                await self._send(start)
+                await self._send(message)
+                return
+            self._mark_encoded(headers)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        declared_length = headers.get("content-length")
+        if declared_length is not None and int(declared_length) < self.settings.min_size:
+            await self._send(start)
+            await self._send(message)
+            return
+        self.encoder = create_encoder(self.encoding, self.settings)
+        self._mark_encoded(headers)
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        await self._send(start)
+        await self._send({
+            "type": "http.response.body",
+            "body": self.encoder.compress(body) + self.encoder.flush(),
+            "more_body": True
+        })
+
+    async def _send_next_body(self, message: Message) -> None:
+        more_body = message.get("more_body", False)
+        data = self.encoder.compress(message.get("body", b""))
+        data += self.encoder.flush() if more_body else self.encoder.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _mark_encoded(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        # A strong ETag names exact bytes, which compression changes
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
@@ -0,0 +1,235 @@
+"""Connection pool setup shared by every service
+
+Each service ships an identical copy of this module, since services are
+built from their own directories; the original is in services/shared (edit
+it there and run services/sync_shared.py). Engines are configured from
+environment variables:
+
+    DB_POOL_SIZE              persistent connections per process (10)
+    DB_MAX_OVERFLOW           extra connections allowed at peak (20)
+    DB_POOL_TIMEOUT           seconds to wait for a free connection (30)
+    DB_POOL_RECYCLE           seconds before a connection is replaced (1800)
+    DB_POOL_PRE_PING          test connections on checkout (true)
+    DB_STATEMENT_TIMEOUT_MS   server-side statement timeout, 0 disables (30000)
+    DB_CONNECT_TIMEOUT        seconds to establish a connection (10)
+    DB_PGBOUNCER              connect through PgBouncer in transaction mode (false)
+    DB_ECHO                   log SQL (false)
+
+With DB_PGBOUNCER the engine keeps no pool of its own (PgBouncer does the
+pooling), sends no startup options PgBouncer would reject, applies the
+statement timeout per transaction and disables asyncpg's prepared
+statement caches.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+class PoolSettings:
+    """Pool configuration read from the environment"""
+
+    def __init__(self):
+        self.pool_size = _env_int("DB_POOL_SIZE", 10)
+        self.max_overflow = _env_int("DB_MAX_OVERFLOW", 20)
+        self.pool_timeout = _env_int("DB_POOL_TIMEOUT", 30)
+        self.pool_recycle = _env_int("DB_POOL_RECYCLE", 1800)
+        self.pool_pre_ping = _env_bool("DB_POOL_PRE_PING", True)
+        self.statement_timeout_ms = _env_int("DB_STATEMENT_TIMEOUT_MS", 30000)
+        self.connect_timeout = _env_int("DB_CONNECT_TIMEOUT", 10)
+        self.pgbouncer = _env_bool("DB_PGBOUNCER", False)
+        self.echo = _env_bool("DB_ECHO", False)
+
+
+class PoolMetrics:
+    """Counters for one engine's pool, updated from pool events"""
+
+    def __init__(self, service: str, name: str):
+        self.service = service
+        self.name = name
+        self.pool = None
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def observe_checkout(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def observe_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def observe_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        pool = self.pool
+        queued = isinstance(pool, QueuePool)
+        with self._lock:
+            return {
+                "size": pool.size() if queued else 0,
+                "checked_out": pool.checkedout() if queued else 0,
+                "checked_in": pool.checkedin() if queued else 0,
+                "overflow": max(pool.overflow(), 0) if queued else 0,
+                "checkouts_total": self.checkouts,
+                "connects_total": self.connects,
+                "timeouts_total": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+# Every engine created by this module, for render_pool_metrics()
+_registry: List[PoolMetrics] = []
+
+
+class _TimedPoolMixin:
+    """Records how long each checkout waits for a free connection"""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        self.metrics.pool = pool
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _track(engine: Engine, metrics: PoolMetrics) -> None:
+    """Attach metrics to an engine's pool"""
+    pool = engine.pool
+    if isinstance(pool, _TimedPoolMixin):
+        pool.metrics = metrics
+    metrics.pool = pool
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.observe_checkout()
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.observe_connect()
+
+    _registry.append(metrics)
+
+
+def _pool_kwargs(pool_settings: PoolSettings, pool_class) -> dict:
+    if pool_settings.pgbouncer:
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": pool_class,
+        "pool_size": pool_settings.pool_size,
+        "max_overflow": pool_settings.max_overflow,
+        "pool_timeout": pool_settings.pool_timeout,
+        "pool_recycle": pool_settings.pool_recycle,
+        "pool_pre_ping": pool_settings.pool_pre_ping,
+    }
+
+
+def _set_local_statement_timeout(engine: Engine, timeout_ms: int) -> None:
+    """Apply the statement timeout inside each transaction (PgBouncer mode)"""
+
+    @event.listens_for(engine, "begin")
+    def on_begin(connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def create_db_engine(database_url: str, service_name: str, echo: Optional[bool] = None) -> Engine:
+    """Create a pooled, instrumented sync engine (psycopg2)"""
+    pool_settings = PoolSettings()
+    connect_args = {
+        "connect_timeout": pool_settings.connect_timeout,
+        "application_name": service_name,
+    }
+    if pool_settings.statement_timeout_ms and not pool_settings.pgbouncer:
+        connect_args["options"] = f"-c statement_timeout={pool_settings.statement_timeout_ms}"
+
+    engine = create_engine(
+        database_url,
+        echo=pool_settings.echo if echo is None else echo,
+        connect_args=connect_args,
+        **_pool_kwargs(pool_settings, TimedQueuePool)
+    )
+    if pool_settings.statement_timeout_ms and pool_settings.pgbouncer:
+        _set_local_statement_timeout(engine, pool_settings.statement_timeout_ms)
+    _track(engine, PoolMetrics(service_name, "sync"))
+    return engine
+
+
+def create_async_db_engine(database_url: str, service_name: str, echo: Optional[bool] = None):
+    """Create a pooled, instrumented async engine (asyncpg)"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    pool_settings = PoolSettings()
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    server_settings = {"application_name": service_name}
+    connect_args = {"timeout": pool_settings.connect_timeout, "server_settings": server_settings}
+    if pool_settings.pgbouncer:
+        # Server-side prepared statements do not survive transaction pooling
+        connect_args["statement_cache_size"] = 0
+        url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+    elif pool_settings.statement_timeout_ms:
+        server_settings["statement_timeout"] = str(pool_settings.statement_timeout_ms)
+
+    engine = create_async_engine(
+        url,
+        echo=pool_settings.echo if echo is None else echo,
+        connect_args=connect_args,
+        **_pool_kwargs(pool_settings, TimedAsyncAdaptedQueuePool)
+    )
+    if pool_settings.statement_timeout_ms and pool_settings.pgbouncer:
+        _set_local_statement_timeout(engine.sync_engine, pool_settings.statement_timeout_ms)
+    _track(engine.sync_engine, PoolMetrics(service_name, "async"))
+    return engine
+
+
+def render_pool_metrics() -> str:
+    """Pool metrics of every engine in Prometheus text format"""
+    lines = []
+    snapshots = [(metrics, metrics.snapshot()) for metrics in _registry]
+    for key in ("size", "checked_out", "checked_in", "overflow", "checkouts_total", "connects_total",
+                "timeouts_total", "wait_seconds_total", "wait_seconds_max"):
+        metric_type = "counter" if key.endswith("_total") else "gauge"
+        lines.append(f"# TYPE db_pool_{key} {metric_type}")
+        for metrics, snapshot in snapshots:
+            labels = f'service="{metrics.service}",engine="{metrics.name}"'
+            lines.append(f"db_pool_{key}{{{labels}}} {snapshot[key]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,296 @@
+"""Object storage backends: S3, a local directory or memory
+
+A copy of this module ships with every service that stores objects; the
+original is in services/shared (edit it there and run
+services/sync_shared.py).
+"""
+import logging
+import os
+import shutil
+import threading
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed objects never change, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class StorageBackend:
+    """Minimal object storage interface (product images, QR labels)"""
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        """Store bytes under an exact key and return the public URL"""
+        raise NotImplementedError
+
+    def put_file(self, key: str, fileobj: BinaryIO, content_type: str) -> str:
+        """Store a file object read from its current position; return the public URL"""
+        return self.put(key, fileobj.read(), content_type)
+
+    def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def presign_put(
+        self,
+        key: str,
+        content_type: str,
+        expires_in: int,
+        checksum_sha256: Optional[str] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        raise RuntimeError(f"{type(self).__name__} does not support presigned uploads")
+
+
+class S3Storage(StorageBackend):
+    """Amazon S3 (or any S3-compatible endpoint)
+
+    The boto3 client is created on first use with a sized connection pool,
+    timeouts and botocore's retry mode, which retries throttling and
+    transient errors with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        region: str,
+        access_key_id: str = "",
+        secret_access_key: str = "",
+        endpoint_url: str = "",
+        max_pool_connections: int = 10,
+        max_attempts: int = 5,
+        retry_mode: str = "standard",
+        connect_timeout: float = 5,
+        read_timeout: float = 30,
+        client=None
+    ):
+        self.bucket = bucket
+        self.region = region
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.endpoint_url = endpoint_url
+        self.max_pool_connections = max_pool_connections
+        self.max_attempts = max_attempts
+        self.retry_mode = retry_mode
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        import boto3
+        from botocore.config import Config
+
+        config = Config(
+            region_name=self.region,
+            max_pool_connections=self.max_pool_connections,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries={"max_attempts": self.max_attempts, "mode": self.retry_mode},
+        )
+        # Without explicit keys boto3 falls back to its credential chain
+        # (environment, shared config, instance role)
+        client = boto3.client(
+            "s3",
+            aws_access_key_id=self.access_key_id or None,
+            aws_secret_access_key=self.secret_access_key or None,
+            endpoint_url=self.endpoint_url or None,
+            config=config,
+        )
+        logger.info(f"S3 client initialized for bucket {self.bucket}")
+        return client
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+            CacheControl=IMMUTABLE_CACHE_CONTROL,
+        )
+        return self.url(key)
+
+    def put_file(self, key: str, fileobj: BinaryIO, content_type: str) -> str:
+        # Large files go up as a multipart upload
+        self.client.upload_fileobj(
+            fileobj,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL},
+        )
+        return self.url(key)
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                logger.error(f"Error checking S3 object {key}: {e}")
+            return False
+
+    def url(self, key: str) -> str:
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+    def presign_put(
+        self,
+        key: str,
+        content_type: str,
+        expires_in: int,
+        checksum_sha256: Optional[str] = None
+    ) -> Tuple[str, Dict[str, str]]:
+        """Presign a direct PUT of one object
+
+        Returns the URL and the headers the client must send with the PUT.
+        With checksum_sha256 (base64 digest) S3 rejects any body that does
+        not match it.
+        """
+        params = {"Bucket": self.bucket, "Key": key, "ContentType": content_type}
+        headers = {"Content-Type": content_type}
+        if checksum_sha256:
+            params["ChecksumSHA256"] = checksum_sha256
+            headers["x-amz-checksum-sha256"] = checksum_sha256
+
+        from botocore.exceptions import BotoCoreError
+
+        try:
+            url = self.client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in)
+        except BotoCoreError as e:
+            raise RuntimeError(f"Cannot presign S3 upload: {e}")
+        return url, headers
+
+
+class LocalStorage(StorageBackend):
+    """Objects stored as files under a directory
+
+    The app mounts the directory as a static route at base_url, so the
+    returned URLs are served by the service itself.
+    """
+
+    def __init__(self, root: str, base_url: str = "/media"):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def _write(self, key: str, write) -> str:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+        return self.url(key)
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        return self._write(key, lambda f: f.write(data))
+
+    def put_file(self, key: str, fileobj: BinaryIO, content_type: str) -> str:
+        return self._write(key, lambda f: shutil.copyfileobj(fileobj, f))
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class InMemoryStorage(StorageBackend):
+    """Process-local object store for tests and offline benchmarks"""
+
+    def __init__(self, base_url: str = "/media"):
+        self.base_url = base_url.rstrip("/")
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        with self._lock:
+            self.objects[key] = (data, content_type)
+        return self.url(key)
+
+    def get(self, key: str) -> bytes:
+        with self._lock:
+            if key not in self.objects:
+                raise KeyError(key)
+            return self.objects[key][0]
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return key in self.objects
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+def create_storage(backend: str) -> StorageBackend:
+    """Build the storage backend named by configuration ("s3", "local" or "memory")"""
+    if backend == "local":
+        return LocalStorage(settings.LOCAL_STORAGE_DIR, settings.LOCAL_STORAGE_URL)
+    if backend == "memory":
+        return InMemoryStorage(settings.LOCAL_STORAGE_URL)
+    if backend != "s3":
+        logger.error(f"Unknown storage backend {backend!r}, using s3")
+
+    if not all([settings.AWS_ACCESS_KEY_ID, settings.AWS_SECRET_ACCESS_KEY, settings.AWS_S3_BUCKET_NAME]):
+        logger.warning("AWS credentials or bucket name not set. S3 upload will not work.")
+    return S3Storage(
+        bucket=settings.AWS_S3_BUCKET_NAME or "dummy_bucket",
+        region=settings.AWS_REGION,
+        access_key_id=settings.AWS_ACCESS_KEY_ID,
+        secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+        max_attempts=settings.S3_MAX_ATTEMPTS,
+        retry_mode=settings.S3_RETRY_MODE,
+        connect_timeout=settings.S3_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=settings.S3_READ_TIMEOUT_SECONDS,
+    )
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> StorageBackend:
+    """Return the configured storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage(settings.STORAGE_BACKEND)
+    return _storage
+
+def set_storage(storage: Optional[StorageBackend]) -> None:
+    """Replace the storage backend (None re-reads configuration on next use)"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
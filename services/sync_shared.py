@@ -0,0 +1,74 @@
+"""Copy the modules in services/shared into the services that use them
+
+Services are built from their own directories, so each one ships its own
+copy of the shared modules in src/utils. Edit the originals in
+services/shared and run this script to update every copy:
+
+    python sync_shared.py           copy the originals over every copy
+    python sync_shared.py --check   only report copies that differ (exit status 1)
+"""
+import argparse
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SHARED_DIR = os.path.join(ROOT, "shared")
+
+ALL_SERVICES = [
+    "auth-service",
+    "product-service",
+    "inventory-service",
+    "order-service",
+    "payment-service",
+    "review-service",
+    "favorite-service",
+    "ai-agentic-service",
+    "cart-service",
+]
+
+# Shared module -> services that ship a copy in src/utils
+SHARED_MODULES = {
+    "db_pool.py": ALL_SERVICES,
+    "compression.py": ALL_SERVICES,
+    "json_response.py": ALL_SERVICES,
+    "pagination.py": ["product-service", "inventory-service", "order-service", "payment-service", "review-service"],
+    "http_cache.py": ["product-service", "inventory-service"],
+    "storage.py": ["product-service", "inventory-service"],
+}
+
+
+def copies():
+    """(original, copy) paths of every shared module"""
+    for module, services in SHARED_MODULES.items():
+        for service in services:
+            yield os.path.join(SHARED_DIR, module), os.path.join(ROOT, service, "src", "utils", module)
+
+
+def read(path: str) -> bytes:
+    if not os.path.exists(path):
+        return b""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="report differing copies instead of updating them")
+    args = parser.parse_args()
+
+    stale = [(original, copy) for original, copy in copies() if read(original) != read(copy)]
+    for original, copy in stale:
+        if args.check:
+            print(f"{os.path.relpath(copy, ROOT)} differs from {os.path.relpath(original, ROOT)}")
+        else:
+            shutil.copyfile(original, copy)
+            print(f"updated {os.path.relpath(copy, ROOT)}")
+    if args.check and stale:
+        print("Run python sync_shared.py to update the copies", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())